@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import sheets, backups, schedules, storage, integrations
+from app.api.api_v1.endpoints import sheets, backups, schedules, storage, integrations, runs
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router.include_router(sheets.router, prefix="/sheets", tags=["sheets"])
 api_router.include_router(backups.router, prefix="/backups", tags=["backups"])
 api_router.include_router(schedules.router, prefix="/schedules", tags=["schedules"])
 api_router.include_router(storage.router, prefix="/storage", tags=["storage"])
-api_router.include_router(integrations.router, prefix="/integrations", tags=["integrations"])
\ No newline at end of file
+api_router.include_router(integrations.router, prefix="/integrations", tags=["integrations"])
+api_router.include_router(runs.router, prefix="/runs", tags=["runs"])
\ No newline at end of file
@@ -1,19 +1,60 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, status, Response, Depends
+from fastapi import APIRouter, HTTPException, status, Response, Depends, Query
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 import io
 import os
+import shutil
+import tempfile
+import json
+import base64
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import logging
 
-from app.schemas.backup import BackupOut, BackupCreate, BackupUpdate, BackupStats, BackupResponse
+from app.core.executor import run_blocking, run_export
+from app.schemas.backup import BackupOut, BackupCreate, BackupUpdate, BackupStats, BackupResponse, InFlightRun, BackupPage, SheetBackupStatsOut, RetentionRunResult, BackupLocationOut
 from app.services.backup_service import backup_sheet, delete_backup
+from app.services import adaptive_service
+from app.services.backup_stats_service import apply_backup_inserts, rebuild_stats, stats_to_dict
+from app.services.retention_service import retention_service
+from app.services.storage import resolve_storage
+from app.services.backup_persistence import location_values, storage_results_of
+from app.services.snapshot_service import backup_content_type, bundle_to_workbook, XLSX_CONTENT_TYPE
+from app.services.parquet_service import LOCATION_KIND_BACKUP
+from app.services.incremental_service import write_full_snapshot
+from app.services.single_flight import single_flight, backup_flight_key
 from app.models.backup import Backup
+from app.models.backup_location import BackupLocation
 from app.models.sheet import Sheet
-from app.api.deps import get_db
+from app.models.sheet_backup_stats import SheetBackupStats
+from app.api.deps import get_db, get_async_db
+from app.db.session import SessionLocal
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _encode_cursor(created_at: datetime, backup_id: str) -> str:
+    """
+    Курсор страницы: позиция последнего бэкапа на странице в порядке (created_at, id)
+    """
+    payload = json.dumps({"created_at": created_at.isoformat(), "id": backup_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["created_at"]), str(payload["id"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор страницы"
+        )
+
 
 @router.post("/", response_model=BackupResponse, status_code=status.HTTP_201_CREATED)
 async def create_backup(
@@ -28,7 +69,7 @@ async def create_backup(
     - **storage_configs**: Список конфигураций хранилищ в формате [{"storage_type": str, "storage_params": dict}]
     """
     # Проверяем существование таблицы
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+    sheet = await run_blocking(db.get, Sheet, sheet_id)
     if not sheet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -42,79 +83,243 @@ async def create_backup(
             detail="Необходимо указать хотя бы одно хранилище"
         )
     
-    # Создаем резервную копию
-    try:
-        backup_result = backup_sheet(
-            sheet.spreadsheet_id,
-            sheet.name,
-            storage_configs=storage_configs,
-            db=db
-        )
-        
-        if not backup_result:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Не удалось создать резервную копию"
+    def run_backup() -> str:
+        """
+        Создание резервной копии и записи в БД (выполняется один раз для одновременных запросов).
+
+        Работа выполняется в пуле потоков и может пережить запрос, начавший ее,
+        поэтому использует собственную сессию БД, а не сессию запроса.
+        """
+        db = SessionLocal()
+        try:
+            sheet = db.get(Sheet, sheet_id)
+            if not sheet:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Таблица не найдена"
+                )
+            
+            backup_result = backup_sheet(
+                sheet.spreadsheet_id,
+                sheet.name,
+                storage_configs=storage_configs,
+                db=db,
+                credentials_id=sheet.credentials_id
             )
-        
-        # Отладочный вывод
-        logger = logging.getLogger(__name__)
-        logger.info(f"Результат создания бэкапа: {backup_result.__dict__}")
-        
-        # Сохраняем в БД
-        backup = Backup(
-            sheet_id=sheet_id,
-            filename=backup_result.filename,
-            file_path=backup_result.file_path,
-            size=backup_result.size,
-            status=backup_result.status,
-            storage_type=backup_result.storage_type,
-            backup_metadata=backup_result.backup_metadata,
-            storage_results=backup_result.storage_results,
-            created_at=datetime.utcnow()
-        )
-        
-        db.add(backup)
-        db.commit()
-        db.refresh(backup)
-        
-        # Обновляем время последнего бэкапа для таблицы
-        sheet.last_backup = backup.created_at
-        db.commit()
-        
-        return backup
+            
+            if not backup_result:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Не удалось создать резервную копию"
+                )
+            
+            # Отладочный вывод
+            logger.info(f"Результат создания бэкапа: {backup_result.__dict__}")
+            
+            # Сохраняем в БД
+            backup = Backup(
+                sheet_id=sheet_id,
+                filename=backup_result.filename,
+                file_path=backup_result.file_path,
+                size=backup_result.size,
+                status=backup_result.status,
+                storage_type=backup_result.storage_type,
+                backup_metadata=backup_result.backup_metadata,
+                storage_results=backup_result.storage_results,
+                created_at=datetime.utcnow()
+            )
+            
+            backup.locations = [
+                BackupLocation(**location_values(result, backup.created_at))
+                for result in storage_results_of(backup)
+            ]
+            db.add(backup)
+            apply_backup_inserts(db, [backup])
+            db.commit()
+            db.refresh(backup)
+            
+            # Обновляем время последнего бэкапа для таблицы
+            sheet.last_backup = backup.created_at
+            adaptive_service.record_backup(
+                sheet,
+                (backup_result.backup_metadata or {}).get("content_hash"),
+                backup.created_at
+            )
+            db.commit()
+            
+            return backup.id
+        finally:
+            db.close()
     
+    # Создаем резервную копию; повторные запросы для той же таблицы и набора
+    # хранилищ присоединяются к уже выполняющемуся экспорту
+    try:
+        backup_id = await single_flight.do(
+            backup_flight_key(sheet_id, storage_configs),
+            lambda: run_export(run_backup),
+            "backup",
+            sheet.name
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при создании бэкапа: {str(e)}"
         )
+    
+    return await run_blocking(db.get, Backup, backup_id)
 
 @router.get("/", response_model=List[BackupResponse])
 async def get_backups(
     sheet_id: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка всех резервных копий
     """
-    query = db.query(Backup)
+    query = select(Backup)
     
     if sheet_id:
         # Фильтруем бэкапы по ID таблицы
-        query = query.filter(Backup.sheet_id == sheet_id)
+        query = query.where(Backup.sheet_id == sheet_id)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.get("/page", response_model=BackupPage)
+async def get_backups_page(
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=500, description="Размер страницы"),
+    sheet_id: Optional[str] = Query(None, description="Фильтр по ID таблицы"),
+    backup_status: Optional[str] = Query(None, alias="status", description="Фильтр по статусу"),
+    storage_type: Optional[str] = Query(None, description="Фильтр по типу хранилища (любая копия)"),
+    integration_id: Optional[str] = Query(None, description="Фильтр по ID интеграции хранилища"),
+    created_from: Optional[datetime] = Query(None, description="Созданные не раньше"),
+    created_to: Optional[datetime] = Query(None, description="Созданные раньше"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Постраничный список резервных копий, новые первыми.
+    
+    Страницы выбираются по ключу (created_at, id), поэтому стоимость запроса
+    зависит от размера страницы, а не от общего числа бэкапов. JSON-поля
+    метаданных и результатов хранилищ в список не входят.
+    """
+    columns = [
+        Backup.id, Backup.sheet_id, Backup.filename, Backup.size,
+        Backup.status, Backup.storage_type, Backup.created_at
+    ]
+    query = select(*columns)
+    
+    if sheet_id:
+        query = query.where(Backup.sheet_id == sheet_id)
+    if backup_status:
+        query = query.where(Backup.status == backup_status)
+    if storage_type or integration_id:
+        # Бэкапы с копией в нужном хранилище (индекс backup_locations по хранилищу)
+        location = select(BackupLocation.backup_id).where(BackupLocation.status == "stored")
+        if storage_type:
+            location = location.where(BackupLocation.storage_type == storage_type)
+        if integration_id:
+            location = location.where(BackupLocation.integration_id == integration_id)
+        query = query.where(Backup.id.in_(location))
+    if created_from:
+        query = query.where(Backup.created_at >= created_from)
+    if created_to:
+        query = query.where(Backup.created_at < created_to)
+    
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.where(tuple_(Backup.created_at, Backup.id) < tuple_(cursor_created_at, cursor_id))
+    
+    # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+    result = await db.execute(
+        query.order_by(Backup.created_at.desc(), Backup.id.desc()).limit(limit + 1)
+    )
+    rows = result.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return {
+        "items": [row._asdict() for row in rows],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/stats", response_model=List[SheetBackupStatsOut])
+async def get_all_backup_stats(
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получение статистики резервных копий по всем таблицам (для дашборда)
+    """
+    result = await db.execute(select(SheetBackupStats).order_by(SheetBackupStats.sheet_id))
+    return [
+        {"sheet_id": stats.sheet_id, **stats_to_dict(stats)}
+        for stats in result.scalars()
+    ]
+
+@router.post("/stats/rebuild")
+async def rebuild_backup_stats(
+    sheet_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Пересчет статистики резервных копий с нуля
+    """
+    def rebuild() -> int:
+        count = rebuild_stats(db, sheet_id)
+        db.commit()
+        return count
+    
+    sheets_count = await run_blocking(rebuild)
+    
+    return {"sheets_count": sheets_count}
+
+@router.post("/retention", response_model=RetentionRunResult)
+async def run_retention(dry_run: bool = False):
+    """
+    Очистка старых бэкапов по политикам хранения расписаний
+    """
+    return await run_export(retention_service.run, dry_run)
+
+@router.get("/stats/{sheet_id}", response_model=BackupStats)
+async def get_backup_stats(
+    sheet_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получение статистики резервных копий для таблицы
+    """
+    sheet = await db.get(Sheet, sheet_id)
+    if not sheet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Таблица не найдена"
+        )
     
-    return query.all()
+    # Статистика поддерживается инкрементально при создании и удалении бэкапов
+    return stats_to_dict(await db.get(SheetBackupStats, sheet_id))
+
+@router.get("/inflight", response_model=List[InFlightRun])
+async def get_inflight_backups():
+    """
+    Получение списка выполняющихся ручных бэкапов и запусков расписаний
+    """
+    return single_flight.list_flights()
 
 @router.get("/{backup_id}", response_model=BackupResponse)
 async def get_backup_info(
     backup_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение информации о резервной копии
     """
-    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+    backup = await db.get(Backup, backup_id)
     if not backup:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,162 +328,185 @@ async def get_backup_info(
     
     return backup
 
-@router.delete("/{backup_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_backup_endpoint(
+@router.get("/{backup_id}/locations", response_model=List[BackupLocationOut])
+async def get_backup_locations(
     backup_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Удаление резервной копии
+    Получение копий резервной копии в хранилищах
     """
-    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+    backup = await db.get(Backup, backup_id)
     if not backup:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Резервная копия не найдена"
         )
     
-    # Удаляем файл с диска
-    try:
-        if os.path.exists(backup.file_path):
-            os.remove(backup.file_path)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Не удалось удалить файл резервной копии: {str(e)}"
-        )
-    
-    # Удаляем из БД
-    db.delete(backup)
-    db.commit()
-    
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    result = await db.execute(
+        select(BackupLocation)
+        .where(BackupLocation.backup_id == backup_id)
+        .order_by(BackupLocation.created_at)
+    )
+    return result.scalars().all()
 
-@router.get("/{backup_id}/download")
-async def download_backup(
+@router.delete("/{backup_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_backup_endpoint(
     backup_id: str,
     db: Session = Depends(get_db)
 ):
     """
-    Скачивание файла резервной копии
+    Удаление резервной копии
     """
-    backup = db.query(Backup).filter(Backup.id == backup_id).first()
-    if not backup:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Резервная копия не найдена"
-        )
-    
-    # Проверяем тип хранилища и обрабатываем соответственно
-    if backup.storage_type == "bitrix":
-        from app.services.storage.bitrix_disk_storage import BitrixDiskStorage
-        from app.services.integration_service import IntegrationService
-        
-        # Получаем настройки Битрикс24
-        bitrix_settings = IntegrationService.get_bitrix_settings(db)
-        if not bitrix_settings or not bitrix_settings.get("webhook_url"):
+    def remove_backup() -> None:
+        """
+        Удаление файла и записи о резервной копии (выполняется в пуле экспорта: файл может загружаться из внешнего хранилища)
+        """
+        backup = db.query(Backup).filter(Backup.id == backup_id).first()
+        if not backup:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Не настроена интеграция с Битрикс24"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Резервная копия не найдена"
             )
         
-        # Создаем экземпляр хранилища Битрикс24
-        storage = BitrixDiskStorage(
-            webhook_url=bitrix_settings["webhook_url"],
-            folder_id=bitrix_settings.get("folder_id"),
-            base_path=bitrix_settings.get("base_path", "backup_google_sheets")
-        )
-        
-        # Получаем ID файла из пути (в этом случае file_path содержит ID файла)
-        file_id = backup.file_path
-        
-        # Получаем файл из Битрикс24
-        file_data = storage.get(file_id)
-        if not file_data:
+        # Сегменты инкрементальных снимков не восстановить без предыдущих звеньев цепочки
+        if db.query(Backup.id).filter(Backup.parent_backup_id == backup_id).first():
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Файл бэкапа не найден на диске"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="От резервной копии зависят инкрементальные снимки, сначала удалите их"
             )
         
-        # Создаем временный файл для отправки пользователю
-        import tempfile
-        temp_path = os.path.join(tempfile.gettempdir(), backup.filename)
-        
-        with open(temp_path, 'wb') as f:
-            f.write(file_data.read())
-        
-        # Возвращаем файл клиенту
-        return FileResponse(
-            path=temp_path,
-            filename=backup.filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            background=None  # Явно отключаем фоновую обработку, чтобы файл не был удален до завершения ответа
-        )
-    else:
-        # Для локального хранилища - стандартный путь
-        # Проверяем существование файла
-        if not os.path.exists(backup.file_path):
+        # Удаляем файл из всех хранилищ, затем запись из БД и из статистики таблицы
+        result = retention_service.delete_backups(db, [backup], reason="manual")
+        if result["failed"]:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Файл бэкапа не найден на диске"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Не удалось удалить файл резервной копии: {'; '.join(result['errors'])}"
             )
-        
-        # Возвращаем файл клиенту
-        return FileResponse(
-            path=backup.file_path,
-            filename=backup.filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+    
+    await run_export(remove_backup)
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@router.get("/stats/{sheet_id}", response_model=BackupStats)
-async def get_backup_stats(
-    sheet_id: str,
+def remove_temp_files(paths: List[str]) -> None:
+    """
+    Удаляет временные файлы скачивания
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить временный файл {path}: {str(e)}")
+
+@router.get("/{backup_id}/download")
+async def download_backup(
+    backup_id: str,
+    as_workbook: bool = Query(False, description="Собрать архив листов в одну книгу XLSX"),
+    full: bool = Query(True, description="Для сегмента инкрементального снимка - собрать полный снимок из цепочки"),
     db: Session = Depends(get_db)
 ):
     """
-    Получение статистики резервных копий для таблицы
+    Скачивание файла резервной копии
     """
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
-    if not sheet:
+    backup = await run_blocking(db.get, Backup, backup_id)
+    if not backup:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Таблица не найдена"
+            detail="Резервная копия не найдена"
         )
     
-    # Получаем все бэкапы для таблицы
-    backups = db.query(Backup).filter(Backup.sheet_id == sheet_id).all()
+    # Временные файлы запроса удаляются после отправки ответа или при ошибке
+    temp_paths: List[str] = []
     
-    if not backups:
-        # Если бэкапов нет, возвращаем пустую статистику
-        return {
-            "total_backups": 0,
-            "total_size": 0,
-            "successful_backups": 0,
-            "failed_backups": 0,
-            "average_size": 0,
-            "first_backup_date": None,
-            "last_backup_date": None
-        }
+    def new_temp_path(suffix: str) -> str:
+        with tempfile.NamedTemporaryFile(prefix="backup_", suffix=suffix, delete=False) as temp_file:
+            temp_paths.append(temp_file.name)
+            return temp_file.name
     
-    # Вычисляем статистику
-    total_backups = len(backups)
-    successful_backups = sum(1 for backup in backups if backup.status == "completed")
-    failed_backups = total_backups - successful_backups
+    def fetch_backup_file() -> str:
+        """
+        Путь к файлу бэкапа для отправки (выполняется в пуле экспорта).
+        Локальная копия отдается напрямую, из остальных хранилищ файл
+        загружается во временный файл.
+        """
+        locations = db.execute(
+            select(BackupLocation)
+            .where(BackupLocation.backup_id == backup_id)
+            .where(BackupLocation.kind == LOCATION_KIND_BACKUP)
+            .where(BackupLocation.status == "stored")
+        ).scalars().all()
+        
+        # Сначала пробуем локальные копии: они не требуют запросов к внешним сервисам
+        for location in sorted(locations, key=lambda location: location.storage_type != "local"):
+            if location.storage_type == "local":
+                if os.path.exists(location.file_path):
+                    return location.file_path
+                continue
+            
+            storage = resolve_storage(location.storage_type, location.storage_params, db)
+            if not storage:
+                continue
+            
+            file_data = storage.get(location.file_path)
+            if not file_data:
+                continue
+            
+            # Создаем временный файл для отправки пользователю
+            temp_path = new_temp_path(f"_{backup.filename}")
+            with open(temp_path, 'wb') as f:
+                shutil.copyfileobj(file_data, f)
+            return temp_path
+        
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Файл бэкапа не найден ни в одном хранилище"
+        )
     
-    total_size = sum(backup.size for backup in backups if backup.size is not None)
-    average_size = total_size / total_backups if total_backups > 0 else 0
+    def merge_backup_file() -> str:
+        """
+        Полный снимок, собранный из цепочки сегментов инкрементального снимка
+        """
+        merged_path = new_temp_path(f"_full_{backup.filename}")
+        with open(merged_path, "wb") as out:
+            merged = write_full_snapshot(db, backup_id, out)
+        if not merged:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Не удалось собрать полный снимок: звено цепочки недоступно"
+            )
+        return merged_path
     
-    # Сортируем по дате создания
-    sorted_backups = sorted(backups, key=lambda x: x.created_at)
-    first_backup_date = sorted_backups[0].created_at if sorted_backups else None
-    last_backup_date = sorted_backups[-1].created_at if sorted_backups else None
+    try:
+        if full and backup.parent_backup_id:
+            file_path = await run_export(merge_backup_file)
+        else:
+            file_path = await run_export(fetch_backup_file)
+        
+        # Архив листов (снимок или экспорт по листам) собирается в одну книгу
+        if as_workbook and backup.filename.endswith(".zip"):
+            filename = f"{backup.filename.rsplit('.', 2)[0]}.xlsx"
+            media_type = XLSX_CONTENT_TYPE
+            
+            def build_workbook() -> str:
+                workbook_path = new_temp_path(f"_{filename}")
+                with open(file_path, "rb") as bundle, open(workbook_path, "wb") as out:
+                    bundle_to_workbook(bundle, out)
+                return workbook_path
+            
+            file_path = await run_blocking(build_workbook)
+        else:
+            filename = backup.filename
+            media_type = backup_content_type(backup.filename)
+    except BaseException:
+        remove_temp_files(temp_paths)
+        raise
     
-    return {
-        "total_backups": total_backups,
-        "total_size": total_size,
-        "successful_backups": successful_backups,
-        "failed_backups": failed_backups,
-        "average_size": average_size,
-        "first_backup_date": first_backup_date,
-        "last_backup_date": last_backup_date
-    } 
\ No newline at end of file
+    # Возвращаем файл клиенту
+    return FileResponse(
+        path=file_path,
+        filename=filename,
+        media_type=media_type,
+        background=BackgroundTask(remove_temp_files, temp_paths)
+    )
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Query, Path, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from app.core.executor import run_blocking
+from app.schemas.run import ScheduleRunResponse
+from app.services.run_service import run_service, FINISHED_STATUSES
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ScheduleRunResponse])
+async def get_runs(
+    schedule_id: Optional[str] = Query(None, description="Фильтр по ID расписания")
+):
+    """
+    Получить список последних фоновых запусков расписаний.
+    """
+    runs = await run_blocking(run_service.list_runs, schedule_id)
+    return [run_service.snapshot(run) for run in runs]
+
+@router.get("/{run_id}", response_model=ScheduleRunResponse)
+async def get_run(run_id: str = Path(..., description="ID запуска")):
+    """
+    Получить состояние запуска и прогресс по таблицам.
+    """
+    run = await run_blocking(run_service.get_run, run_id)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запуск не найден")
+    
+    return run_service.snapshot(run)
+
+@router.get("/{run_id}/events")
+async def stream_run_events(
+    request: Request,
+    run_id: str = Path(..., description="ID запуска")
+):
+    """
+    Поток Server-Sent Events с состоянием запуска.
+    Событие отправляется при каждом изменении прогресса, поток закрывается по завершении запуска.
+    Запуск другого узла отслеживается по его сохраненному состоянию.
+    """
+    run = await run_blocking(run_service.get_run, run_id)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Запуск не найден")
+    
+    async def event_stream():
+        current = run
+        last_version = -1
+        while True:
+            if await request.is_disconnected():
+                break
+            
+            state = run_service.snapshot(current)
+            if state["version"] != last_version:
+                last_version = state["version"]
+                payload = json.dumps(jsonable_encoder(state), ensure_ascii=False)
+                yield f"event: progress\ndata: {payload}\n\n"
+            
+            # Завершение определяется по тому же снимку, что только что отправлен,
+            # поэтому итоговое состояние всегда уходит клиенту до события done
+            if state["status"] in FINISHED_STATUSES:
+                yield "event: done\ndata: {}\n\n"
+                break
+            
+            await asyncio.sleep(0.5)
+            if not run_service.is_local(current):
+                current = await run_blocking(run_service.get_run, run_id) or current
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,13 +1,19 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, HTTPException, status, Response, Depends, Query, Path
 import uuid
 from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleResponse
-from app.api.deps import get_db
+from app.core.executor import run_blocking, run_export
+from app.schemas.schedule import ScheduleCreate, ScheduleUpdate, ScheduleResponse, ScheduleLoadPlan
+from app.schemas.run import ScheduleRunResponse
+from app.api.deps import get_db, get_async_db
+from app.db.session import SessionLocal
 from app.models.sheet import Sheet
 from app.services.schedule_service import schedule_service
+from app.services.single_flight import single_flight, schedule_flight_key
+from app.services.run_service import run_service
 
 router = APIRouter()
 
@@ -34,13 +40,16 @@ async def create_schedule(
         )
     
     # Создаем расписание с помощью сервиса
-    schedule = schedule_service.create_schedule(
+    schedule = await run_blocking(
+        schedule_service.create_schedule,
         db=db,
         sheets_ids=schedule_data.sheets_ids,
         schedule_type=schedule_data.schedule_type,
         schedule_config=schedule_data.schedule_config,
         storage_configs=schedule_data.storage_configs,
-        is_active=schedule_data.is_active
+        is_active=schedule_data.is_active,
+        retention_policy=schedule_data.retention_policy,
+        backup_format=schedule_data.backup_format
     )
     
     if not schedule:
@@ -52,32 +61,43 @@ async def create_schedule(
     return schedule
 
 @router.get("/", response_model=List[ScheduleResponse])
-def get_schedules(
-    db: Session = Depends(get_db),
+async def get_schedules(
+    db: AsyncSession = Depends(get_async_db),
     sheet_id: Optional[str] = Query(None, description="Фильтр по ID таблицы")
 ):
     """
     Получить список всех расписаний.
     Может быть отфильтрован по ID таблицы.
     """
-    return schedule_service.get_all_schedules(db, sheet_id)
+    return await schedule_service.get_all_schedules_async(db, sheet_id)
+
+@router.get("/planner", response_model=ScheduleLoadPlan)
+async def get_schedules_load_plan(
+    hours: int = Query(24, ge=1, le=168, description="Горизонт прогноза в часах"),
+    db: Session = Depends(get_db)
+):
+    """
+    Прогноз количества одновременно выполняющихся бэкапов по минутам.
+    Показывает пиковую нагрузку со смещением запусков и без него.
+    """
+    return await run_blocking(schedule_service.get_load_plan, db, hours)
 
 @router.get("/{schedule_id}", response_model=ScheduleResponse)
-def get_schedule(
+async def get_schedule(
     schedule_id: str = Path(..., description="ID расписания"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить расписание по ID.
     """
-    schedule = schedule_service.get_schedule(db, schedule_id)
+    schedule = await schedule_service.get_schedule_async(db, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Расписание не найдено")
     
     return schedule
 
 @router.put("/{schedule_id}", response_model=ScheduleResponse)
-def update_schedule(
+async def update_schedule(
     schedule_data: ScheduleUpdate,
     schedule_id: str = Path(..., description="ID расписания"),
     db: Session = Depends(get_db)
@@ -100,14 +120,17 @@ def update_schedule(
         )
     
     # Обновляем расписание с помощью сервиса
-    schedule = schedule_service.update_schedule(
+    schedule = await run_blocking(
+        schedule_service.update_schedule,
         db=db,
         schedule_id=schedule_id,
         sheets_ids=schedule_data.sheets_ids,
         schedule_type=schedule_data.schedule_type,
         schedule_config=schedule_data.schedule_config,
         storage_configs=schedule_data.storage_configs,
-        is_active=schedule_data.is_active
+        is_active=schedule_data.is_active,
+        retention_policy=schedule_data.retention_policy,
+        backup_format=schedule_data.backup_format
     )
     
     if not schedule:
@@ -126,7 +149,7 @@ async def delete_schedule(
     """
     Удалить расписание.
     """
-    success = schedule_service.delete_schedule(db, schedule_id)
+    success = await run_blocking(schedule_service.delete_schedule, db, schedule_id)
     if not success:
         raise HTTPException(status_code=404, detail="Расписание не найдено")
     
@@ -134,17 +157,51 @@ async def delete_schedule(
 
 @router.post("/{schedule_id}/execute", status_code=status.HTTP_200_OK)
 async def execute_schedule(
-    schedule_id: str = Path(..., description="ID расписания"),
-    db: Session = Depends(get_db)
+    schedule_id: str = Path(..., description="ID расписания")
 ):
     """
     Немедленно выполнить расписание, создав бэкапы всех указанных таблиц.
     """
-    result = schedule_service.execute_schedule(db, schedule_id)
+    def run_schedule() -> Dict[str, Any]:
+        """
+        Выполнение расписания в собственной сессии БД: работа общая
+        для повторных нажатий и может пережить запрос, начавший ее
+        """
+        db = SessionLocal()
+        try:
+            return schedule_service.execute_schedule(db, schedule_id)
+        finally:
+            db.close()
+    
+    # Повторные нажатия присоединяются к уже выполняющемуся запуску
+    result = await single_flight.do(
+        schedule_flight_key(schedule_id),
+        lambda: run_export(run_schedule),
+        "schedule",
+        f"Расписание {schedule_id}"
+    )
     if not result.get("success", False):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=result.get("error", "Не удалось выполнить расписание")
         )
     
-    return result 
\ No newline at end of file
+    return result 
+
+@router.post("/{schedule_id}/runs", response_model=ScheduleRunResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_schedule_run(
+    schedule_id: str = Path(..., description="ID расписания"),
+    db: Session = Depends(get_db)
+):
+    """
+    Запустить расписание в фоне и сразу вернуть ID запуска.
+    Состояние доступно через GET /runs/{run_id} и поток событий GET /runs/{run_id}/events.
+    Если расписание уже выполняется, возвращается текущий запуск.
+    """
+    schedule = await run_blocking(schedule_service.get_schedule, db, schedule_id)
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Расписание не найдено")
+    
+    # Запуск сохраняется в БД до постановки в очередь
+    run = await run_blocking(run_service.start_schedule_run, schedule_id)
+    return run_service.snapshot(run)
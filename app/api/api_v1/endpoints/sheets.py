@@ -1,22 +1,40 @@
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.sheet import SheetCreate, SheetUpdate, SheetResponse
+from app.core.executor import run_blocking, run_export
+from app.schemas.sheet import SheetCreate, SheetUpdate, SheetResponse, ServiceAccountOut
 from app.services.google_service import google_service
-from app.api.deps import get_db
+from app.services.credentials_pool import credentials_pool
+from app.services.changes_service import drive_changes_poller
+from app.api.deps import get_db, get_async_db
 from app.models.sheet import Sheet
 
 router = APIRouter()
 
+def validate_credentials_id(credentials_id: Optional[str]) -> None:
+    """
+    Проверяет, что закрепляемый за таблицей сервисный аккаунт есть в пуле
+    """
+    if credentials_id and not credentials_pool.has(credentials_id):
+        available = ", ".join(account.id for account in credentials_pool.accounts()) or "нет"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Сервисный аккаунт {credentials_id} не найден. Доступные аккаунты: {available}"
+        )
+
 @router.post("/", response_model=SheetResponse, status_code=status.HTTP_201_CREATED)
 async def create_sheet(sheet: SheetCreate, db: Session = Depends(get_db)):
     """
     Создание новой таблицы для отслеживания
     """
+    await run_blocking(validate_credentials_id, sheet.credentials_id)
+    
     # Проверяем доступность таблицы через Google API
-    sheet_info = google_service.get_sheet_info(sheet.spreadsheet_id)
+    sheet_info = await run_export(google_service.get_sheet_title, sheet.spreadsheet_id, sheet.credentials_id)
     if not sheet_info:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,29 +46,58 @@ async def create_sheet(sheet: SheetCreate, db: Session = Depends(get_db)):
         name=sheet.name,
         spreadsheet_id=sheet.spreadsheet_id,
         credentials_id=sheet.credentials_id,
+        append_only=sheet.append_only,
         created_at=datetime.now()
     )
     
     # Сохраняем в базу данных
-    db.add(db_sheet)
-    db.commit()
-    db.refresh(db_sheet)
+    def save_sheet() -> None:
+        db.add(db_sheet)
+        db.commit()
+        db.refresh(db_sheet)
+    
+    await run_blocking(save_sheet)
     
     return db_sheet
 
 @router.get("/", response_model=List[SheetResponse])
-async def get_sheets(db: Session = Depends(get_db)):
+async def get_sheets(db: AsyncSession = Depends(get_async_db)):
     """
     Получение списка всех отслеживаемых таблиц
     """
-    return db.query(Sheet).all()
+    result = await db.execute(select(Sheet))
+    return result.scalars().all()
+
+@router.get("/credentials", response_model=List[ServiceAccountOut])
+async def get_service_accounts():
+    """
+    Сервисные аккаунты Google из пула: состояние и счетчики использования квоты
+    """
+    # При первом обращении пул загружает ключи с диска
+    return await run_blocking(credentials_pool.stats)
+
+@router.post("/credentials/reload", response_model=List[ServiceAccountOut])
+async def reload_service_accounts():
+    """
+    Повторная загрузка сервисных аккаунтов из каталога ключей
+    """
+    await run_blocking(credentials_pool.reload)
+    return await run_blocking(credentials_pool.stats)
+
+@router.post("/changes/poll", response_model=dict)
+async def poll_drive_changes():
+    """
+    Внеочередной опрос ленты изменений Google Drive
+    """
+    marked = await run_export(drive_changes_poller.poll)
+    return {"marked": marked}
 
 @router.get("/{sheet_id}", response_model=SheetResponse)
-async def get_sheet(sheet_id: str, db: Session = Depends(get_db)):
+async def get_sheet(sheet_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Получение информации об отслеживаемой таблице
     """
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+    sheet = await db.get(Sheet, sheet_id)
     if not sheet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,41 +111,53 @@ async def update_sheet(sheet_id: str, sheet_update: SheetUpdate, db: Session = D
     """
     Обновление информации об отслеживаемой таблице
     """
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
-    if not sheet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Таблица не найдена"
-        )
-    
-    # Обновляем поля таблицы
     update_data = sheet_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(sheet, field, value)
     
-    sheet.updated_at = datetime.now()
+    def save_sheet() -> Sheet:
+        sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+        if not sheet:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Таблица не найдена"
+            )
+        
+        # Обновляем поля таблицы
+        validate_credentials_id(update_data.get("credentials_id"))
+        for field, value in update_data.items():
+            setattr(sheet, field, value)
+        
+        # Другая таблица Google Sheets еще не попадала в бэкап
+        if "spreadsheet_id" in update_data:
+            sheet.dirty = True
+            sheet.changed_at = datetime.utcnow()
+        
+        sheet.updated_at = datetime.now()
+        
+        # Сохраняем изменения
+        db.commit()
+        db.refresh(sheet)
+        return sheet
     
-    # Сохраняем изменения
-    db.commit()
-    db.refresh(sheet)
-    
-    return sheet
+    return await run_blocking(save_sheet)
 
 @router.delete("/{sheet_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_sheet(sheet_id: str, db: Session = Depends(get_db)):
     """
     Удаление отслеживаемой таблицы
     """
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
-    if not sheet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Таблица не найдена"
-        )
+    def remove_sheet() -> None:
+        sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+        if not sheet:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Таблица не найдена"
+            )
+        
+        # Удаляем таблицу
+        db.delete(sheet)
+        db.commit()
     
-    # Удаляем таблицу
-    db.delete(sheet)
-    db.commit()
+    await run_blocking(remove_sheet)
     
     return None
 
@@ -107,7 +166,7 @@ async def verify_sheet_access(sheet_id: str, db: Session = Depends(get_db)):
     """
     Проверка доступа к таблице
     """
-    sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+    sheet = await run_blocking(db.get, Sheet, sheet_id)
     if not sheet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,7 +174,7 @@ async def verify_sheet_access(sheet_id: str, db: Session = Depends(get_db)):
         )
     
     # Проверяем доступ к таблице
-    sheet_info = google_service.get_sheet_info(sheet.spreadsheet_id)
+    sheet_info = await run_export(google_service.get_sheet_info, sheet.spreadsheet_id, sheet.credentials_id)
     if not sheet_info:
         return {
             "access": False,
@@ -125,7 +184,7 @@ async def verify_sheet_access(sheet_id: str, db: Session = Depends(get_db)):
     # Обновляем информацию о таблице
     sheet.name = sheet_info["title"]
     sheet.updated_at = datetime.now()
-    db.commit()
+    await run_blocking(db.commit)
     
     return {
         "access": True,
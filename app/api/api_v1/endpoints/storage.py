@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
+from app.core.executor import run_export
 from app.services.storage.bitrix_disk_storage import BitrixDiskStorage
 
 router = APIRouter()
@@ -23,14 +24,17 @@ async def get_bitrix_folders(request: BitrixWebhookRequest):
     Получение списка папок в Битрикс24 Диск
     """
     try:
-        # Создаем временный экземпляр хранилища для получения списка папок
-        storage = BitrixDiskStorage(
-            webhook_url=request.webhook_url,
-            folder_id=request.folder_id
-        )
+        def fetch_folders():
+            # Создаем временный экземпляр хранилища для получения списка папок
+            storage = BitrixDiskStorage(
+                webhook_url=request.webhook_url,
+                folder_id=request.folder_id
+            )
+            
+            # Получаем список папок
+            return storage.get_folder_list()
         
-        # Получаем список папок
-        folders = storage.get_folder_list()
+        folders = await run_export(fetch_folders)
         
         return folders
     except Exception as e:
@@ -1,7 +1,9 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from fastapi import Depends, HTTPException, status
-from app.db.session import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal, get_async_sessionmaker
 
 
 def get_db() -> Generator:
@@ -12,4 +14,12 @@ def get_db() -> Generator:
         db = SessionLocal()
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость для получения асинхронной сессии базы данных
+    """
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,95 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Потокобезопасный кеш в памяти процесса с временем жизни записей.
+
+    Используется для редко меняющихся данных из БД (настройки интеграций):
+    изменения на этом узле сбрасывают кеш явно, а изменения с других узлов
+    становятся видны не позже чем через ttl_seconds.
+    """
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 1024):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Номер сброса кеша: значение, загруженное до сброса, не сохраняется
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Значение из кеша или результат loader(), который сохраняется в кеш
+
+        Args:
+            key: Ключ записи
+            loader: Функция загрузки значения при промахе
+
+        Returns:
+            Значение (None тоже кешируется; исключение loader() пробрасывается и не кешируется)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            # Если во время загрузки кеш сбросили, значение могло устареть
+            if self._generation == generation:
+                self._store(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение в кеш
+
+        Args:
+            key: Ключ записи
+            value: Значение
+        """
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение и вытесняет давно не использовавшиеся записи (вызывается под блокировкой)
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Удаляет запись из кеша или очищает кеш целиком
+
+        Args:
+            key: Ключ записи (None - очистить весь кеш)
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика кеша
+
+        Returns:
+            Словарь с числом записей, попаданий и промахов
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
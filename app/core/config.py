@@ -16,12 +16,26 @@ class Settings(BaseSettings):
     
     # Пути к файлам
     CREDENTIALS_PATH: Path = Path("credentials/service-account.json")
+    # Каталог JSON-ключей пула сервисных аккаунтов (ID аккаунта - имя файла без расширения)
+    CREDENTIALS_DIR: Path = Path("credentials")
     
     # Настройки Google API
     GOOGLE_API_SCOPES: str = "https://www.googleapis.com/auth/spreadsheets.readonly"
     
     # База данных
     DATABASE_URL: str = "sqlite:///./data/app.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    
+    # Настройки SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    # Очередь записи фоновых задач в БД
+    DB_WRITER_ENABLED: bool = True
+    DB_WRITER_BATCH_SIZE: int = 50
+    DB_WRITER_FLUSH_INTERVAL_MS: int = 10
     
     # Настройки приложения
     PROJECT_NAME: str = "Backup Google Sheets"
@@ -32,6 +46,86 @@ class Settings(BaseSettings):
     BITRIX24_WEBHOOK_URL: Optional[str] = None
     BITRIX24_DEFAULT_FOLDER_ID: Optional[str] = None
     
+    # Объединение одновременных бэкапов одной таблицы; окно ожидания
+    # других запусков перед экспортом (0 - экспорт начинается сразу)
+    BACKUP_COALESCE_ENABLED: bool = True
+    BACKUP_COALESCE_WINDOW_SECONDS: float = 0.0
+    
+    # Разнесение одновременных запусков расписаний
+    SCHEDULER_JITTER_ENABLED: bool = False
+    SCHEDULER_JITTER_WINDOW_SECONDS: int = 300
+    SCHEDULER_PLANNER_SECONDS_PER_SHEET: int = 30
+    
+    # Распределенное выполнение расписаний на нескольких узлах
+    SCHEDULER_DISTRIBUTED: bool = False
+    SCHEDULER_NODE_ID: Optional[str] = None
+    SCHEDULER_LEASE_TTL_SECONDS: int = 120
+    SCHEDULER_LEASE_DEDUP_SECONDS: int = 60
+    SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS: float = 3.0
+    SCHEDULER_NODE_MAX_RUNS: int = 4
+    
+    # Адаптивные расписания: границы интервала по умолчанию (минуты)
+    ADAPTIVE_MIN_INTERVAL_MINUTES: int = 15
+    ADAPTIVE_MAX_INTERVAL_MINUTES: int = 10080
+    
+    # Пакетное сохранение записей о бэкапах запуска
+    BACKUP_PERSIST_BATCH_SIZE: int = 20
+    BACKUP_PERSIST_FLUSH_SECONDS: float = 5.0
+    
+    # Фоновое выполнение запусков расписаний
+    RUN_WORKERS: int = 4
+    RUN_HISTORY_LIMIT: int = 100
+    
+    # Пул блокирующих вызовов API и сторож цикла событий
+    BLOCKING_POOL_WORKERS: int = 16
+    BLOCKING_TASK_SLOW_SECONDS: float = 10.0
+    # Отдельный пул для экспорта таблиц и запросов к Google и Битрикс24
+    EXPORT_POOL_WORKERS: int = 4
+    EXPORT_TASK_SLOW_SECONDS: float = 120.0
+    LOOP_LAG_WATCHDOG_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD_MS: int = 200
+    LOOP_LAG_CHECK_INTERVAL_MS: int = 100
+    
+    # Хранение бэкапов: периодическая очистка по политикам расписаний
+    RETENTION_ENABLED: bool = True
+    RETENTION_INTERVAL_MINUTES: int = 60
+    RETENTION_DELETE_WORKERS: int = 4
+    RETENTION_DELETE_RATE_PER_SECOND: float = 5.0
+    RETENTION_MAX_ATTEMPTS: int = 5
+
+    # Кеш настроек интеграций
+    INTEGRATION_CACHE_TTL_SECONDS: float = 60.0
+    INTEGRATION_CACHE_MAX_ENTRIES: int = 256
+
+    # Кеш отображаемых метаданных таблиц Google Sheets (название и ссылка)
+    SHEET_METADATA_CACHE_TTL_SECONDS: float = 30.0
+    SHEET_METADATA_CACHE_MAX_ENTRIES: int = 1024
+
+    # Пакетное чтение значений листов (values.batchGet)
+    GOOGLE_VALUES_MAX_CELLS_PER_REQUEST: int = 500000
+    GOOGLE_VALUES_PARALLEL_REQUESTS: int = 4
+    # Параллельный CSV-экспорт листов (формат csv_export)
+    GOOGLE_EXPORT_PARALLEL_TABS: int = 8
+
+    # Parquet-файлы листов рядом с бэкапом (требуется пакет pyarrow)
+    BACKUP_PARQUET_ENABLED: bool = False
+
+    # Пул сервисных аккаунтов Google: частота запросов и пауза после исчерпания квоты
+    GOOGLE_ACCOUNT_RATE_PER_SECOND: float = 1.0
+    GOOGLE_ACCOUNT_COOLDOWN_SECONDS: float = 60.0
+
+    # Инкрементальные снимки таблиц-журналов (append_only): сверяемые строки
+    # в конце листа и максимальное число сегментов до следующего полного снимка
+    INCREMENTAL_TAIL_ROWS: int = 20
+    INCREMENTAL_MAX_SEGMENTS: int = 48
+
+    # Лента изменений Google Drive: бэкап по расписанию только измененных таблиц
+    DRIVE_CHANGES_ENABLED: bool = False
+    DRIVE_CHANGES_POLL_SECONDS: int = 60
+    DRIVE_CHANGES_BASE_URL: str = "https://www.googleapis.com/drive/v3"
+    DRIVE_CHANGES_SCOPE: str = "https://www.googleapis.com/auth/drive.metadata.readonly"
+    DRIVE_CHANGES_PAGE_SIZE: int = 1000
+
     # Настройки кодировки
     ENCODING: str = "utf-8"
     
@@ -0,0 +1,241 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingExecutor:
+    """
+    Ограниченный пул потоков для блокирующих вызовов из асинхронных эндпоинтов.
+
+    Используются два пула: общий - для коротких запросов к БД и файлам,
+    и отдельный - для экспорта таблиц и запросов к Google и Битрикс24,
+    чтобы долгие внешние вызовы не занимали потоки коротких запросов.
+
+    Пул собирает статистику: число выполняющихся и ожидающих задач,
+    время ожидания в очереди и длительность выполнения.
+    """
+    def __init__(self, max_workers: int = 16, slow_task_seconds: float = 10.0, name: str = "blocking"):
+        self.max_workers = max_workers
+        self.slow_task_seconds = slow_task_seconds
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_wait = 0.0
+        self._max_duration = 0.0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполняет блокирующую функцию в пуле, не блокируя цикл событий
+
+        Args:
+            func: Блокирующая функция
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат функции (исключения пробрасываются вызывающему)
+        """
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._queued += 1
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(self._call, func, submitted_at, args, kwargs)
+        )
+
+    def _call(self, func: Callable[..., Any], submitted_at: float, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._max_wait = max(self._max_wait, started_at - submitted_at)
+
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.monotonic() - started_at
+            with self._lock:
+                self._active -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._max_duration = max(self._max_duration, duration)
+
+            if duration > self.slow_task_seconds:
+                name = getattr(func, "__qualname__", repr(func))
+                logger.warning(f"Блокирующая задача {name} (пул {self.name}) выполнялась {duration:.1f} с")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика пула
+
+        Returns:
+            Словарь со счетчиками задач и временем ожидания/выполнения
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_wait_ms": round(self._max_wait * 1000, 1),
+                "max_duration_ms": round(self._max_duration * 1000, 1)
+            }
+
+    def shutdown(self) -> None:
+        """Останавливает пул потоков"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LoopLagWatchdog:
+    """
+    Сторож цикла событий: замечает корутины, блокирующие цикл дольше порога.
+
+    Корутина-тикер регулярно отмечается в цикле и измеряет опоздание своего
+    пробуждения. Отдельный поток следит за отметками и, если цикл завис,
+    пишет в лог стек потока цикла, чтобы было видно, какой вызов его блокирует.
+    """
+    def __init__(self, threshold_ms: int = 200, interval_ms: int = 100):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._stall_reported = False
+        self.stalls = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self) -> None:
+        """
+        Запускает сторож; вызывается из работающего цикла событий
+        """
+        if self._task:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Сторож цикла событий запущен, порог {self.threshold * 1000:.0f} мс")
+
+    def stop(self) -> None:
+        """Останавливает сторож"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _tick(self) -> None:
+        while True:
+            started_at = time.monotonic()
+            self._last_tick = started_at
+            self._stall_reported = False
+            await asyncio.sleep(self.interval)
+
+            lag = max(0.0, time.monotonic() - started_at - self.interval)
+            self.last_lag_ms = lag * 1000
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+            if lag > self.threshold:
+                self.stalls += 1
+                logger.warning(f"Цикл событий был заблокирован на {lag * 1000:.0f} мс")
+
+    def _monitor(self) -> None:
+        while not self._stopped.wait(self.interval):
+            blocked = time.monotonic() - self._last_tick - self.interval
+            if blocked <= self.threshold or self._stall_reported:
+                continue
+
+            self._stall_reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "стек недоступен"
+            logger.warning(
+                f"Цикл событий заблокирован более {blocked * 1000:.0f} мс, текущий стек:\n{stack}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Статистика задержек цикла событий
+
+        Returns:
+            Словарь с последней и максимальной задержкой и числом зависаний
+        """
+        return {
+            "threshold_ms": round(self.threshold * 1000),
+            "last_lag_ms": round(self.last_lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls": self.stalls
+        }
+
+
+# Создаем глобальные экземпляры
+blocking_executor = BlockingExecutor(
+    max_workers=settings.BLOCKING_POOL_WORKERS,
+    slow_task_seconds=settings.BLOCKING_TASK_SLOW_SECONDS
+)
+export_executor = BlockingExecutor(
+    max_workers=settings.EXPORT_POOL_WORKERS,
+    slow_task_seconds=settings.EXPORT_TASK_SLOW_SECONDS,
+    name="export"
+)
+loop_watchdog = LoopLagWatchdog(
+    threshold_ms=settings.LOOP_LAG_THRESHOLD_MS,
+    interval_ms=settings.LOOP_LAG_CHECK_INTERVAL_MS
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Выполняет блокирующую функцию в общем пуле блокирующих вызовов
+
+    Args:
+        func: Блокирующая функция
+        *args: Позиционные аргументы функции
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    return await blocking_executor.run(func, *args, **kwargs)
+
+
+async def run_export(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Выполняет долгую функцию (экспорт таблицы, запросы к Google и Битрикс24)
+    в отдельном ограниченном пуле
+
+    Args:
+        func: Блокирующая функция
+        *args: Позиционные аргументы функции
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    return await export_executor.run(func, *args, **kwargs)
@@ -0,0 +1,36 @@
+import time
+import threading
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Потокобезопасный ограничитель частоты операций (token bucket).
+
+    Токены пополняются со скоростью rate_per_second, не более burst штук;
+    acquire() блокирует вызывающий поток, пока токен не освободится.
+    """
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None):
+        self.rate = rate_per_second
+        self.capacity = burst or max(1, int(rate_per_second))
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Получает один токен, ожидая его пополнения при необходимости
+        """
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
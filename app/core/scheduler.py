@@ -7,11 +7,19 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.memory import MemoryJobStore
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.triggers import OffsetTrigger, schedule_jitter_offset, trigger_period_seconds
 from app.core.sheets_service import create_backup
 from app.models.schedule import Schedule
 from app.models.sheet import Sheet
 from app.api.deps import get_db
+from app.db.session import SessionLocal
+from app.db.writer import get_background_writer
 from app.services.backup_service import backup_sheets
+from app.services.lease_service import lease_service
+from app.services.adaptive_service import get_adaptive_bounds, load_schedule_states, record_schedule_backups, select_due_sheets
+from app.services.retention_service import retention_service
+from app.services.changes_service import drive_changes_poller, claim_dirty_sheets, restore_dirty
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +30,7 @@ class SchedulerService:
         self.scheduler = BackgroundScheduler()
         self.scheduler.add_jobstore(MemoryJobStore(), 'default')
         self.scheduler.start()
+        self._schedule_versions: Dict[str, datetime] = {}
         logger.info("Планировщик задач запущен")
     
     def add_multi_sheet_schedule(self, schedule: Schedule, db: Session) -> str:
@@ -47,16 +56,34 @@ class SchedulerService:
                 return None
             
             # Формируем триггер в зависимости от типа расписания
-            trigger = self._create_trigger(schedule.schedule_type, schedule.schedule_config)
+            trigger = self._create_trigger(schedule.schedule_type, schedule.schedule_config, schedule.id)
             if not trigger:
                 logger.error(f"Не удалось создать триггер для расписания {schedule.id}")
                 return None
             
+            # Окно дедупликации запуска на узлах меньше периода расписания,
+            # иначе короткие интервальные расписания пропускали бы запуски
+            dedup_seconds = self._lease_dedup_seconds(trigger)
+            
             # Функция для выполнения задачи с несколькими таблицами
-            def multi_backup_job(schedule_id: str, db: Session):
+            def multi_backup_job(schedule_id: str, claimed: bool = False):
                 """
-                Задача для создания бэкапов по расписанию для нескольких таблиц
+                Задача для создания бэкапов по расписанию для нескольких таблиц.
+                Каждый запуск работает в своей сессии, записи о бэкапах
+                сохраняются через общую очередь записи.
                 """
+                # В распределенном режиме запуск выполняет только узел, захвативший аренду
+                distributed = settings.SCHEDULER_DISTRIBUTED
+                if distributed and not claimed and not lease_service.try_claim(schedule_id, dedup_seconds):
+                    logger.info(f"Запуск расписания {schedule_id} выполняется другим узлом")
+                    return
+                
+                heartbeat = lease_service.heartbeat(schedule_id) if distributed else None
+                db = SessionLocal()
+                # Таблицы, отобранные по ленте изменений, и результаты их бэкапа
+                claimed_changes = {}
+                results = []
+                
                 try:
                     logger.info(f"Запуск бэкапа по расписанию {schedule_id}")
                     
@@ -74,28 +101,60 @@ class SchedulerService:
                         logger.error(f"Не найдены некоторые таблицы для расписания {schedule_id}")
                         return
                     
+                    # Адаптивное расписание: бэкапим только таблицы с истекшим интервалом
+                    if schedule.schedule_type == "adaptive":
+                        states = load_schedule_states(db, schedule_id, [sheet.id for sheet in sheets])
+                        sheets = select_due_sheets(sheets, schedule.schedule_config, states)
+                        if not sheets:
+                            logger.info(f"По адаптивному расписанию {schedule_id} нет таблиц для бэкапа")
+                            return
+                    
+                    # По ленте изменений Google Drive бэкапим только измененные таблицы
+                    if settings.DRIVE_CHANGES_ENABLED:
+                        sheets, claimed_changes = claim_dirty_sheets(db, schedule_id, sheets)
+                        if not sheets:
+                            logger.info(f"По расписанию {schedule_id} нет измененных таблиц для бэкапа")
+                            return
+                    
                     # Создаем бэкапы для всех таблиц
                     sheets_data = []
                     for sheet in sheets:
                         sheets_data.append({
                             "id": sheet.id,
                             "name": sheet.name,
-                            "spreadsheet_id": sheet.spreadsheet_id
+                            "spreadsheet_id": sheet.spreadsheet_id,
+                            "credentials_id": sheet.credentials_id,
+                            "append_only": bool(sheet.append_only)
                         })
                     
                     results = backup_sheets(
                         sheets=sheets_data,
                         storage_configs=schedule.storage_configs,
-                        db=db
+                        db=db,
+                        writer=get_background_writer(),
+                        backup_format=schedule.backup_format
                     )
                     
                     # Подсчитываем статистику выполнения
                     success_count = sum(1 for r in results if r.get("success", False))
                     logger.info(f"Бэкап по расписанию {schedule_id} завершен. Успешно: {success_count}/{len(sheets)}")
                     
+                    # Интервалы таблиц адаптивного расписания в его границах
+                    record_schedule_backups(db, schedule, results)
+                    
                 except Exception as e:
                     logger.error(f"Ошибка при выполнении бэкапа по расписанию {schedule_id}: {str(e)}")
                     logger.exception(e)
+                finally:
+                    # Неудавшиеся таблицы (все, если запуск прервался) остаются измененными до следующего запуска
+                    succeeded = {r["sheet_id"] for r in results if r.get("success", False)}
+                    restore_dirty(db, schedule_id, {
+                        sheet_id: seen_at for sheet_id, seen_at in claimed_changes.items() if sheet_id not in succeeded
+                    })
+                    db.close()
+                    if heartbeat:
+                        heartbeat.stopped.set()
+                        lease_service.release(schedule_id)
             
             # Добавляем задачу в планировщик
             job = self.scheduler.add_job(
@@ -104,7 +163,7 @@ class SchedulerService:
                 id=f"backup_{schedule.id}",
                 replace_existing=True,
                 misfire_grace_time=3600,  # 1 час
-                args=[schedule.id, db]
+                args=[schedule.id]
             )
             
             logger.info(f"Добавлено расписание {schedule.id} для {len(sheets)} таблиц")
@@ -138,15 +197,18 @@ class SchedulerService:
             return None
         
         # Формируем триггер в зависимости от типа расписания
-        trigger = self._create_trigger(schedule.schedule_type, schedule.schedule_config)
+        trigger = self._create_trigger(schedule.schedule_type, schedule.schedule_config, schedule.id)
         if not trigger:
             logger.error(f"Не удалось создать триггер для расписания {schedule.id}")
             return None
         
         # Функция для выполнения задачи
-        def backup_job(schedule_id: str, db: Session):
+        def backup_job(schedule_id: str, db: Session, claimed: bool = False):
             """
             Задача для создания бэкапа по расписанию
+            
+            claimed - запуск захвачен узлом при восстановлении после сбоя другого узла;
+            аренда освобождается после выполнения
             """
             try:
                 logger.info(f"Запуск бэкапа по расписанию {schedule_id}")
@@ -169,7 +231,8 @@ class SchedulerService:
                     spreadsheet_id=sheet.spreadsheet_id,
                     sheet_name=sheet.name,
                     storage_configs=schedule.storage_configs,
-                    db=db
+                    db=db,
+                    credentials_id=sheet.credentials_id
                 )
                 
                 if not backup:
@@ -181,6 +244,9 @@ class SchedulerService:
             except Exception as e:
                 logger.error(f"Ошибка при выполнении бэкапа по расписанию {schedule_id}: {str(e)}")
                 logger.exception(e)
+            finally:
+                if claimed:
+                    lease_service.release(schedule_id)
         
         # Добавляем задачу в планировщик
         job = self.scheduler.add_job(
@@ -233,13 +299,21 @@ class SchedulerService:
         except Exception as e:
             logger.warning(f"Не удалось удалить расписание {schedule_id}: {str(e)}")
     
-    def _create_trigger(self, schedule_type: str, config: Dict[str, Any]) -> Optional[Any]:
+    def _create_trigger(
+        self,
+        schedule_type: str,
+        config: Dict[str, Any],
+        schedule_id: Optional[str] = None,
+        apply_jitter: bool = True
+    ) -> Optional[Any]:
         """
         Создает триггер на основе типа расписания и конфигурации
         
         Args:
-            schedule_type: Тип расписания ('interval' или 'cron')
+            schedule_type: Тип расписания ('interval', 'cron' или 'adaptive')
             config: Конфигурация расписания
+            schedule_id: ID расписания (для вычисления стабильного смещения запуска)
+            apply_jitter: Применять ли смещение запуска, если оно включено в настройках
             
         Returns:
             Триггер для планировщика или None в случае ошибки
@@ -259,7 +333,20 @@ class SchedulerService:
                     # Если не указаны параметры, используем значение по умолчанию (1 день)
                     interval_params["days"] = 1
                 
-                return IntervalTrigger(**interval_params)
+                trigger = IntervalTrigger(**interval_params)
+                
+                # Смещение не должно превышать сам интервал
+                window = min(
+                    settings.SCHEDULER_JITTER_WINDOW_SECONDS,
+                    int(trigger.interval.total_seconds())
+                )
+            
+            elif schedule_type == "adaptive":
+                # Задача срабатывает с минимальным интервалом, а нужные таблицы
+                # отбираются по их эффективному интервалу при каждом запуске
+                min_minutes, _ = get_adaptive_bounds(config)
+                trigger = IntervalTrigger(minutes=min_minutes)
+                window = min(settings.SCHEDULER_JITTER_WINDOW_SECONDS, min_minutes * 60)
             
             elif schedule_type == "cron":
                 # Параметры для cron-триггера
@@ -271,16 +358,150 @@ class SchedulerService:
                         if field in cron_dict and cron_dict[field]:
                             cron_params[field] = cron_dict[field]
                 
-                return CronTrigger(**cron_params)
+                trigger = CronTrigger(**cron_params)
+                window = settings.SCHEDULER_JITTER_WINDOW_SECONDS
             
             else:
                 logger.error(f"Неизвестный тип расписания: {schedule_type}")
                 return None
+            
+            # Разносим одновременные запуски на стабильное смещение внутри окна
+            if (
+                apply_jitter
+                and settings.SCHEDULER_JITTER_ENABLED
+                and schedule_id
+                and config.get("jitter", True)
+            ):
+                offset = schedule_jitter_offset(schedule_id, window)
+                if offset:
+                    trigger = OffsetTrigger(trigger, offset)
+            
+            return trigger
         
         except Exception as e:
             logger.error(f"Ошибка при создании триггера: {str(e)}")
             return None
     
+    def sync_schedules(self) -> None:
+        """
+        Синхронизирует задачи планировщика с расписаниями в БД
+        (в распределенном режиме расписания могут меняться через другие узлы).
+        Каждая синхронизация работает в своей сессии.
+        """
+        db = SessionLocal()
+        try:
+            schedules = db.query(Schedule).filter(Schedule.is_active == True).all()
+            active_ids = set()
+            
+            for schedule in schedules:
+                active_ids.add(schedule.id)
+                version = schedule.updated_at or schedule.created_at
+                if self._schedule_versions.get(schedule.id) != version or not self.scheduler.get_job(f"backup_{schedule.id}"):
+                    self.update_schedule(schedule, db)
+                    self._schedule_versions[schedule.id] = version
+            
+            for schedule_id in list(self._schedule_versions):
+                if schedule_id not in active_ids:
+                    self.remove_schedule(schedule_id)
+                    del self._schedule_versions[schedule_id]
+        except Exception as e:
+            logger.error(f"Ошибка при синхронизации расписаний: {str(e)}")
+        finally:
+            db.close()
+    
+    def recover_orphaned_schedules(self) -> None:
+        """
+        Повторно выполняет расписания, чей узел перестал работать во время запуска
+        (используется в распределенном режиме)
+        """
+        for schedule_id in lease_service.claim_orphaned():
+            job = self.scheduler.get_job(f"backup_{schedule_id}")
+            if not job:
+                logger.warning(f"Задача для расписания {schedule_id} не найдена на узле {lease_service.node_id}")
+                lease_service.release(schedule_id)
+                continue
+            
+            try:
+                job.func(*job.args, claimed=True)
+            except Exception as e:
+                logger.error(f"Ошибка при восстановлении запуска расписания {schedule_id}: {str(e)}")
+                lease_service.release(schedule_id)
+    
+    def _lease_dedup_seconds(self, trigger: Any) -> Optional[float]:
+        """
+        Окно дедупликации запуска расписания на узлах: SCHEDULER_LEASE_DEDUP_SECONDS,
+        но не больше половины периода триггера
+        """
+        try:
+            period = trigger_period_seconds(trigger)
+        except Exception as e:
+            logger.warning(f"Не удалось определить период триггера {trigger}: {str(e)}")
+            return None
+        if period is None:
+            return None
+        return min(settings.SCHEDULER_LEASE_DEDUP_SECONDS, period / 2)
+    
+    def plan_load(self, schedules: List[Schedule], hours: int = 24) -> Dict[str, Any]:
+        """
+        Прогноз количества одновременно выполняющихся задач по минутам
+        
+        Длительность задачи оценивается по количеству таблиц в расписании
+        (SCHEDULER_PLANNER_SECONDS_PER_SHEET на таблицу).
+        
+        Args:
+            schedules: Список активных расписаний
+            hours: Горизонт прогноза в часах
+            
+        Returns:
+            Словарь с пиковой нагрузкой (со смещением и без) и нагрузкой по минутам
+        """
+        now = datetime.now(self.scheduler.timezone)
+        horizon = now + timedelta(hours=hours)
+        
+        def minute_load(apply_jitter: bool) -> Dict[datetime, int]:
+            load: Dict[datetime, int] = {}
+            for schedule in schedules:
+                trigger = self._create_trigger(
+                    schedule.schedule_type,
+                    schedule.schedule_config,
+                    schedule.id,
+                    apply_jitter=apply_jitter
+                )
+                if not trigger:
+                    continue
+                
+                sheets_count = len(schedule.sheets_ids or [])
+                duration_minutes = max(
+                    1,
+                    -(-sheets_count * settings.SCHEDULER_PLANNER_SECONDS_PER_SHEET // 60)
+                )
+                
+                fire_time = trigger.get_next_fire_time(None, now)
+                fires = 0
+                while fire_time and fire_time < horizon and fires < 10000:
+                    minute = fire_time.replace(second=0, microsecond=0)
+                    for i in range(duration_minutes):
+                        slot = minute + timedelta(minutes=i)
+                        load[slot] = load.get(slot, 0) + 1
+                    fires += 1
+                    fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+            return load
+        
+        load = minute_load(apply_jitter=True)
+        load_without_jitter = minute_load(apply_jitter=False)
+        
+        return {
+            "jitter_enabled": settings.SCHEDULER_JITTER_ENABLED,
+            "jitter_window_seconds": settings.SCHEDULER_JITTER_WINDOW_SECONDS,
+            "horizon_hours": hours,
+            "peak_concurrency": max(load.values(), default=0),
+            "peak_concurrency_without_jitter": max(load_without_jitter.values(), default=0),
+            "minutes": [
+                {"minute": minute, "jobs": jobs}
+                for minute, jobs in sorted(load.items())
+            ]
+        }
+    
     def shutdown(self):
         """Останавливает планировщик"""
         if self.scheduler.running:
@@ -311,6 +532,46 @@ def init_schedules(db: Session):
                 scheduler_service.add_multi_sheet_schedule(schedule, db)
             else:
                 scheduler_service.add_schedule(schedule, db)
+            scheduler_service._schedule_versions[schedule.id] = schedule.updated_at or schedule.created_at
+        
+        # В распределенном режиме периодически подхватываем изменения расписаний
+        # с других узлов и запуски упавших узлов
+        if settings.SCHEDULER_DISTRIBUTED:
+            scheduler_service.scheduler.add_job(
+                scheduler_service.sync_schedules,
+                trigger=IntervalTrigger(seconds=settings.SCHEDULER_LEASE_TTL_SECONDS),
+                id="schedules_sync",
+                replace_existing=True,
+                max_instances=1
+            )
+            scheduler_service.scheduler.add_job(
+                scheduler_service.recover_orphaned_schedules,
+                trigger=IntervalTrigger(seconds=settings.SCHEDULER_LEASE_TTL_SECONDS),
+                id="lease_recovery",
+                replace_existing=True
+            )
+            logger.info(f"Распределенный режим включен, ID узла: {lease_service.node_id}")
+        
+        # Периодическая очистка старых бэкапов по политикам хранения;
+        # журнал удалений не дает узлам удалить один бэкап дважды
+        if settings.RETENTION_ENABLED:
+            scheduler_service.scheduler.add_job(
+                retention_service.run,
+                trigger=IntervalTrigger(minutes=settings.RETENTION_INTERVAL_MINUTES),
+                id="backup_retention",
+                replace_existing=True,
+                max_instances=1
+            )
+        
+        # Опрос ленты изменений Google Drive помечает измененные таблицы
+        if settings.DRIVE_CHANGES_ENABLED:
+            scheduler_service.scheduler.add_job(
+                drive_changes_poller.poll,
+                trigger=IntervalTrigger(seconds=settings.DRIVE_CHANGES_POLL_SECONDS),
+                id="drive_changes_poll",
+                replace_existing=True,
+                max_instances=1
+            )
         
         logger.info(f"Инициализировано {len(schedules)} расписаний")
     
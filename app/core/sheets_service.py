@@ -7,24 +7,28 @@ from datetime import datetime
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 from app.models.backup import Backup
+from app.models.backup_location import BackupLocation
 from app.services.google_service import google_service
 from app.services.storage import get_storage
 from app.services.backup_service import backup_sheet
+from app.services.backup_stats_service import apply_backup_inserts
+from app.services.backup_persistence import location_values, storage_results_of
 
 logger = logging.getLogger(__name__)
 
-def get_spreadsheet_data(spreadsheet_id: str):
+def get_spreadsheet_data(spreadsheet_id: str, credentials_id: Optional[str] = None):
     """
     Получает данные из Google Sheets, используя сервис
     """
-    return google_service.get_sheet_values_by_sheets(spreadsheet_id)
+    return google_service.get_sheet_values_by_sheets(spreadsheet_id, credentials_id)
 
 def create_backup(
     sheet_id: str, 
     spreadsheet_id: str, 
     sheet_name: str, 
     storage_configs: List[Dict[str, Any]],
-    db: Session
+    db: Session,
+    credentials_id: Optional[str] = None
 ):
     """
     Создает бэкап таблицы Google Sheets
@@ -35,6 +39,7 @@ def create_backup(
         sheet_name: Название таблицы
         storage_configs: Список конфигураций хранилищ
         db: Сессия базы данных
+        credentials_id: ID сервисного аккаунта таблицы
     
     Returns:
         Созданный объект бэкапа
@@ -47,7 +52,8 @@ def create_backup(
             sheet_id=spreadsheet_id,
             sheet_name=sheet_name,
             storage_configs=storage_configs,
-            db=db
+            db=db,
+            credentials_id=credentials_id
         )
         
         if not backup_result:
@@ -67,7 +73,12 @@ def create_backup(
             created_at=datetime.utcnow()
         )
         
+        backup.locations = [
+            BackupLocation(**location_values(result, backup.created_at))
+            for result in storage_results_of(backup)
+        ]
         db.add(backup)
+        apply_backup_inserts(db, [backup])
         db.commit()
         db.refresh(backup)
         
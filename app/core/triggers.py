@@ -0,0 +1,74 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from apscheduler.triggers.base import BaseTrigger
+
+
+def schedule_jitter_offset(schedule_id: str, window_seconds: int) -> int:
+    """
+    Стабильное смещение запуска расписания, вычисляемое из его ID
+
+    Args:
+        schedule_id: ID расписания
+        window_seconds: Ширина окна разброса в секундах
+
+    Returns:
+        int: Смещение в секундах в диапазоне [0, window_seconds)
+    """
+    if not schedule_id or window_seconds <= 0:
+        return 0
+
+    digest = hashlib.sha256(str(schedule_id).encode("utf-8")).hexdigest()
+    return int(digest, 16) % window_seconds
+
+
+def trigger_period_seconds(trigger: BaseTrigger, now: Optional[datetime] = None, samples: int = 5) -> Optional[float]:
+    """
+    Наименьший промежуток между ближайшими срабатываниями триггера
+
+    Args:
+        trigger: Триггер APScheduler
+        now: Момент, от которого считаются срабатывания (по умолчанию текущее время)
+        samples: Сколько промежутков между срабатываниями проверяется
+
+    Returns:
+        float или None: Промежуток в секундах или None, если триггер срабатывает не более раза
+    """
+    fire_time = trigger.get_next_fire_time(None, now or datetime.now(timezone.utc))
+    gaps = []
+    for _ in range(samples):
+        if fire_time is None:
+            break
+        next_fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+        if next_fire_time is None:
+            break
+        gaps.append((next_fire_time - fire_time).total_seconds())
+        fire_time = next_fire_time
+    return min(gaps) if gaps else None
+
+
+class OffsetTrigger(BaseTrigger):
+    """
+    Триггер, сдвигающий все срабатывания вложенного триггера на фиксированное смещение.
+
+    В отличие от встроенного jitter в APScheduler смещение детерминировано,
+    поэтому средняя частота и расписание запусков остаются предсказуемыми.
+    """
+
+    __slots__ = ("trigger", "offset")
+
+    def __init__(self, trigger: BaseTrigger, offset_seconds: int):
+        self.trigger = trigger
+        self.offset = timedelta(seconds=offset_seconds)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        previous = previous_fire_time - self.offset if previous_fire_time else None
+        next_fire_time = self.trigger.get_next_fire_time(previous, now - self.offset)
+        return next_fire_time + self.offset if next_fire_time else None
+
+    def __str__(self):
+        return f"{self.trigger} +{int(self.offset.total_seconds())}s"
+
+    def __repr__(self):
+        return f"<OffsetTrigger ({self.trigger!r}, offset={int(self.offset.total_seconds())}s)>"
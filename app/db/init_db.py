@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 
 from app.db.base import Base
 from app.db.session import engine
+from app.db.migrations import upgrade_schema
+from app.services.backup_stats_service import ensure_stats_initialized
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +12,7 @@ logger = logging.getLogger(__name__)
 def init_db(db: Session) -> None:
     """
     Инициализация базы данных.
-    Создает таблицы, если они не существуют.
+    Создает таблицы, если они не существуют, и обновляет схему существующих.
     
     Args:
         db: Сессия базы данных
@@ -18,6 +20,12 @@ def init_db(db: Session) -> None:
     try:
         # Создаем все таблицы
         Base.metadata.create_all(bind=engine)
+        
+        # Добавляем новые колонки и индексы в уже существующие таблицы
+        upgrade_schema(engine)
+        
+        # Заполняем статистику бэкапов, если база создана до ее появления
+        ensure_stats_initialized(db)
         logger.info("База данных инициализирована успешно")
     except Exception as e:
         logger.error(f"Ошибка при инициализации базы данных: {str(e)}")
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text, select, insert, MetaData, Table, Column, String, DateTime
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.db.base import Base
+
+logger = logging.getLogger(__name__)
+
+
+# Примененные шаги обновления схемы (отдельно от метаданных моделей)
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """
+    Добавляет в существующие таблицы колонки, появившиеся в моделях.
+    Колонки добавляются как NULL-допустимые, значения по умолчанию
+    подставляет SQLAlchemy при вставке новых строк.
+    """
+    inspector = inspect(engine)
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                ))
+            logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+
+def _create_missing_indexes(engine: Engine) -> None:
+    """
+    Создает индексы, объявленные в моделях, если их еще нет в базе данных
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _migrate_backup_locations(engine: Engine, batch_size: int = 1000) -> None:
+    """
+    Переносит копии бэкапов из JSON-поля storage_results в таблицу backup_locations.
+    Обрабатываются только бэкапы без записей о копиях, поэтому шаг можно повторять.
+    """
+    import uuid
+    from sqlalchemy import select, insert, exists
+    from app.models.backup import Backup
+    from app.models.backup_location import BackupLocation
+    from app.services.backup_persistence import location_values, storage_results_of
+
+    without_locations = (
+        select(
+            Backup.id, Backup.storage_type, Backup.storage_params, Backup.file_path,
+            Backup.size, Backup.storage_results, Backup.created_at
+        )
+        .where(~exists().where(BackupLocation.backup_id == Backup.id))
+        .limit(batch_size)
+    )
+
+    migrated = 0
+    while True:
+        with engine.begin() as connection:
+            backups = connection.execute(without_locations).mappings().all()
+            if not backups:
+                break
+            connection.execute(insert(BackupLocation), [
+                {"id": str(uuid.uuid4()), "backup_id": backup["id"], **location_values(result, backup["created_at"])}
+                for backup in backups
+                for result in storage_results_of(dict(backup))
+            ])
+        migrated += len(backups)
+
+    if migrated:
+        logger.info(f"Копии {migrated} бэкапов перенесены в таблицу backup_locations")
+
+
+def _backfill_location_kind(engine: Engine) -> None:
+    """
+    Помечает копии, созданные до появления колонки kind, как файлы бэкапов
+    """
+    with engine.begin() as connection:
+        result = connection.execute(text(
+            "UPDATE backup_locations SET kind = 'backup' WHERE kind IS NULL"
+        ))
+    if result.rowcount:
+        logger.info(f"Обновлен вид {result.rowcount} копий бэкапов")
+
+
+def _purge_completed_deletions(engine: Engine) -> None:
+    """
+    Удаляет завершенные записи журнала удалений (их бэкапы уже удалены)
+    """
+    with engine.begin() as connection:
+        result = connection.execute(text(
+            "DELETE FROM backup_deletions WHERE status = 'completed'"
+        ))
+    if result.rowcount:
+        logger.info(f"Удалено завершенных записей журнала удалений: {result.rowcount}")
+
+
+def _sync_model_schema(engine: Engine) -> None:
+    """
+    Добавляет недостающие колонки и индексы моделей
+    """
+    _add_missing_columns(engine)
+    _create_missing_indexes(engine)
+
+
+def _schema_fingerprint(engine: Engine) -> str:
+    """
+    Отпечаток схемы моделей: таблицы, колонки с типами и индексы.
+    Меняется при любом изменении моделей, затрагивающем схему.
+    """
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(f"column {table.name}.{column.name} {column.type.compile(dialect=engine.dialect)}")
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            parts.append(f"index {index.name} {','.join(column.name for column in index.columns)}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+# Шаги переноса данных в порядке выполнения; каждый выполняется один раз.
+# Имя шага не меняется после выпуска, новые шаги добавляются в конец списка.
+DATA_MIGRATIONS = [
+    ("0001_backup_locations", _migrate_backup_locations),
+    ("0002_backup_location_kind", _backfill_location_kind),
+    ("0003_purge_completed_deletions", _purge_completed_deletions),
+]
+
+
+def _applied_migrations(engine: Engine) -> set:
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.name)).scalars())
+
+
+def _record_migration(engine: Engine, name: str) -> None:
+    try:
+        with engine.begin() as connection:
+            connection.execute(insert(schema_migrations).values(name=name, applied_at=datetime.utcnow()))
+    except IntegrityError:
+        # Шаг одновременно выполнил и записал другой узел; шаги идемпотентны
+        logger.info(f"Шаг обновления схемы {name} уже записан другим узлом")
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Обновление схемы существующей базы данных до текущих моделей.
+
+    Примененные шаги записываются в таблицу schema_migrations, поэтому каждый
+    шаг выполняется один раз. Сверка колонок и индексов с моделями выполняется
+    один раз для каждой версии схемы моделей (по ее отпечатку).
+
+    Args:
+        engine: Движок SQLAlchemy
+    """
+    schema_migrations.create(bind=engine, checkfirst=True)
+    applied = _applied_migrations(engine)
+
+    steps = [(f"schema_{_schema_fingerprint(engine)}", _sync_model_schema), *DATA_MIGRATIONS]
+    for name, step in steps:
+        if name in applied:
+            continue
+        step(engine)
+        _record_migration(engine, name)
+        logger.info(f"Применен шаг обновления схемы {name}")
@@ -1,21 +1,128 @@
 import os
-from sqlalchemy import create_engine
+import threading
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
+database_url = make_url(settings.DATABASE_URL)
+is_sqlite = database_url.get_backend_name() == "sqlite"
+is_sqlite_file = is_sqlite and database_url.database not in (None, "", ":memory:")
+
 # Создаем директорию для базы данных, если она не существует
-os.makedirs(os.path.dirname(settings.DATABASE_URL), exist_ok=True)
+if is_sqlite_file:
+    os.makedirs(os.path.dirname(os.path.abspath(database_url.database)), exist_ok=True)
+
+engine_kwargs = {}
+if is_sqlite:
+    engine_kwargs["connect_args"] = {"check_same_thread": False}
+if not is_sqlite or is_sqlite_file:
+    # Пул рассчитан на потоки API, планировщика и фоновых запусков
+    engine_kwargs["pool_size"] = settings.DB_POOL_SIZE
+    engine_kwargs["max_overflow"] = settings.DB_MAX_OVERFLOW
+
+# Асинхронные драйверы для диалектов базы данных
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Дополнительные зависимости проекта с асинхронными драйверами
+ASYNC_DRIVER_EXTRAS = {
+    "postgresql": "postgres",
+}
+
+
+def get_async_database_url(url: URL) -> URL:
+    """
+    URL базы данных с асинхронным драйвером (aiosqlite для SQLite, asyncpg для PostgreSQL)
+    
+    Args:
+        url: URL базы данных из настроек
+        
+    Returns:
+        URL с асинхронным драйвером
+    """
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Настройки SQLite для одновременной работы API и фоновых задач:
+    WAL позволяет читать во время записи, busy_timeout ждет освобождения
+    блокировки вместо ошибки "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    if is_sqlite_file:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
 
 # Создаем движок SQLAlchemy
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Для SQLite
-)
+engine = create_engine(settings.DATABASE_URL, **engine_kwargs)
+
+if is_sqlite:
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для эндпоинтов чтения создается при первом запросе,
+# поэтому приложение запускается и без установленного асинхронного драйвера
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """
+    Фабрика асинхронных сессий (движок создается при первом вызове)
+
+    Returns:
+        async_sessionmaker для AsyncSession
+
+    Raises:
+        RuntimeError: Асинхронный драйвер базы данных не установлен
+    """
+    global _async_engine, _async_sessionmaker
+
+    if _async_sessionmaker is not None:
+        return _async_sessionmaker
+
+    with _async_engine_lock:
+        if _async_sessionmaker is None:
+            async_url = get_async_database_url(database_url)
+            try:
+                async_engine = create_async_engine(async_url, **engine_kwargs)
+            except ImportError as e:
+                extra = ASYNC_DRIVER_EXTRAS.get(database_url.get_backend_name())
+                hint = f" Установите его: uv sync --extra {extra}" if extra else ""
+                raise RuntimeError(
+                    f"Не установлен асинхронный драйвер {async_url.drivername} ({e}).{hint}"
+                ) from e
+
+            if is_sqlite:
+                event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+            _async_engine = async_engine
+            _async_sessionmaker = async_sessionmaker(
+                async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    """
+    Закрывает соединения асинхронного движка, если он был создан
+    """
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 
 def get_db():
     """
@@ -25,4 +132,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,155 @@
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+WriteOperation = Callable[[Session], Any]
+
+
+class DBWriter:
+    """
+    Единственный поток записи в БД для фоновых задач.
+
+    Задачи планировщика не коммитят сами, а ставят операции записи в очередь.
+    Поток записи забирает из очереди пачку операций, выполняет их в одной
+    сессии и фиксирует одним коммитом. Так фоновые задачи не конкурируют
+    за блокировку SQLite, а коммитов становится меньше.
+    """
+    def __init__(self, batch_size: int = 50, flush_interval_ms: int = 10):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "queue.Queue[Optional[Tuple[WriteOperation, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """
+        Ставит операцию записи в очередь
+
+        Args:
+            operation: Функция, принимающая сессию; коммит выполняет поток записи
+
+        Returns:
+            Future с результатом операции после коммита
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def call(self, operation: WriteOperation, timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет операцию записи через очередь и ждет коммита
+
+        Args:
+            operation: Функция, принимающая сессию
+            timeout: Максимальное время ожидания в секундах
+
+        Returns:
+            Результат операции
+        """
+        return self.submit(operation).result(timeout=timeout)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            # Добираем операции, пришедшие за интервал накопления
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[WriteOperation, Future]]) -> None:
+        session = SessionLocal()
+        try:
+            results = [operation(session) for operation, _ in batch]
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Ошибка при записи пачки из {len(batch)} операций, запись по одной: {str(e)}")
+            self._write_one_by_one(session, batch)
+            return
+        finally:
+            session.close()
+
+        self.batches += 1
+        self.operations += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write_one_by_one(self, session: Session, batch: List[Tuple[WriteOperation, Future]]) -> None:
+        """
+        Повторяет операции пачки по отдельности, чтобы ошибка одной не отменила остальные
+        """
+        for operation, future in batch:
+            try:
+                result = operation(session)
+                session.commit()
+                self.operations += 1
+                future.set_result(result)
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Ошибка при записи в БД: {str(e)}")
+                future.set_exception(e)
+        self.batches += 1
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Записывает оставшиеся операции и останавливает поток записи
+
+        Args:
+            timeout: Максимальное время ожидания в секундах
+        """
+        with self._lock:
+            thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+
+# Создаем глобальный экземпляр очереди записи
+db_writer = DBWriter(
+    batch_size=settings.DB_WRITER_BATCH_SIZE,
+    flush_interval_ms=settings.DB_WRITER_FLUSH_INTERVAL_MS
+)
+
+
+def get_background_writer() -> Optional[DBWriter]:
+    """
+    Очередь записи для фоновых задач, если она включена
+
+    Returns:
+        DBWriter или None (фоновые задачи коммитят через свою сессию)
+    """
+    return db_writer if settings.DB_WRITER_ENABLED else None
@@ -4,6 +4,7 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
+from sqlalchemy import text
 from fastapi.responses import RedirectResponse
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
@@ -11,7 +12,10 @@ from fastapi.encoders import jsonable_encoder
 from app.core.config import settings
 from app.api.api_v1.api import api_router
 from app.core.scheduler import init_schedules, cleanup
-from app.api.deps import get_db
+from app.core.executor import run_blocking, blocking_executor, export_executor, loop_watchdog
+from app.services.run_service import run_service
+from app.db.session import SessionLocal, dispose_async_engine
+from app.db.writer import db_writer
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -36,7 +40,9 @@ async def add_encoding_headers(request, call_next):
     Middleware для установки правильных заголовков кодировки
     """
     response = await call_next(request)
-    if request.url.path.startswith("/api/"):
+    # Потоки событий и файлы отдаются со своим типом содержимого
+    content_type = response.headers.get("content-type", "")
+    if request.url.path.startswith("/api/") and content_type.startswith("application/json"):
         response.headers["Content-Type"] = "application/json; charset=utf-8"
     return response
 
@@ -89,11 +95,17 @@ async def health_check():
     """
     Health check endpoint для мониторинга состояния приложения
     """
+    def check_database() -> None:
+        db = SessionLocal()
+        try:
+            # Простой запрос для проверки БД
+            db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+    
     try:
         # Проверяем подключение к базе данных
-        db = next(get_db())
-        # Простой запрос для проверки БД
-        db.execute("SELECT 1")
+        await run_blocking(check_database)
         db_status = "healthy"
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
@@ -102,7 +114,10 @@ async def health_check():
         "status": "healthy" if db_status == "healthy" else "unhealthy",
         "database": db_status,
         "version": settings.VERSION,
-        "app_name": settings.APP_NAME
+        "app_name": settings.APP_NAME,
+        "executor": blocking_executor.stats(),
+        "export_executor": export_executor.stats(),
+        "event_loop": loop_watchdog.stats()
     }
 
 @app.on_event("startup")
@@ -112,11 +127,25 @@ def startup_db_and_scheduler():
     """
     # Инициализация базы данных
     from app.db.init_db import init_db
-    db = next(get_db())
-    init_db(db)
-    
-    # Инициализация расписаний
-    init_schedules(db)
+    db = SessionLocal()
+    try:
+        init_db(db)
+        
+        # Запуски, прерванные предыдущей остановкой приложения, завершаются с ошибкой
+        run_service.fail_interrupted_runs()
+        
+        # Инициализация расписаний
+        init_schedules(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_loop_watchdog():
+    """
+    Запуск сторожа цикла событий
+    """
+    if settings.LOOP_LAG_WATCHDOG_ENABLED:
+        loop_watchdog.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -124,6 +153,12 @@ async def shutdown_event():
     Очистка при остановке приложения
     """
     cleanup()
+    run_service.shutdown()
+    loop_watchdog.stop()
+    db_writer.stop()
+    await dispose_async_engine()
+    blocking_executor.shutdown()
+    export_executor.shutdown()
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
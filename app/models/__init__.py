@@ -1,6 +1,12 @@
 # models package 
 from app.models.sheet import Sheet
 from app.models.backup import Backup
+from app.models.backup_location import BackupLocation
+from app.models.sheet_backup_stats import SheetBackupStats
+from app.models.backup_deletion import BackupDeletion
 from app.models.schedule import Schedule
 from app.models.backup_schedule import BackupSchedule
-from app.models.integration import Integration 
\ No newline at end of file
+from app.models.integration import Integration 
+from app.models.sync_state import SyncState
+from app.models.schedule_sheet_state import ScheduleSheetState
+from app.models.schedule_run import ScheduleRunRecord
\ No newline at end of file
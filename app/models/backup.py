@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -11,6 +11,15 @@ def generate_uuid():
 
 class Backup(Base):
     __tablename__ = "backups"
+    __table_args__ = (
+        # История бэкапов таблицы и статистика по ней
+        Index("ix_backups_sheet_id_created_at", "sheet_id", "created_at"),
+        Index("ix_backups_status", "status"),
+        # Постраничный вывод списка бэкапов по ключу (created_at, id)
+        Index("ix_backups_created_at_id", "created_at", "id"),
+        # Цепочки инкрементальных снимков
+        Index("ix_backups_parent_backup_id", "parent_backup_id"),
+    )
 
     id = Column(String, primary_key=True, index=True, default=generate_uuid)
     sheet_id = Column(String, ForeignKey("sheets.id"), nullable=False)
@@ -22,10 +31,18 @@ class Backup(Base):
     storage_params = Column(JSON, nullable=True)
     storage_results = Column(JSON, nullable=True)
     backup_metadata = Column(JSON, nullable=True)
+    # Предыдущий бэкап цепочки, к которому сегмент инкрементального снимка добавляет строки
+    parent_backup_id = Column(String, nullable=True)
     created_at = Column(DateTime, nullable=False)
 
     # Отношения
     sheet = relationship("Sheet", back_populates="backups")
+    locations = relationship(
+        "BackupLocation",
+        back_populates="backup",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<Backup(id={self.id}, sheet_id={self.sheet_id}, status={self.status})>" 
\ No newline at end of file
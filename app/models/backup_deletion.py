@@ -0,0 +1,40 @@
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+from datetime import datetime
+
+from app.db.base_class import Base
+
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+
+class BackupDeletion(Base):
+    """
+    Журнал удаления бэкапа из всех хранилищ.
+
+    Запись создается до удаления файлов и хранит копию мест хранения, поэтому
+    прерванное удаление можно безопасно повторить: уже удаленные места
+    пропускаются, а запись о бэкапе удаляется только после всех файлов.
+    После полного удаления бэкапа запись журнала удаляется в той же транзакции.
+    """
+    __tablename__ = "backup_deletions"
+    __table_args__ = (
+        Index("ix_backup_deletions_status", "status"),
+    )
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    backup_id = Column(String, nullable=False, unique=True)
+    sheet_id = Column(String, nullable=False)
+    size = Column(Integer, nullable=True)
+    locations = Column(JSON, nullable=False)  # Места хранения файла на момент удаления
+    deleted_locations = Column(JSON, nullable=True)  # Индексы уже удаленных мест хранения
+    reason = Column(String, nullable=False, default="manual")  # "manual" или "retention"
+    status = Column(String, nullable=False, default="pending")  # pending, running, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # Время захвата удаления процессом
+
+    def __repr__(self):
+        return f"<BackupDeletion(backup_id={self.backup_id}, status={self.status})>"
@@ -0,0 +1,42 @@
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+
+class BackupLocation(Base):
+    """
+    Копия файла бэкапа в одном хранилище
+    """
+    __tablename__ = "backup_locations"
+    __table_args__ = (
+        # Копии бэкапа (скачивание, удаление)
+        Index("ix_backup_locations_backup_id", "backup_id"),
+        # Копии в конкретном хранилище или интеграции
+        Index("ix_backup_locations_storage", "storage_type", "integration_id"),
+        Index("ix_backup_locations_status", "status"),
+    )
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    backup_id = Column(String, ForeignKey("backups.id", ondelete="CASCADE"), nullable=False)
+    storage_type = Column(String, nullable=False)
+    integration_id = Column(String, nullable=True)  # ID интеграции для Битрикс24
+    storage_params = Column(JSON, nullable=True)
+    file_path = Column(String, nullable=False)  # Путь к файлу или ID файла в хранилище
+    size = Column(Integer, nullable=True)
+    status = Column(String, nullable=False, default="stored")  # "stored" или "deleted"
+    checksum = Column(String, nullable=True)  # SHA-256 содержимого файла
+    kind = Column(String, nullable=True, default="backup")  # "backup" - файл бэкапа, "parquet" - Parquet-файл листа
+    tab = Column(String, nullable=True)  # Название листа для Parquet-файла
+    created_at = Column(DateTime, nullable=False)
+
+    # Отношения
+    backup = relationship("Backup", back_populates="locations")
+
+    def __repr__(self):
+        return f"<BackupLocation(backup_id={self.backup_id}, storage_type={self.storage_type}, status={self.status})>"
@@ -19,8 +19,17 @@ class Schedule(Base):
     schedule_config = Column(JSON, nullable=False)
     storage_configs = Column(JSON, nullable=False)  # Список конфигураций хранилищ
     is_active = Column(Boolean, default=True)
+    # Политика хранения бэкапов: keep_last, keep_daily, keep_weekly, keep_monthly, max_total_size
+    retention_policy = Column(JSON, nullable=True)
+    # Формат бэкапа: "xlsx" (экспорт книги), "ndjson" или "csv" (снимок значений листов)
+    backup_format = Column(String, nullable=True, default="xlsx")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=True)
+    
+    # Аренда расписания для распределенного выполнения на нескольких узлах
+    lease_owner = Column(String, nullable=True)  # ID узла, выполняющего расписание
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)  # Время последнего захваченного запуска
 
     def __repr__(self):
         return f"<Schedule(id={self.id}, type={self.schedule_type}, sheets_count={len(self.sheets_ids) if self.sheets_ids else 0})>" 
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON
+from datetime import datetime
+
+from app.db.base_class import Base
+
+
+class ScheduleRunRecord(Base):
+    """
+    Сохраненное состояние фонового запуска расписания: доступно после
+    перезапуска приложения и на других узлах
+    """
+    __tablename__ = "schedule_runs"
+
+    id = Column(String, primary_key=True)
+    schedule_id = Column(String, nullable=False, index=True)
+    node_id = Column(String, nullable=True)  # ID узла, выполняющего запуск
+    status = Column(String, nullable=False)  # queued, running, completed, failed
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+    sheets = Column(JSON, nullable=True)  # Прогресс по таблицам
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ScheduleRunRecord(id={self.id}, schedule_id={self.schedule_id}, status={self.status})>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+
+from app.db.base_class import Base
+
+
+class ScheduleSheetState(Base):
+    """
+    Состояние таблицы в расписании: история изменений, по которой адаптивное
+    расписание выбирает интервал бэкапа этой таблицы, и время последнего
+    отбора таблицы по ленте изменений Google Drive
+    """
+    __tablename__ = "schedule_sheet_states"
+
+    schedule_id = Column(String, ForeignKey("schedules.id"), primary_key=True)
+    sheet_id = Column(String, ForeignKey("sheets.id"), primary_key=True)
+    last_backup = Column(DateTime, nullable=True)
+    last_content_hash = Column(String, nullable=True)
+    last_changed_at = Column(DateTime, nullable=True)
+    change_interval_minutes = Column(Integer, nullable=True)
+    # Изменения таблицы до этого времени уже взяты в бэкап этим расписанием
+    changes_seen_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ScheduleSheetState(schedule_id={self.schedule_id}, sheet_id={self.sheet_id}, interval={self.change_interval_minutes})>"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -21,9 +21,24 @@ class Sheet(Base):
     last_backup = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=True)
+    
+    # История изменений для адаптивных расписаний
+    last_content_hash = Column(String, nullable=True)
+    last_changed_at = Column(DateTime, nullable=True)
+    change_interval_minutes = Column(Integer, nullable=True)
+    # Изменение таблицы еще не взято в бэкап ни одним расписанием (по ленте изменений Google Drive);
+    # NULL у таблиц, добавленных до появления флага, считается изменением
+    dirty = Column(Boolean, nullable=True, default=True)
+    # Время последнего изменения по ленте изменений Google Drive; каждое расписание
+    # сравнивает его со своим временем отбора таблицы (ScheduleSheetState.changes_seen_at)
+    changed_at = Column(DateTime, nullable=True)
+    # Таблица-журнал: строки только добавляются в конец, бэкапы снимков инкрементальные
+    append_only = Column(Boolean, nullable=True, default=False)
 
     # Отношения
     backups = relationship("Backup", back_populates="sheet", cascade="all, delete-orphan")
+    backup_stats = relationship("SheetBackupStats", back_populates="sheet", uselist=False, cascade="all, delete-orphan")
+    schedule_states = relationship("ScheduleSheetState", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Sheet(id={self.id}, name={self.name}, spreadsheet_id={self.spreadsheet_id})>" 
\ No newline at end of file
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+
+class SheetBackupStats(Base):
+    """
+    Статистика бэкапов таблицы, обновляемая при каждой вставке и удалении бэкапа
+    """
+    __tablename__ = "sheet_backup_stats"
+
+    sheet_id = Column(String, ForeignKey("sheets.id"), primary_key=True)
+    total_backups = Column(Integer, nullable=False, default=0)
+    successful_backups = Column(Integer, nullable=False, default=0)
+    failed_backups = Column(Integer, nullable=False, default=0)
+    total_size = Column(BigInteger, nullable=False, default=0)
+    first_backup_date = Column(DateTime, nullable=True)
+    last_backup_date = Column(DateTime, nullable=True)
+    last_content_hash = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+    # Отношения
+    sheet = relationship("Sheet", back_populates="backup_stats")
+
+    @property
+    def average_size(self) -> float:
+        return self.total_size / self.total_backups if self.total_backups else 0
+
+    def __repr__(self):
+        return f"<SheetBackupStats(sheet_id={self.sheet_id}, total_backups={self.total_backups})>"
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+
+from app.db.base_class import Base
+
+
+class SyncState(Base):
+    """
+    Сохраняемое состояние фоновой синхронизации по ключу
+    (например, токен страницы ленты изменений Google Drive для сервисного аккаунта)
+    """
+    __tablename__ = "sync_states"
+
+    key = Column(String, primary_key=True)
+    page_token = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SyncState(key={self.key}, page_token={self.page_token})>"
@@ -29,6 +29,7 @@ class BackupInDB(BackupBase):
     created_at: datetime
     metadata: Optional[Dict[str, Any]] = None
     storage_results: Optional[List[Dict[str, Any]]] = None
+    parent_backup_id: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -46,6 +47,53 @@ class BackupStats(BaseModel):
     average_size: float
     first_backup_date: Optional[datetime] = None
     last_backup_date: Optional[datetime] = None
+    last_content_hash: Optional[str] = None
+
+class SheetBackupStatsOut(BackupStats):
+    """Статистика резервных копий с ID таблицы"""
+    sheet_id: str
+
+class BackupLocationOut(BaseModel):
+    """Копия резервной копии в хранилище"""
+    id: str
+    storage_type: str
+    integration_id: Optional[str] = None
+    file_path: str
+    size: Optional[int] = None
+    status: str
+    checksum: Optional[str] = None
+    kind: Optional[str] = "backup"
+    tab: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class BackupListItem(BaseModel):
+    """Облегченная схема бэкапа для списка (без JSON-полей метаданных и результатов)"""
+    id: str
+    sheet_id: str
+    filename: str
+    size: int
+    status: str
+    storage_type: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class BackupPage(BaseModel):
+    """Страница списка бэкапов"""
+    items: List[BackupListItem]
+    next_cursor: Optional[str] = None
+
+class InFlightRun(BaseModel):
+    """Выполняющийся ручной бэкап или запуск расписания"""
+    key: str
+    kind: str
+    description: Optional[str] = None
+    started_at: datetime
+    waiters: int
 
 class BackupResponse(BackupBase):
     """Схема для ответа с данными бэкапа"""
@@ -54,6 +102,7 @@ class BackupResponse(BackupBase):
     file_path: str
     size: int
     backup_metadata: Optional[Dict[str, Any]] = None
+    parent_backup_id: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -74,4 +123,12 @@ class BackupResponse(BackupBase):
                 },
                 "created_at": "2023-01-01T12:00:00"
             }
-        } 
\ No newline at end of file
+        }
+
+class RetentionRunResult(BaseModel):
+    """Результат очистки бэкапов по политикам хранения"""
+    dry_run: bool
+    victims: int
+    deleted: int
+    failed: int
+    freed_bytes: int
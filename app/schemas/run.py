@@ -0,0 +1,27 @@
+from typing import Optional, List
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class RunSheetProgress(BaseModel):
+    """Прогресс бэкапа одной таблицы в запуске"""
+    sheet_id: str
+    sheet_name: Optional[str] = None
+    status: str  # pending, completed, failed
+    error: Optional[str] = None
+
+
+class ScheduleRunResponse(BaseModel):
+    """Схема для ответа с состоянием фонового запуска расписания"""
+    id: str
+    schedule_id: str
+    status: str  # queued, running, completed, failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    sheets_count: int
+    processed_count: int
+    successful_backups: int
+    sheets: List[RunSheetProgress]
+    version: int
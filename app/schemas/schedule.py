@@ -3,19 +3,35 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 
 
+# Формат бэкапа: экспорт книги в XLSX, снимок значений листов в NDJSON/CSV
+# или параллельный CSV-экспорт каждого листа
+BackupFormat = Literal["xlsx", "ndjson", "csv", "csv_export"]
+
+
 class StorageConfig(BaseModel):
     """Схема конфигурации хранилища"""
     storage_type: str
     storage_params: Optional[Dict[str, Any]] = None
 
 
+class RetentionPolicy(BaseModel):
+    """Схема политики хранения бэкапов таблиц расписания"""
+    keep_last: Optional[int] = Field(None, ge=1, description="Сколько последних бэкапов хранить")
+    keep_daily: Optional[int] = Field(None, ge=1, description="За сколько последних дней хранить по одному бэкапу")
+    keep_weekly: Optional[int] = Field(None, ge=1, description="За сколько последних недель хранить по одному бэкапу")
+    keep_monthly: Optional[int] = Field(None, ge=1, description="За сколько последних месяцев хранить по одному бэкапу")
+    max_total_size: Optional[int] = Field(None, ge=1, description="Максимальный суммарный размер бэкапов таблицы, байт")
+
+
 class ScheduleBase(BaseModel):
     """Базовая схема для расписания"""
     sheets_ids: List[str]
-    schedule_type: Literal["interval", "cron"]
+    schedule_type: Literal["interval", "cron", "adaptive"]
     schedule_config: Dict[str, Any]
     storage_configs: List[StorageConfig]
     is_active: bool = True
+    retention_policy: Optional[RetentionPolicy] = None
+    backup_format: Optional[BackupFormat] = "xlsx"
 
 
 class ScheduleCreate(ScheduleBase):
@@ -26,10 +42,12 @@ class ScheduleCreate(ScheduleBase):
 class ScheduleUpdate(BaseModel):
     """Схема для обновления расписания"""
     sheets_ids: Optional[List[str]] = None
-    schedule_type: Optional[Literal["interval", "cron"]] = None
+    schedule_type: Optional[Literal["interval", "cron", "adaptive"]] = None
     schedule_config: Optional[Dict[str, Any]] = None
     storage_configs: Optional[List[StorageConfig]] = None
     is_active: Optional[bool] = None
+    retention_policy: Optional[RetentionPolicy] = None
+    backup_format: Optional[BackupFormat] = None
 
 
 class ScheduleResponse(ScheduleBase):
@@ -66,7 +84,29 @@ class ScheduleResponse(ScheduleBase):
                     }
                 ],
                 "is_active": True,
+                "retention_policy": {
+                    "keep_last": 10,
+                    "keep_daily": 7,
+                    "keep_weekly": 4,
+                    "keep_monthly": 12
+                },
+                "backup_format": "xlsx",
                 "created_at": "2023-01-01T12:00:00",
                 "updated_at": "2023-01-02T14:30:00"
             }
-        } 
\ No newline at end of file
+        } 
+
+class ScheduleLoadMinute(BaseModel):
+    """Прогнозируемое количество одновременных задач в минуту"""
+    minute: datetime
+    jobs: int
+
+
+class ScheduleLoadPlan(BaseModel):
+    """Прогноз нагрузки планировщика"""
+    jitter_enabled: bool
+    jitter_window_seconds: int
+    horizon_hours: int
+    peak_concurrency: int
+    peak_concurrency_without_jitter: int
+    minutes: List[ScheduleLoadMinute]
@@ -10,12 +10,14 @@ class SheetBase(BaseModel):
 class SheetCreate(SheetBase):
     """Схема для создания таблицы"""
     credentials_id: Optional[str] = None
+    append_only: Optional[bool] = False
 
 class SheetUpdate(BaseModel):
     """Схема для обновления таблицы"""
     name: Optional[str] = None
     spreadsheet_id: Optional[str] = None
     credentials_id: Optional[str] = None
+    append_only: Optional[bool] = None
 
 class SheetResponse(SheetBase):
     """Схема для ответа с данными таблицы"""
@@ -23,6 +25,8 @@ class SheetResponse(SheetBase):
     credentials_id: Optional[str] = None
     last_synced_at: Optional[datetime] = None
     last_backup: Optional[datetime] = None
+    dirty: Optional[bool] = None
+    append_only: Optional[bool] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -36,7 +40,20 @@ class SheetResponse(SheetBase):
                 "credentials_id": "google_creds_1",
                 "last_synced_at": "2023-01-01T10:00:00",
                 "last_backup": "2023-01-01T12:30:00",
+                "dirty": False,
+                "append_only": False,
                 "created_at": "2023-01-01T09:00:00",
                 "updated_at": "2023-01-01T15:45:00"
             }
-        } 
\ No newline at end of file
+        }
+
+class ServiceAccountOut(BaseModel):
+    """Состояние сервисного аккаунта Google из пула"""
+    id: str
+    email: Optional[str] = None
+    healthy: bool
+    requests: int
+    errors: int
+    quota_errors: int
+    cooldown_seconds_left: float
+    last_error: Optional[str] = None
@@ -0,0 +1,224 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.schedule import Schedule
+from app.models.schedule_sheet_state import ScheduleSheetState
+from app.models.sheet import Sheet
+
+logger = logging.getLogger(__name__)
+
+
+def get_adaptive_bounds(schedule_config: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Границы эффективного интервала адаптивного расписания в минутах
+
+    Args:
+        schedule_config: Конфигурация расписания вида {"adaptive": {"min_minutes": int, "max_minutes": int}}
+
+    Returns:
+        Кортеж (минимальный интервал, максимальный интервал)
+    """
+    adaptive = (schedule_config or {}).get("adaptive", {}) or {}
+    min_minutes = max(1, int(adaptive.get("min_minutes") or settings.ADAPTIVE_MIN_INTERVAL_MINUTES))
+    max_minutes = max(min_minutes, int(adaptive.get("max_minutes") or settings.ADAPTIVE_MAX_INTERVAL_MINUTES))
+    return min_minutes, max_minutes
+
+
+def next_interval(current_minutes: Optional[int], changed: bool, min_minutes: int, max_minutes: int) -> int:
+    """
+    Следующий эффективный интервал таблицы: при изменении данных интервал
+    сокращается вдвое, без изменений - удваивается, в пределах границ
+
+    Args:
+        current_minutes: Текущий интервал (None для таблицы без истории)
+        changed: Изменилось ли содержимое с прошлого бэкапа
+        min_minutes: Минимальный интервал
+        max_minutes: Максимальный интервал
+
+    Returns:
+        int: Новый интервал в минутах
+    """
+    if current_minutes is None:
+        return min_minutes
+
+    interval = current_minutes // 2 if changed else current_minutes * 2
+    return min(max_minutes, max(min_minutes, interval))
+
+
+def compute_change_state(
+    last_content_hash: Optional[str],
+    change_interval_minutes: Optional[int],
+    content_hash: Optional[str],
+    created_at: datetime,
+    min_minutes: Optional[int] = None,
+    max_minutes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Новые значения истории изменений таблицы после бэкапа
+
+    Args:
+        last_content_hash: Хеш содержимого предыдущего бэкапа
+        change_interval_minutes: Текущий эффективный интервал
+        content_hash: Хеш содержимого нового бэкапа
+        created_at: Время создания бэкапа
+        min_minutes: Минимальный интервал (по умолчанию ADAPTIVE_MIN_INTERVAL_MINUTES)
+        max_minutes: Максимальный интервал (по умолчанию ADAPTIVE_MAX_INTERVAL_MINUTES)
+
+    Returns:
+        Словарь изменившихся полей таблицы (пустой, если хеш неизвестен)
+    """
+    if not content_hash:
+        return {}
+
+    changed = last_content_hash != content_hash
+    state = {
+        "last_content_hash": content_hash,
+        "change_interval_minutes": next_interval(
+            change_interval_minutes,
+            changed,
+            min_minutes or settings.ADAPTIVE_MIN_INTERVAL_MINUTES,
+            max_minutes or settings.ADAPTIVE_MAX_INTERVAL_MINUTES
+        )
+    }
+    if changed:
+        state["last_changed_at"] = created_at
+    return state
+
+
+def record_backup(sheet: Sheet, content_hash: Optional[str], created_at: datetime) -> None:
+    """
+    Учитывает новый бэкап в истории изменений таблицы (без коммита)
+
+    Args:
+        sheet: Таблица
+        content_hash: Хеш содержимого нового бэкапа
+        created_at: Время создания бэкапа
+    """
+    state = compute_change_state(
+        sheet.last_content_hash,
+        sheet.change_interval_minutes,
+        content_hash,
+        created_at
+    )
+    for field, value in state.items():
+        setattr(sheet, field, value)
+
+
+def load_schedule_states(db: Session, schedule_id: str, sheet_ids: List[str]) -> Dict[str, ScheduleSheetState]:
+    """
+    Состояния таблиц в расписании
+
+    Args:
+        db: Сессия базы данных
+        schedule_id: ID расписания
+        sheet_ids: ID таблиц
+
+    Returns:
+        Словарь {ID таблицы: ScheduleSheetState} (таблицы без состояния отсутствуют)
+    """
+    if not sheet_ids:
+        return {}
+    states = db.execute(
+        select(ScheduleSheetState)
+        .where(ScheduleSheetState.schedule_id == schedule_id)
+        .where(ScheduleSheetState.sheet_id.in_(sheet_ids))
+    ).scalars().all()
+    return {state.sheet_id: state for state in states}
+
+
+def select_due_sheets(
+    sheets: List[Sheet],
+    schedule_config: Dict[str, Any],
+    states: Optional[Dict[str, ScheduleSheetState]] = None,
+    now: Optional[datetime] = None
+) -> List[Sheet]:
+    """
+    Отбирает таблицы, для которых истек эффективный интервал адаптивного расписания
+
+    Интервал и время последнего бэкапа берутся из состояния таблицы в этом
+    расписании; таблицы без состояния (история до его появления) используют
+    историю самой таблицы.
+
+    Args:
+        sheets: Таблицы расписания
+        schedule_config: Конфигурация расписания
+        states: Состояния таблиц в расписании (load_schedule_states)
+        now: Текущее время (UTC)
+
+    Returns:
+        Список таблиц, которым нужен бэкап
+    """
+    now = now or datetime.utcnow()
+    states = states or {}
+    min_minutes, max_minutes = get_adaptive_bounds(schedule_config)
+
+    # Допуск компенсирует небольшой дрейф времени срабатывания триггера
+    tolerance = timedelta(minutes=min_minutes) / 10
+
+    due = []
+    for sheet in sheets:
+        state = states.get(sheet.id)
+        history = state if state is not None and state.last_backup else sheet
+        if not history.last_backup:
+            due.append(sheet)
+            continue
+
+        interval = min(max_minutes, max(min_minutes, history.change_interval_minutes or min_minutes))
+        if now - history.last_backup + tolerance >= timedelta(minutes=interval):
+            due.append(sheet)
+
+    logger.info(f"Адаптивное расписание: к бэкапу {len(due)} из {len(sheets)} таблиц")
+    return due
+
+
+def record_schedule_backups(db: Session, schedule: Schedule, results: List[Dict[str, Any]]) -> None:
+    """
+    Учитывает бэкапы запуска адаптивного расписания в состояниях его таблиц
+
+    Интервал каждой таблицы считается в границах этого расписания, поэтому
+    расписания с общей таблицей не перезаписывают интервалы друг друга.
+
+    Args:
+        db: Сессия базы данных
+        schedule: Расписание
+        results: Результаты backup_sheets
+    """
+    if schedule.schedule_type != "adaptive":
+        return
+
+    succeeded = [result for result in results if result.get("success")]
+    if not succeeded:
+        return
+
+    try:
+        min_minutes, max_minutes = get_adaptive_bounds(schedule.schedule_config)
+        states = load_schedule_states(db, schedule.id, [result["sheet_id"] for result in succeeded])
+        now = datetime.utcnow()
+        for result in succeeded:
+            state = states.get(result["sheet_id"])
+            if state is None:
+                state = ScheduleSheetState(schedule_id=schedule.id, sheet_id=result["sheet_id"])
+                db.add(state)
+                states[result["sheet_id"]] = state
+
+            state.last_backup = now
+            state.updated_at = now
+            change_state = compute_change_state(
+                state.last_content_hash,
+                state.change_interval_minutes,
+                result.get("content_hash"),
+                now,
+                min_minutes,
+                max_minutes
+            )
+            for field, value in change_state.items():
+                setattr(state, field, value)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при обновлении состояния таблиц адаптивного расписания {schedule.id}: {str(e)}")
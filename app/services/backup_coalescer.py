@@ -0,0 +1,280 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def storage_config_key(config: Dict[str, Any]) -> str:
+    """
+    Ключ конфигурации хранилища для объединения и сопоставления результатов
+    """
+    return json.dumps(
+        {
+            "storage_type": config.get("storage_type"),
+            "storage_params": config.get("storage_params") or {}
+        },
+        sort_keys=True,
+        default=str
+    )
+
+
+def export_key(
+    spreadsheet_id: str,
+    backup_format: str,
+    credentials_id: Optional[str] = None,
+    incremental_base: Optional[Dict[str, Any]] = None
+) -> Tuple[str, str, str, str]:
+    """
+    Ключ объединения экспорта: запуски присоединяются к чужому экспорту, только
+    если таблица читается тем же сервисным аккаунтом и от той же основы сегмента
+    """
+    base_id = incremental_base["backup_id"] if incremental_base else ""
+    return (spreadsheet_id, backup_format, credentials_id or "", base_id)
+
+
+class _PendingExport:
+    """
+    Ожидающий экспорт одной таблицы, к которому могут присоединяться другие запуски
+    """
+    def __init__(self, key: Tuple[str, str, str, str], owner: "CoalescedRun"):
+        self.key = key
+        self.spreadsheet_id = key[0]
+        self.owner = owner
+        self.storage_configs: Dict[str, Dict[str, Any]] = {}
+        self.started = False
+        self.failed = False
+        self.result = None
+        self.done = threading.Event()
+
+    def add_configs(self, storage_configs: List[Dict[str, Any]]) -> None:
+        for config in storage_configs:
+            self.storage_configs.setdefault(storage_config_key(config), config)
+
+
+class BackupCoalescer:
+    """
+    Объединяет запросы на бэкап одной таблицы из одновременно сработавших расписаний.
+
+    Каждый запуск заранее регистрирует свои таблицы. Первый зарегистрировавшийся
+    запуск становится владельцем экспорта таблицы, остальные присоединяют к нему
+    свои хранилища и получают результат общего экспорта.
+    """
+    def __init__(self, window_seconds: float = 0.0, enabled: bool = True):
+        self.window_seconds = window_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Ожидающие экспорты по ключу export_key
+        self._pending: Dict[Tuple[str, str, str, str], _PendingExport] = {}
+
+    def register(
+        self,
+        sheets: List[Dict[str, str]],
+        storage_configs: List[Dict[str, Any]],
+        backup_format: str = "xlsx",
+        incremental_bases: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> "CoalescedRun":
+        """
+        Регистрирует запуск бэкапа для списка таблиц
+
+        Args:
+            sheets: Список таблиц в формате [{"id": str, "name": str, "spreadsheet_id": str, "credentials_id": str}]
+            storage_configs: Список конфигураций хранилищ запуска
+            backup_format: Формат бэкапа (объединяются только экспорты одного формата)
+            incremental_bases: Основы сегментов таблиц-журналов {ID таблицы: find_base}
+
+        Returns:
+            CoalescedRun: Объект запуска для выполнения бэкапов
+        """
+        run = CoalescedRun(self, storage_configs, backup_format, incremental_bases)
+        if not self.enabled:
+            return run
+
+        with self._lock:
+            for sheet in sheets:
+                spreadsheet_id = sheet.get("spreadsheet_id")
+                if not spreadsheet_id:
+                    continue
+
+                key = run.sheet_key(sheet)
+                if key in run.exports:
+                    continue
+
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = _PendingExport(key, run)
+                    self._pending[key] = pending
+                else:
+                    logger.info(f"Таблица {spreadsheet_id} уже ожидает экспорта, запуск присоединяется к нему")
+
+                pending.add_configs(storage_configs)
+                run.exports[key] = pending
+
+        return run
+
+    def _claim(self, pending: _PendingExport) -> None:
+        """
+        Закрывает экспорт для новых участников перед его началом
+        """
+        with self._lock:
+            if self._pending.get(pending.key) is pending:
+                del self._pending[pending.key]
+            pending.started = True
+
+
+class CoalescedRun:
+    """
+    Запуск бэкапа нескольких таблиц, зарегистрированный в BackupCoalescer
+    """
+    def __init__(
+        self,
+        coalescer: BackupCoalescer,
+        storage_configs: List[Dict[str, Any]],
+        backup_format: str = "xlsx",
+        incremental_bases: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.coalescer = coalescer
+        self.storage_configs = storage_configs
+        self.backup_format = backup_format
+        self.incremental_bases = incremental_bases or {}
+        self.exports: Dict[Tuple[str, str, str, str], _PendingExport] = {}
+        self.started_at = time.monotonic()
+
+    def sheet_key(self, sheet: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        """
+        Ключ объединения экспорта таблицы запуска
+        """
+        return export_key(
+            sheet.get("spreadsheet_id"),
+            self.backup_format,
+            sheet.get("credentials_id"),
+            self.incremental_bases.get(sheet.get("id"))
+        )
+
+    def ordered(self, sheets: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Упорядочивает таблицы: сначала те, экспортом которых владеет этот запуск.
+
+        Так владелец никогда не ждет чужой экспорт, пока не выполнит свои,
+        и взаимная блокировка запусков невозможна.
+        """
+        def is_owned(sheet: Dict[str, str]) -> bool:
+            pending = self.exports.get(self.sheet_key(sheet))
+            return pending is None or pending.owner is self
+
+        return [s for s in sheets if is_owned(s)] + [s for s in sheets if not is_owned(s)]
+
+    def backup(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        db: Optional[Any] = None,
+        storage_resolver: Optional[Any] = None,
+        credentials_id: Optional[str] = None,
+        incremental_base: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Создание резервной копии таблицы с учетом объединения запросов
+
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            sheet_name: Название таблицы
+            db: Сессия базы данных
+            storage_resolver: Хранилища запуска
+            credentials_id: ID сервисного аккаунта таблицы
+            incremental_base: Предыдущий снимок таблицы-журнала для сегмента
+
+        Returns:
+            BackupResult или None: Результат для хранилищ этого запуска
+        """
+        from app.services.backup_service import backup_sheet_by_id
+
+        pending = self.exports.get(export_key(spreadsheet_id, self.backup_format, credentials_id, incremental_base))
+        if pending is None:
+            return backup_sheet_by_id(spreadsheet_id, sheet_name, self.storage_configs, db=db, storage_resolver=storage_resolver, backup_format=self.backup_format, credentials_id=credentials_id, incremental_base=incremental_base)
+
+        if pending.owner is self and not pending.started:
+            # Окно ожидания включается явно (BACKUP_COALESCE_WINDOW_SECONDS): без него
+            # к экспорту присоединяются запуски, зарегистрированные до его начала
+            delay = self.started_at + self.coalescer.window_seconds - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            self.coalescer._claim(pending)
+            storage_configs = list(pending.storage_configs.values())
+            if len(storage_configs) > len(self.storage_configs):
+                logger.info(
+                    f"Объединенный экспорт таблицы {spreadsheet_id}: "
+                    f"{len(storage_configs)} хранилищ вместо {len(self.storage_configs)}"
+                )
+
+            try:
+                pending.result = backup_sheet_by_id(spreadsheet_id, sheet_name, storage_configs, db=db, storage_resolver=storage_resolver, backup_format=self.backup_format, credentials_id=credentials_id, incremental_base=incremental_base)
+            except Exception as e:
+                logger.error(f"Ошибка объединенного экспорта таблицы {spreadsheet_id}: {str(e)}")
+                pending.failed = True
+            finally:
+                pending.done.set()
+        else:
+            pending.done.wait()
+
+        if pending.failed:
+            # Владелец экспорта не смог его выполнить - экспортируем самостоятельно
+            return backup_sheet_by_id(spreadsheet_id, sheet_name, self.storage_configs, db=db, storage_resolver=storage_resolver, backup_format=self.backup_format, credentials_id=credentials_id, incremental_base=incremental_base)
+
+        return self._select_result(pending.result)
+
+    def close(self) -> None:
+        """
+        Завершает запуск: незавершенные экспорты, которыми он владеет,
+        помечаются как неудачные, чтобы ожидающие запуски не зависли
+        """
+        for pending in self.exports.values():
+            if pending.owner is self and not pending.done.is_set():
+                self.coalescer._claim(pending)
+                pending.failed = True
+                pending.done.set()
+
+    def _select_result(self, result):
+        """
+        Отбирает из общего результата только хранилища этого запуска.
+
+        Если у запусков есть одинаковые хранилища, их записи о бэкапах ссылаются
+        на один файл; очистка удаляет его только вместе с последней ссылкой.
+        """
+        from app.services.backup_service import BackupResult
+
+        if result is None:
+            return None
+
+        own_keys = {storage_config_key(config) for config in self.storage_configs}
+        storage_results = [
+            r for r in (result.storage_results or [])
+            if storage_config_key(r) in own_keys
+        ]
+        if not storage_results:
+            return None
+
+        primary_storage = storage_results[0]
+        return BackupResult(
+            filename=result.filename,
+            file_path=primary_storage["file_path"],
+            size=primary_storage["size"],
+            status=result.status,
+            storage_type=primary_storage["storage_type"],
+            storage_params=primary_storage["storage_params"],
+            backup_metadata=result.backup_metadata,
+            storage_results=storage_results,
+            parent_backup_id=result.parent_backup_id
+        )
+
+
+# Создаем глобальный экземпляр сервиса
+backup_coalescer = BackupCoalescer(
+    window_seconds=settings.BACKUP_COALESCE_WINDOW_SECONDS,
+    enabled=settings.BACKUP_COALESCE_ENABLED
+)
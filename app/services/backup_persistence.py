@@ -0,0 +1,307 @@
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set, TYPE_CHECKING
+
+from sqlalchemy import insert, select, update, case
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.writer import DBWriter
+from app.models.backup import Backup
+from app.models.backup_location import BackupLocation
+from app.models.sheet import Sheet
+from app.services.adaptive_service import compute_change_state
+from app.services.backup_stats_service import apply_backup_inserts
+
+if TYPE_CHECKING:
+    from app.services.backup_service import BackupResult
+
+logger = logging.getLogger(__name__)
+
+# Поля таблицы, обновляемые после бэкапа
+SHEET_HISTORY_FIELDS = ("last_backup", "last_content_hash", "last_changed_at", "change_interval_minutes")
+
+
+class BackupPersistBuffer:
+    """
+    Буфер записей о бэкапах одного запуска.
+
+    Записи накапливаются и сохраняются пачкой в одной транзакции: один
+    множественный INSERT в backups и один UPDATE ... CASE для таблиц.
+    Буфер сбрасывается по размеру при добавлении записи и по времени в фоновом
+    потоке (даже если новых бэкапов нет), поэтому при падении процесса теряется
+    только последняя несохраненная пачка. Если пачка не сохранилась, записи
+    сохраняются по одной; ID несохраненных записей собираются в failed_ids.
+    """
+    def __init__(
+        self,
+        db: Optional[Session] = None,
+        writer: Optional[DBWriter] = None,
+        batch_size: int = 20,
+        flush_seconds: float = 5.0
+    ):
+        self.db = db
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.failed_ids: Set[str] = set()
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.db is not None or self.writer is not None
+
+    def start(self) -> None:
+        """
+        Запускает сброс буфера по времени в фоновом потоке
+        """
+        if not self.enabled or self.flush_seconds <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Thread(target=self._flush_periodically, name="backup-persist", daemon=True)
+        self._timer.start()
+
+    def close(self) -> Set[str]:
+        """
+        Останавливает сброс по времени и сохраняет оставшиеся записи
+
+        Returns:
+            ID записей о бэкапах, которые не удалось сохранить
+        """
+        self._stopped.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+        self.flush()
+        return self.failed_ids
+
+    def add(self, sheet_id: str, backup_result: "BackupResult") -> Optional[str]:
+        """
+        Добавляет запись о бэкапе в буфер и сбрасывает его при заполнении
+
+        Args:
+            sheet_id: ID таблицы
+            backup_result: Результат создания бэкапа
+
+        Returns:
+            ID будущей записи о бэкапе (None, если сохранять некуда)
+        """
+        if not self.enabled:
+            return None
+
+        backup_id = str(uuid.uuid4())
+        row = {
+            "id": backup_id,
+            "sheet_id": sheet_id,
+            "filename": backup_result.filename,
+            "file_path": backup_result.file_path,
+            "size": backup_result.size,
+            "status": backup_result.status,
+            "storage_type": backup_result.storage_type,
+            "storage_params": backup_result.storage_params,
+            "storage_results": backup_result.storage_results,
+            "backup_metadata": backup_result.backup_metadata,
+            "parent_backup_id": backup_result.parent_backup_id,
+            "created_at": datetime.utcnow()
+        }
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_size
+
+        if full:
+            self.flush()
+
+        return backup_id
+
+    def flush(self) -> int:
+        """
+        Сохраняет накопленные записи одной транзакцией
+
+        Returns:
+            int: Количество сохраненных записей
+        """
+        return self._flush(self.db)
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_seconds):
+            if self.writer is not None:
+                self._flush(None)
+                continue
+
+            # Сессия запуска используется его потоком, поэтому здесь своя сессия
+            session = Session(bind=self.db.get_bind())
+            try:
+                self._flush(session)
+            finally:
+                session.close()
+
+    def _flush(self, session: Optional[Session]) -> int:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                self._write(session, rows)
+                logger.info(f"Сохранено записей о бэкапах: {len(rows)}")
+                return len(rows)
+            except Exception as e:
+                logger.warning(
+                    f"Ошибка при сохранении пачки из {len(rows)} записей о бэкапах, запись по одной: {str(e)}"
+                )
+
+            # Повторяем записи по отдельности, чтобы ошибка одной не отменила остальные
+            saved = 0
+            for row in rows:
+                try:
+                    self._write(session, [row])
+                    saved += 1
+                except Exception as e:
+                    self.failed_ids.add(row["id"])
+                    logger.error(
+                        f"Ошибка при сохранении записи о бэкапе таблицы {row['sheet_id']} в БД: {str(e)}"
+                    )
+            return saved
+
+    def _write(self, session: Optional[Session], rows: List[Dict[str, Any]]) -> None:
+        if self.writer is not None:
+            self.writer.call(lambda writer_session: write_backup_rows(writer_session, rows))
+            return
+
+        try:
+            write_backup_rows(session, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+def storage_results_of(backup: Any) -> List[Dict[str, Any]]:
+    """
+    Результаты сохранения бэкапа в хранилища (для старых записей - основное хранилище)
+
+    Args:
+        backup: Объект Backup или словарь с полями записи о бэкапе
+
+    Returns:
+        Список результатов сохранения
+    """
+    get = backup.get if isinstance(backup, dict) else lambda field: getattr(backup, field, None)
+    if get("storage_results"):
+        return get("storage_results")
+    return [{
+        "storage_type": get("storage_type"),
+        "file_path": get("file_path"),
+        "size": get("size"),
+        "storage_params": get("storage_params")
+    }]
+
+
+def location_values(storage_result: Dict[str, Any], created_at: datetime) -> Dict[str, Any]:
+    """
+    Поля записи BackupLocation по результату сохранения в хранилище
+
+    Args:
+        storage_result: Результат сохранения (storage_type, file_path, size, storage_params, checksum)
+        created_at: Время создания бэкапа
+
+    Returns:
+        Словарь значений колонок без ID записи и бэкапа
+    """
+    storage_params = storage_result.get("storage_params") or {}
+    integration_id = storage_params.get("integration_id")
+    return {
+        "storage_type": storage_result["storage_type"],
+        "integration_id": str(integration_id) if integration_id is not None else None,
+        "storage_params": storage_result.get("storage_params"),
+        "file_path": storage_result["file_path"],
+        "size": storage_result.get("size"),
+        "status": "stored",
+        "checksum": storage_result.get("checksum"),
+        "kind": storage_result.get("kind", "backup"),
+        "tab": storage_result.get("tab"),
+        "created_at": created_at
+    }
+
+
+def write_backup_rows(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Записывает пачку бэкапов с их копиями в хранилищах, обновляет историю
+    и статистику таблиц (без коммита)
+
+    Args:
+        session: Сессия базы данных
+        rows: Строки для вставки в backups с заранее присвоенными ID
+    """
+    session.execute(insert(Backup), rows)
+    session.execute(insert(BackupLocation), [
+        {"id": str(uuid.uuid4()), "backup_id": row["id"], **location_values(result, row["created_at"])}
+        for row in rows
+        for result in storage_results_of(row)
+    ])
+    apply_backup_inserts(session, rows)
+
+    # Текущее состояние таблиц нужно для расчета интервала адаптивных расписаний
+    sheet_ids = list({row["sheet_id"] for row in rows})
+    current = {
+        row.id: {"last_content_hash": row.last_content_hash, "change_interval_minutes": row.change_interval_minutes}
+        for row in session.execute(
+            select(Sheet.id, Sheet.last_content_hash, Sheet.change_interval_minutes)
+            .where(Sheet.id.in_(sheet_ids))
+        )
+    }
+
+    updates: Dict[str, Dict[str, Any]] = {field: {} for field in SHEET_HISTORY_FIELDS}
+    for row in rows:
+        state = current.get(row["sheet_id"])
+        if state is None:
+            continue
+
+        updates["last_backup"][row["sheet_id"]] = row["created_at"]
+        change_state = compute_change_state(
+            state["last_content_hash"],
+            state["change_interval_minutes"],
+            (row["backup_metadata"] or {}).get("content_hash"),
+            row["created_at"]
+        )
+        state.update(change_state)
+        for field, value in change_state.items():
+            updates[field][row["sheet_id"]] = value
+
+    values = {
+        field: case(mapping, value=Sheet.id, else_=getattr(Sheet, field))
+        for field, mapping in updates.items()
+        if mapping
+    }
+    if values:
+        session.execute(
+            update(Sheet)
+            .where(Sheet.id.in_(list(updates["last_backup"])))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def create_persist_buffer(db: Optional[Session] = None, writer: Optional[DBWriter] = None) -> BackupPersistBuffer:
+    """
+    Создает буфер записей о бэкапах с настройками по умолчанию
+
+    Args:
+        db: Сессия базы данных
+        writer: Очередь записи в БД
+
+    Returns:
+        BackupPersistBuffer
+    """
+    return BackupPersistBuffer(
+        db=db,
+        writer=writer,
+        batch_size=settings.BACKUP_PERSIST_BATCH_SIZE,
+        flush_seconds=settings.BACKUP_PERSIST_FLUSH_SECONDS
+    )
@@ -1,25 +1,58 @@
 import io
 import json
+import hashlib
 import logging
+import tempfile
 import uuid
-import requests
-import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable
 from datetime import datetime
 import os
 
+from app.core.config import settings
+from app.db.writer import DBWriter
 from app.services.google_service import google_service
-from app.services.storage import get_storage
+from app.services.storage import get_storage, StorageResolver
 from app.models.backup import Backup
-from app.services.integration_service import IntegrationService
+from app.services.backup_coalescer import backup_coalescer
+from app.services.backup_persistence import create_persist_buffer
+from app.services.parquet_service import save_parquet_tabs, values_to_frame
+from app.services.incremental_service import build_segment, find_base, tab_states
+from app.services.snapshot_service import (
+    DEFAULT_BACKUP_FORMAT, EXPORT_FORMAT, backup_content_type, is_snapshot_format, snapshot_extension,
+    snapshot_content_hash, write_snapshot, write_export_bundle, read_snapshot
+)
 
 logger = logging.getLogger(__name__)
 
+# Размер снимка, до которого архив собирается в памяти, а не во временном файле
+SNAPSHOT_SPOOL_BYTES = 16 * 1024 * 1024
+
+
+class BackupResult:
+    """
+    Результат создания резервной копии (до сохранения записи в БД)
+    """
+    def __init__(self, filename, file_path, size, status, storage_type, backup_metadata, storage_params=None, storage_results=None, parent_backup_id=None):
+        self.filename = filename
+        self.file_path = file_path
+        self.size = size
+        self.status = status
+        self.storage_type = storage_type
+        self.storage_params = storage_params
+        self.backup_metadata = backup_metadata
+        self.storage_results = storage_results
+        self.parent_backup_id = parent_backup_id
+
+
 def backup_sheet_by_id(
     sheet_id: str, 
     sheet_name: str,
     storage_configs: List[Dict[str, Any]],
-    db: Optional[Any] = None
+    db: Optional[Any] = None,
+    storage_resolver: Optional[StorageResolver] = None,
+    backup_format: str = DEFAULT_BACKUP_FORMAT,
+    credentials_id: Optional[str] = None,
+    incremental_base: Optional[Dict[str, Any]] = None
 ) -> Optional[Backup]:
     """
     Создание резервной копии одной таблицы Google Sheets
@@ -29,39 +62,79 @@ def backup_sheet_by_id(
         sheet_name: Название таблицы
         storage_configs: Список конфигураций хранилищ в формате [{"storage_type": str, "storage_params": dict}]
         db: Сессия базы данных (для получения настроек интеграции)
+        storage_resolver: Хранилища запуска (чтобы не настраивать их для каждой таблицы)
+        backup_format: Формат бэкапа: "xlsx" (экспорт книги), "ndjson" или "csv" (снимок значений листов),
+            "csv_export" (параллельный CSV-экспорт листов)
+        credentials_id: ID сервисного аккаунта таблицы (None - наименее загруженный аккаунт пула)
+        incremental_base: Предыдущий снимок таблицы-журнала (find_base); если строки в конце
+            его листов не изменились, сохраняется сегмент только с новыми строками
         
     Returns:
         Backup или None: Информация о созданной резервной копии или None в случае ошибки
     """
     try:
-        logger.info(f"Создание резервной копии для таблицы {sheet_name} (ID: {sheet_id})")
+        logger.info(f"Создание резервной копии для таблицы {sheet_name} (ID: {sheet_id}) в формате {backup_format}")
         logger.info(f"Полученные конфигурации хранилищ: {storage_configs}")
         
-        # Прямой URL для экспорта таблицы в формате XLSX
-        export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=xlsx"
-        
-        # Делаем запрос с использованием аутентификации Google Service
-        response = requests.get(
-            export_url, 
-            headers={"Authorization": f"Bearer {google_service.credentials.token}"}
-        )
-        
-        # Проверяем успешность запроса
-        if response.status_code != 200:
-            logger.error(f"Не удалось экспортировать таблицу {sheet_id}. Код ответа: {response.status_code}")
-            return None
-        
-        # Получаем бинарные данные файла
-        file_data = io.BytesIO(response.content)
+        manifest = None
+        values_by_sheet = None
+        if is_snapshot_format(backup_format) or backup_format == EXPORT_FORMAT:
+            # Архив пишется во временный файл, большие снимки не держатся в памяти
+            file_data = tempfile.SpooledTemporaryFile(max_size=SNAPSHOT_SPOOL_BYTES)
+            
+            if backup_format == EXPORT_FORMAT:
+                # Параллельный CSV-экспорт каждого листа вместо экспорта книги целиком
+                tabs = google_service.get_sheet_tabs(sheet_id, credentials_id)
+                if tabs is None:
+                    logger.error(f"Не удалось получить листы таблицы {sheet_id}")
+                    return None
+                # Листы-диаграммы не экспортируются в CSV
+                tabs = [tab for tab in tabs if tab["sheet_type"] == "GRID"]
+                manifest = write_export_bundle(google_service.iter_tab_exports(sheet_id, tabs, credentials_id), file_data)
+            else:
+                # Сегмент инкрементального снимка: только строки, добавленные после основы
+                segment = build_segment(sheet_id, incremental_base, credentials_id) if incremental_base else None
+                if segment:
+                    values_by_sheet, extra, tab_extra = segment
+                else:
+                    # Снимок значений листов через Sheets values API
+                    values_by_sheet = google_service.get_sheet_values_by_sheets(sheet_id, credentials_id)
+                    if values_by_sheet is None:
+                        logger.error(f"Не удалось получить значения листов таблицы {sheet_id}")
+                        return None
+                    # Состояние листов позволяет следующему бэкапу стать сегментом этого снимка
+                    extra = {"tail_rows": settings.INCREMENTAL_TAIL_ROWS}
+                    tab_extra = tab_states(values_by_sheet, settings.INCREMENTAL_TAIL_ROWS)
+                manifest = write_snapshot(values_by_sheet, backup_format, file_data, extra=extra, tab_extra=tab_extra)
+            
+            file_data.seek(0)
+            checksum_hash = hashlib.sha256()
+            for chunk in iter(lambda: file_data.read(1024 * 1024), b""):
+                checksum_hash.update(chunk)
+            checksum = checksum_hash.hexdigest()
+        else:
+            # Экспорт таблицы в формате XLSX от имени сервисного аккаунта таблицы
+            content = google_service.export_xlsx(sheet_id, credentials_id)
+            if content is None:
+                return None
+            
+            # Получаем бинарные данные файла
+            file_data = io.BytesIO(content)
+            
+            # Контрольная сумма файла для проверки копий в хранилищах
+            checksum = hashlib.sha256(content).hexdigest()
         
         # Генерируем имя файла с названием таблицы вместо ID
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         # Заменяем недопустимые символы в имени файла
         safe_sheet_name = sheet_name.replace("/", "_").replace("\\", "_").replace(":", "_").replace("*", "_").replace("?", "_").replace("\"", "_").replace("<", "_").replace(">", "_").replace("|", "_")
-        filename = f"{safe_sheet_name}_{timestamp}.xlsx"
+        incremental = manifest.get("incremental") if manifest else None
+        suffix = "_inc" if incremental else ""
+        filename = f"{safe_sheet_name}_{timestamp}{suffix}.{snapshot_extension(backup_format)}"
         
         # Результаты сохранения в разные хранилища
         storage_results = []
+        storage_resolver = storage_resolver or StorageResolver(db)
         
         # Сохраняем файл в каждое выбранное хранилище
         for config in storage_configs:
@@ -71,82 +144,17 @@ def backup_sheet_by_id(
             logger.info(f"Обработка хранилища {storage_type} с параметрами: {storage_params}")
             
             try:
-                # Инициализируем хранилище в зависимости от типа
-                storage_instance = None
-                
-                if storage_type == "local":
-                    # Для локального хранилища используем стандартные параметры
-                    storage_instance = get_storage(storage_type)
-                    logger.info("Создан экземпляр локального хранилища")
-                elif storage_type == "bitrix":
-                    # Для Битрикс24 получаем настройки из интеграции, если не переданы напрямую
-                    logger.info(f"Обработка хранилища Битрикс24, начальные параметры: {storage_params}")
-                    
-                    bitrix_params = None
-                    
-                    # Проверяем наличие ID интеграции в параметрах
-                    if db and storage_params and storage_params.get("integration_id") is not None:
-                        integration_id = storage_params.get("integration_id")
-                        logger.info(f"Получение интеграции по ID: {integration_id}")
-                        
-                        # Получаем настройки из базы данных по ID интеграции
-                        integration = IntegrationService.get_integration_by_id(db, integration_id)
-                        if not integration:
-                            logger.error(f"Не найдена интеграция Битрикс24 с ID {integration_id}")
-                            continue
-                        
-                        logger.info(f"Найдена интеграция: {integration}, тип: {integration.type}")
-                        
-                        if integration.type != "bitrix":
-                            logger.error(f"Найденная интеграция с ID {integration_id} имеет неверный тип: {integration.type}")
-                            continue
-                        
-                        logger.info(f"Использую настройки из интеграции: {integration.settings}")
-                        bitrix_params = integration.settings
-                    
-                    # Если есть webhook_url в storage_params, используем его напрямую
-                    elif storage_params and storage_params.get("webhook_url"):
-                        logger.info(f"Использую прямые параметры для Битрикс24: {storage_params}")
-                        bitrix_params = storage_params
-                    
-                    # Пытаемся получить настройки из базы данных
-                    elif db:
-                        logger.info("Получение настроек Битрикс24 из базы данных")
-                        bitrix_settings = IntegrationService.get_bitrix_settings(db)
-                        if not bitrix_settings:
-                            logger.error("Не настроена интеграция с Битрикс24")
-                            continue
-                        
-                        logger.info(f"Использую настройки Битрикс24 из базы данных: {bitrix_settings}")
-                        bitrix_params = bitrix_settings
-                    else:
-                        logger.error("Не указаны параметры для хранилища Битрикс24 и нет доступа к базе данных")
-                        continue
-                    
-                    # Проверяем наличие обязательного webhook_url
-                    if not bitrix_params or "webhook_url" not in bitrix_params:
-                        logger.error("Не указаны параметры webhook_url для хранилища Битрикс24")
-                        logger.error(f"Полученные параметры: {bitrix_params}")
-                        continue
-                    
-                    # Создаем экземпляр хранилища Битрикс24 с параметрами
-                    storage_instance = get_storage(
-                        storage_type, 
-                        webhook_url=bitrix_params["webhook_url"],
-                        folder_id=bitrix_params.get("folder_id"),
-                        base_path=bitrix_params.get("base_path", "backup_google_sheets")
-                    )
-                    logger.info("Создан экземпляр хранилища Битрикс24")
-                else:
-                    # Для других типов хранилищ
-                    storage_instance = get_storage(storage_type, **(storage_params or {}))
-                    logger.info(f"Создан экземпляр хранилища типа {storage_type}")
+                # Хранилище по типу и параметрам (для Битрикс24 - из интеграции), одно на запуск
+                storage_instance = storage_resolver.resolve(storage_type, storage_params)
+                if not storage_instance:
+                    logger.error(f"Не удалось настроить хранилище типа {storage_type}")
+                    continue
                 
                 # Сбрасываем указатель в начало файла перед каждым сохранением
                 file_data.seek(0)
                 
                 # Сохраняем файл в текущее хранилище
-                file_path = storage_instance.save(file_data, filename)
+                file_path = storage_instance.save(file_data, filename, backup_content_type(filename))
                 
                 if not file_path:
                     logger.error(f"Не удалось сохранить файл в хранилище типа {storage_type}")
@@ -164,7 +172,8 @@ def backup_sheet_by_id(
                     "storage_type": storage_type,
                     "file_path": file_path,
                     "size": file_info.get("size", 0) if file_info else 0,
-                    "storage_params": storage_params
+                    "storage_params": storage_params,
+                    "checksum": checksum
                 })
                 
                 logger.info(f"Файл успешно сохранен в хранилище {storage_type}: {file_path}")
@@ -181,36 +190,68 @@ def backup_sheet_by_id(
         # Используем информацию о первом успешном сохранении для основных полей
         primary_storage = storage_results[0]
         
-        # Пытаемся извлечь метаданные из Excel-файла
-        metadata = {"sheet_name": sheet_name}
-        try:
-            # Сбрасываем указатель в начало файла
-            file_data.seek(0)
-            
-            # Открываем Excel-файл для чтения метаданных
-            with pd.ExcelFile(file_data) as xls:
-                metadata["sheets"] = xls.sheet_names
-                # Подсчитываем общее количество строк во всех листах
-                total_rows = 0
-                for sheet in metadata["sheets"]:
-                    df = pd.read_excel(xls, sheet_name=sheet)
-                    total_rows += len(df)
-                metadata["rows_count"] = total_rows
-        except Exception as e:
-            logger.warning(f"Не удалось прочитать метаданные из файла: {str(e)}")
+        metadata = {"sheet_name": sheet_name, "format": backup_format}
+        # Таблицы листов для Parquet-файлов
+        frames: Dict[str, Any] = {}
+        if manifest is not None:
+            # Метаданные снимка берутся из манифеста, файл не перечитывается
+            metadata["sheets"] = [tab["title"] for tab in manifest["tabs"]]
+            metadata["rows_count"] = sum(tab["rows"] for tab in manifest["tabs"])
+            metadata["content_hash"] = snapshot_content_hash(manifest)
+            metadata["manifest"] = manifest
+            if incremental:
+                # Размер и хеш содержимого - всего листа, а не только сегмента
+                metadata["incremental"] = incremental
+                metadata["segment_rows"] = metadata["rows_count"]
+                metadata["rows_count"] = sum(tab["total_rows"] for tab in manifest["tabs"])
+                base_hash = incremental_base["metadata"].get("content_hash", "")
+                if metadata["segment_rows"]:
+                    metadata["content_hash"] = hashlib.sha256((base_hash + metadata["content_hash"]).encode("ascii")).hexdigest()
+                else:
+                    metadata["content_hash"] = base_hash
+        else:
+            # Пытаемся извлечь метаданные из Excel-файла
+            try:
+                # pandas загружается при первом бэкапе, а не при старте приложения
+                import pandas as pd
+                
+                # Сбрасываем указатель в начало файла
+                file_data.seek(0)
+                
+                # Открываем Excel-файл для чтения метаданных
+                with pd.ExcelFile(file_data) as xls:
+                    metadata["sheets"] = xls.sheet_names
+                    # Подсчитываем общее количество строк во всех листах
+                    # и хеш содержимого для отслеживания изменений между бэкапами
+                    total_rows = 0
+                    content_hash = hashlib.sha256()
+                    for sheet in metadata["sheets"]:
+                        df = pd.read_excel(xls, sheet_name=sheet)
+                        if settings.BACKUP_PARQUET_ENABLED:
+                            frames[sheet] = df
+                        total_rows += len(df)
+                        content_hash.update(sheet.encode("utf-8"))
+                        content_hash.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+                        content_hash.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+                    metadata["rows_count"] = total_rows
+                    metadata["content_hash"] = content_hash.hexdigest()
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать метаданные из файла: {str(e)}")
         
-        # Создаем объект для возврата
-        class BackupResult:
-            def __init__(self, filename, file_path, size, status, storage_type, backup_metadata, storage_params=None, storage_results=None):
-                self.filename = filename
-                self.file_path = file_path
-                self.size = size
-                self.status = status
-                self.storage_type = storage_type
-                self.storage_params = storage_params
-                self.backup_metadata = backup_metadata
-                self.storage_results = storage_results
+        # Parquet-файлы листов сохраняются рядом с основным файлом
+        if settings.BACKUP_PARQUET_ENABLED:
+            if manifest is not None:
+                if values_by_sheet is None:
+                    file_data.seek(0)
+                    values_by_sheet = read_snapshot(file_data)
+                frames = {title: values_to_frame(rows) for title, rows in values_by_sheet.items()}
+            saved_configs = [
+                {"storage_type": result["storage_type"], "storage_params": result["storage_params"]}
+                for result in storage_results
+            ]
+            storage_results.extend(save_parquet_tabs(frames, filename, saved_configs, storage_resolver))
         
+        # Создаем объект для возврата
         backup_result = BackupResult(
             filename=filename,
             file_path=primary_storage["file_path"],
@@ -219,10 +260,12 @@ def backup_sheet_by_id(
             storage_type=primary_storage["storage_type"],
             storage_params=primary_storage["storage_params"],
             backup_metadata=metadata,
-            storage_results=storage_results
+            storage_results=storage_results,
+            parent_backup_id=incremental["parent_backup_id"] if incremental else None
         )
         
         logger.info(f"Бэкап успешно создан: {filename} в {len(storage_results)} хранилищах")
+        file_data.close()
         return backup_result
     
     except Exception as e:
@@ -301,103 +344,137 @@ def delete_backup(backup_id: str, storage_type: str, storage_path: str) -> bool:
 def backup_sheets(
     sheets: List[Dict[str, str]],
     storage_configs: List[Dict[str, Any]],
-    db: Optional[Any] = None
+    db: Optional[Any] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    writer: Optional[DBWriter] = None,
+    backup_format: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Создание резервных копий для нескольких таблиц Google Sheets
     
     Args:
-        sheets: Список таблиц в формате [{"id": str, "name": str, "spreadsheet_id": str}]
+        sheets: Список таблиц в формате [{"id": str, "name": str, "spreadsheet_id": str, "credentials_id": str, "append_only": bool}]
         storage_configs: Список конфигураций хранилищ
         db: Сессия базы данных
+        on_result: Функция, вызываемая с результатом каждой таблицы по мере выполнения
+        writer: Очередь записи в БД; если передана, записи о бэкапах сохраняются через нее
+        backup_format: Формат бэкапов ("xlsx" по умолчанию, "ndjson", "csv" или "csv_export")
+        
+    Записи о бэкапах сохраняются пачками (BACKUP_PERSIST_BATCH_SIZE,
+    BACKUP_PERSIST_FLUSH_SECONDS) и гарантированно записаны к возврату из функции;
+    результаты таблиц, запись о бэкапе которых сохранить не удалось, помечаются неудачными.
         
     Returns:
         Список результатов создания бэкапов для каждой таблицы
     """
     results = []
     
-    for sheet in sheets:
-        try:
-            sheet_id = sheet["id"]
-            sheet_name = sheet.get("name", "Неизвестная таблица")
-            spreadsheet_id = sheet.get("spreadsheet_id")
+    def notify(result: Dict[str, Any]) -> None:
+        if on_result:
+            try:
+                on_result(result)
+            except Exception as e:
+                logger.warning(f"Ошибка в обработчике результата бэкапа: {str(e)}")
+    
+    def add_result(result: Dict[str, Any]) -> None:
+        results.append(result)
+        notify(result)
+    
+    # Регистрируем запуск, чтобы объединить экспорт одних и тех же таблиц
+    # с одновременно сработавшими расписаниями
+    backup_format = backup_format or DEFAULT_BACKUP_FORMAT
+    # Таблицы-журналы дополняют цепочку снимков сегментом с новыми строками
+    incremental_bases = {}
+    if db is not None:
+        for sheet in sheets:
+            if sheet.get("append_only") and sheet.get("spreadsheet_id"):
+                try:
+                    incremental_bases[sheet["id"]] = find_base(db, sheet["id"], backup_format)
+                except Exception as e:
+                    logger.warning(f"Не удалось найти основу сегмента таблицы {sheet['id']}, создается полный снимок: {str(e)}")
+    coalesced_run = backup_coalescer.register(sheets, storage_configs, backup_format, incremental_bases)
+    
+    # Записи о бэкапах сохраняются через очередь записи или переданную сессию
+    persist_buffer = create_persist_buffer(db=db, writer=writer)
+    persist_buffer.start()
+    # Результаты по ID записей о бэкапах, чтобы пометить несохраненные
+    persisted_results: Dict[str, Dict[str, Any]] = {}
+    
+    # Хранилища настраиваются один раз на весь запуск
+    storage_resolver = StorageResolver(db)
+    
+    try:
+        for sheet in coalesced_run.ordered(sheets):
+            try:
+                sheet_id = sheet["id"]
+                sheet_name = sheet.get("name", "Неизвестная таблица")
+                spreadsheet_id = sheet.get("spreadsheet_id")
             
-            if not spreadsheet_id:
-                logger.error(f"Не указан spreadsheet_id для таблицы {sheet_id} ({sheet_name})")
-                results.append({
-                    "sheet_id": sheet_id,
-                    "sheet_name": sheet_name,
-                    "success": False,
-                    "error": "Отсутствует spreadsheet_id"
-                })
-                continue
+                if not spreadsheet_id:
+                    logger.error(f"Не указан spreadsheet_id для таблицы {sheet_id} ({sheet_name})")
+                    add_result({
+                        "sheet_id": sheet_id,
+                        "sheet_name": sheet_name,
+                        "success": False,
+                        "error": "Отсутствует spreadsheet_id"
+                    })
+                    continue
+            
+                incremental_base = incremental_bases.get(sheet_id)
             
-            # Создаем бэкап для текущей таблицы
-            backup_result = backup_sheet_by_id(
-                sheet_id=spreadsheet_id,
-                sheet_name=sheet_name,
-                storage_configs=storage_configs,
-                db=db
-            )
+                # Создаем бэкап для текущей таблицы
+                backup_result = coalesced_run.backup(
+                    spreadsheet_id,
+                    sheet_name,
+                    db=db,
+                    storage_resolver=storage_resolver,
+                    credentials_id=sheet.get("credentials_id"),
+                    incremental_base=incremental_base
+                )
             
-            if backup_result:
-                # Создаем запись о бэкапе в базе данных, если передана сессия
-                if db is not None:
-                    try:
-                        from app.models.backup import Backup
-                        from app.models.sheet import Sheet
-                        
-                        # Создание записи о бэкапе в БД
-                        backup = Backup(
-                            sheet_id=sheet_id,
-                            filename=backup_result.filename,
-                            file_path=backup_result.file_path,
-                            size=backup_result.size,
-                            status=backup_result.status,
-                            storage_type=backup_result.storage_type,
-                            storage_params=backup_result.storage_params,
-                            storage_results=backup_result.storage_results,
-                            backup_metadata=backup_result.backup_metadata,
-                            created_at=datetime.utcnow()
-                        )
-                        
-                        db.add(backup)
-                        db.commit()
-                        db.refresh(backup)
-                        
-                        # Обновляем время последнего бэкапа для таблицы
-                        sheet_obj = db.query(Sheet).filter(Sheet.id == sheet_id).first()
-                        if sheet_obj:
-                            sheet_obj.last_backup = backup.created_at
-                            db.commit()
-                        
-                        logger.info(f"Бэкап для таблицы {sheet_name} сохранен в БД: {backup.id}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при сохранении бэкапа в БД: {str(e)}")
+                if backup_result:
+                    # Запись о бэкапе сохраняется пачкой вместе с другими таблицами запуска
+                    record_id = persist_buffer.add(sheet_id, backup_result)
                 
-                results.append({
-                    "sheet_id": sheet_id,
-                    "sheet_name": sheet_name,
-                    "success": True,
-                    "backup_id": backup_result.filename,
-                    "storage_results": backup_result.storage_results
-                })
-            else:
-                results.append({
-                    "sheet_id": sheet_id,
-                    "sheet_name": sheet_name,
+                    result = {
+                        "sheet_id": sheet_id,
+                        "sheet_name": sheet_name,
+                        "success": True,
+                        "backup_id": backup_result.filename,
+                        "storage_results": backup_result.storage_results,
+                        "content_hash": (backup_result.backup_metadata or {}).get("content_hash")
+                    }
+                    if record_id:
+                        persisted_results[record_id] = result
+                    add_result(result)
+                else:
+                    add_result({
+                        "sheet_id": sheet_id,
+                        "sheet_name": sheet_name,
+                        "success": False,
+                        "error": "Не удалось создать бэкап"
+                    })
+        
+            except Exception as e:
+                logger.error(f"Ошибка при создании бэкапа для таблицы {sheet.get('id')}: {str(e)}")
+                add_result({
+                    "sheet_id": sheet.get("id"),
+                    "sheet_name": sheet.get("name", "Неизвестная таблица"),
                     "success": False,
-                    "error": "Не удалось создать бэкап"
+                    "error": str(e)
                 })
+    finally:
+        coalesced_run.close()
+        failed_ids = persist_buffer.close()
         
-        except Exception as e:
-            logger.error(f"Ошибка при создании бэкапа для таблицы {sheet.get('id')}: {str(e)}")
-            results.append({
-                "sheet_id": sheet.get("id"),
-                "sheet_name": sheet.get("name", "Неизвестная таблица"),
-                "success": False,
-                "error": str(e)
-            })
+        # Бэкап без записи в БД не виден в приложении и не учитывается политиками хранения
+        for record_id in failed_ids:
+            result = persisted_results.get(record_id)
+            if result is None:
+                continue
+            result["success"] = False
+            result["error"] = "Бэкап создан, но запись о нем не сохранена в БД"
+            notify(result)
     
     return results
 
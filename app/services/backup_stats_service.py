@@ -0,0 +1,329 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Union
+
+from sqlalchemy import select, update, delete, insert, func, case, or_
+from sqlalchemy.orm import Session
+
+from app.models.backup import Backup
+from app.models.sheet_backup_stats import SheetBackupStats
+
+logger = logging.getLogger(__name__)
+
+BackupRow = Union[Backup, Dict[str, Any]]
+
+
+def _value(row: BackupRow, field: str) -> Any:
+    return row.get(field) if isinstance(row, dict) else getattr(row, field)
+
+
+def _content_hash(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    return (metadata or {}).get("content_hash")
+
+
+def _upsert_insert(dialect_name: str):
+    """
+    Конструкция INSERT ... ON CONFLICT для диалекта (None, если диалект ее не поддерживает)
+    """
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert
+    return None
+
+
+def apply_backup_inserts(session: Session, rows: List[BackupRow]) -> None:
+    """
+    Учитывает новые бэкапы в статистике таблиц (без коммита)
+
+    Args:
+        session: Сессия базы данных
+        rows: Новые бэкапы (объекты Backup или словари с полями sheet_id, size,
+              status, created_at, backup_metadata)
+    """
+    aggregates: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        sheet_id = _value(row, "sheet_id")
+        created_at = _value(row, "created_at")
+        agg = aggregates.setdefault(sheet_id, {
+            "sheet_id": sheet_id,
+            "total_backups": 0,
+            "successful_backups": 0,
+            "failed_backups": 0,
+            "total_size": 0,
+            "first_backup_date": None,
+            "last_backup_date": None,
+            "last_content_hash": None,
+            "updated_at": datetime.utcnow()
+        })
+
+        agg["total_backups"] += 1
+        if _value(row, "status") == "completed":
+            agg["successful_backups"] += 1
+        else:
+            agg["failed_backups"] += 1
+        agg["total_size"] += _value(row, "size") or 0
+
+        if agg["first_backup_date"] is None or created_at < agg["first_backup_date"]:
+            agg["first_backup_date"] = created_at
+        if agg["last_backup_date"] is None or created_at >= agg["last_backup_date"]:
+            agg["last_backup_date"] = created_at
+            agg["last_content_hash"] = _content_hash(_value(row, "backup_metadata"))
+
+    if not aggregates:
+        return
+
+    dialect_insert = _upsert_insert(session.get_bind().dialect.name)
+    if dialect_insert is None:
+        _apply_inserts_generic(session, list(aggregates.values()))
+        return
+
+    statement = dialect_insert(SheetBackupStats).values(list(aggregates.values()))
+    excluded = statement.excluded
+    # В SET ссылки на колонки таблицы означают значения до обновления
+    is_newer = or_(
+        SheetBackupStats.last_backup_date.is_(None),
+        excluded.last_backup_date >= SheetBackupStats.last_backup_date
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[SheetBackupStats.sheet_id],
+        set_={
+            "total_backups": SheetBackupStats.total_backups + excluded.total_backups,
+            "successful_backups": SheetBackupStats.successful_backups + excluded.successful_backups,
+            "failed_backups": SheetBackupStats.failed_backups + excluded.failed_backups,
+            "total_size": SheetBackupStats.total_size + excluded.total_size,
+            "first_backup_date": case(
+                (or_(
+                    SheetBackupStats.first_backup_date.is_(None),
+                    excluded.first_backup_date < SheetBackupStats.first_backup_date
+                ), excluded.first_backup_date),
+                else_=SheetBackupStats.first_backup_date
+            ),
+            "last_backup_date": case((is_newer, excluded.last_backup_date), else_=SheetBackupStats.last_backup_date),
+            "last_content_hash": case(
+                (is_newer, func.coalesce(excluded.last_content_hash, SheetBackupStats.last_content_hash)),
+                else_=SheetBackupStats.last_content_hash
+            ),
+            "updated_at": excluded.updated_at
+        }
+    )
+    session.execute(statement)
+
+
+def _apply_inserts_generic(session: Session, aggregates: List[Dict[str, Any]]) -> None:
+    """
+    Обновление статистики для диалектов без INSERT ... ON CONFLICT
+    """
+    for agg in aggregates:
+        stats = session.get(SheetBackupStats, agg["sheet_id"], with_for_update=True)
+        if stats is None:
+            session.add(SheetBackupStats(**agg))
+            continue
+
+        stats.total_backups += agg["total_backups"]
+        stats.successful_backups += agg["successful_backups"]
+        stats.failed_backups += agg["failed_backups"]
+        stats.total_size += agg["total_size"]
+        if stats.first_backup_date is None or agg["first_backup_date"] < stats.first_backup_date:
+            stats.first_backup_date = agg["first_backup_date"]
+        if stats.last_backup_date is None or agg["last_backup_date"] >= stats.last_backup_date:
+            stats.last_backup_date = agg["last_backup_date"]
+            stats.last_content_hash = agg["last_content_hash"] or stats.last_content_hash
+        stats.updated_at = agg["updated_at"]
+
+
+def apply_backup_delete(session: Session, backup: BackupRow) -> None:
+    """
+    Исключает удаляемый бэкап из статистики таблицы (без коммита)
+
+    Args:
+        session: Сессия базы данных
+        backup: Удаляемый бэкап
+    """
+    apply_backup_deletes(session, [backup])
+
+
+def apply_backup_deletes(session: Session, backups: List[BackupRow]) -> None:
+    """
+    Исключает пачку удаляемых бэкапов из статистики таблиц (без коммита)
+
+    Args:
+        session: Сессия базы данных
+        backups: Удаляемые бэкапы (объекты Backup или словари)
+    """
+    by_sheet: Dict[str, List[BackupRow]] = {}
+    for backup in backups:
+        by_sheet.setdefault(_value(backup, "sheet_id"), []).append(backup)
+
+    for sheet_id, sheet_backups in by_sheet.items():
+        succeeded = sum(1 for backup in sheet_backups if _value(backup, "status") == "completed")
+        session.execute(
+            update(SheetBackupStats)
+            .where(SheetBackupStats.sheet_id == sheet_id)
+            .values(
+                total_backups=SheetBackupStats.total_backups - len(sheet_backups),
+                successful_backups=SheetBackupStats.successful_backups - succeeded,
+                failed_backups=SheetBackupStats.failed_backups - (len(sheet_backups) - succeeded),
+                total_size=SheetBackupStats.total_size - sum(_value(backup, "size") or 0 for backup in sheet_backups),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        stats = session.execute(
+            select(SheetBackupStats.total_backups, SheetBackupStats.first_backup_date, SheetBackupStats.last_backup_date)
+            .where(SheetBackupStats.sheet_id == sheet_id)
+        ).first()
+        if stats is None:
+            continue
+
+        if stats.total_backups <= 0:
+            session.execute(delete(SheetBackupStats).where(SheetBackupStats.sheet_id == sheet_id))
+            continue
+
+        # Границы периода пересчитываются по индексу (sheet_id, created_at), только если удален крайний бэкап
+        boundaries = (stats.first_backup_date, stats.last_backup_date)
+        if not any(_value(backup, "created_at") in boundaries for backup in sheet_backups):
+            continue
+
+        remaining = (
+            select(Backup)
+            .where(Backup.sheet_id == sheet_id)
+            .where(Backup.id.not_in([_value(backup, "id") for backup in sheet_backups]))
+        )
+        first_backup_date = session.execute(
+            remaining.with_only_columns(func.min(Backup.created_at))
+        ).scalar()
+        latest = session.execute(
+            remaining.with_only_columns(Backup.created_at, Backup.backup_metadata)
+            .order_by(Backup.created_at.desc(), Backup.id.desc())
+            .limit(1)
+        ).first()
+
+        session.execute(
+            update(SheetBackupStats)
+            .where(SheetBackupStats.sheet_id == sheet_id)
+            .values(
+                first_backup_date=first_backup_date,
+                last_backup_date=latest.created_at if latest else None,
+                last_content_hash=_content_hash(latest.backup_metadata) if latest else None
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def rebuild_stats(session: Session, sheet_id: Optional[str] = None) -> int:
+    """
+    Пересчитывает статистику бэкапов с нуля по таблице backups (без коммита)
+
+    Args:
+        session: Сессия базы данных
+        sheet_id: ID таблицы (None - для всех таблиц)
+
+    Returns:
+        int: Количество таблиц с пересчитанной статистикой
+    """
+    aggregate = select(
+        Backup.sheet_id,
+        func.count(Backup.id).label("total_backups"),
+        func.coalesce(func.sum(case((Backup.status == "completed", 1), else_=0)), 0).label("successful_backups"),
+        func.coalesce(func.sum(Backup.size), 0).label("total_size"),
+        func.min(Backup.created_at).label("first_backup_date"),
+        func.max(Backup.created_at).label("last_backup_date")
+    ).group_by(Backup.sheet_id)
+
+    clear = delete(SheetBackupStats)
+    if sheet_id:
+        aggregate = aggregate.where(Backup.sheet_id == sheet_id)
+        clear = clear.where(SheetBackupStats.sheet_id == sheet_id)
+
+    now = datetime.utcnow()
+    rows = []
+    for stats in session.execute(aggregate):
+        latest_metadata = session.execute(
+            select(Backup.backup_metadata)
+            .where(Backup.sheet_id == stats.sheet_id)
+            .order_by(Backup.created_at.desc(), Backup.id.desc())
+            .limit(1)
+        ).scalar()
+        rows.append({
+            "sheet_id": stats.sheet_id,
+            "total_backups": stats.total_backups,
+            "successful_backups": stats.successful_backups,
+            "failed_backups": stats.total_backups - stats.successful_backups,
+            "total_size": stats.total_size,
+            "first_backup_date": stats.first_backup_date,
+            "last_backup_date": stats.last_backup_date,
+            "last_content_hash": _content_hash(latest_metadata),
+            "updated_at": now
+        })
+
+    session.execute(clear)
+    if rows:
+        session.execute(insert(SheetBackupStats), rows)
+
+    logger.info(f"Статистика бэкапов пересчитана для {len(rows)} таблиц")
+    return len(rows)
+
+
+def ensure_stats_initialized(session: Session) -> None:
+    """
+    Заполняет статистику при первом запуске с уже существующими бэкапами
+
+    Args:
+        session: Сессия базы данных
+    """
+    has_stats = session.execute(select(SheetBackupStats.sheet_id).limit(1)).first()
+    has_backups = session.execute(select(Backup.id).limit(1)).first()
+    if has_backups and not has_stats:
+        rebuild_stats(session)
+        session.commit()
+
+
+def stats_to_dict(stats: Optional[SheetBackupStats]) -> Dict[str, Any]:
+    """
+    Статистика таблицы в формате ответа API
+
+    Args:
+        stats: Строка статистики или None, если бэкапов нет
+
+    Returns:
+        Словарь со статистикой
+    """
+    if stats is None:
+        return {
+            "total_backups": 0,
+            "total_size": 0,
+            "successful_backups": 0,
+            "failed_backups": 0,
+            "average_size": 0,
+            "first_backup_date": None,
+            "last_backup_date": None,
+            "last_content_hash": None
+        }
+
+    return {
+        "total_backups": stats.total_backups,
+        "total_size": stats.total_size,
+        "successful_backups": stats.successful_backups,
+        "failed_backups": stats.failed_backups,
+        "average_size": stats.average_size,
+        "first_backup_date": stats.first_backup_date,
+        "last_backup_date": stats.last_backup_date,
+        "last_content_hash": stats.last_content_hash
+    }
+
+
+if __name__ == "__main__":
+    # Пересчет статистики: python -m app.services.backup_stats_service
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        rebuild_stats(db)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,295 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.schedule_sheet_state import ScheduleSheetState
+from app.models.sheet import Sheet
+from app.models.sync_state import SyncState
+from app.services.adaptive_service import load_schedule_states
+from app.services.credentials_pool import credentials_pool, CredentialsPool, ServiceAccount
+
+logger = logging.getLogger(__name__)
+
+# Ключ токена ленты изменений сервисного аккаунта в таблице sync_states
+CHANGES_KEY_PREFIX = "drive_changes"
+# Из ленты нужны только ID измененных файлов и токены страниц
+CHANGES_FIELDS = "nextPageToken,newStartPageToken,changes(fileId)"
+# Коды ответа, означающие недействительный или устаревший токен страницы
+INVALID_TOKEN_STATUS_CODES = (400, 404, 410)
+
+
+class _InvalidPageToken(Exception):
+    """Сохраненный токен страницы больше не принимается лентой изменений"""
+
+
+def mark_dirty(db: Session, spreadsheet_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Помечает таблицы измененными (без фиксации транзакции)
+
+    Args:
+        db: Сессия базы данных
+        spreadsheet_ids: ID таблиц Google Sheets; None - все таблицы
+
+    Returns:
+        int: Количество помеченных таблиц
+    """
+    statement = update(Sheet).values(dirty=True, changed_at=datetime.utcnow())
+    if spreadsheet_ids is not None:
+        spreadsheet_ids = list(spreadsheet_ids)
+        if not spreadsheet_ids:
+            return 0
+        statement = statement.where(Sheet.spreadsheet_id.in_(spreadsheet_ids))
+    return db.execute(statement).rowcount
+
+
+def is_changed_for(sheet: Sheet, state: Optional[ScheduleSheetState]) -> bool:
+    """
+    Изменилась ли таблица после того, как расписание последний раз взяло ее в бэкап
+
+    Args:
+        sheet: Таблица
+        state: Состояние таблицы в расписании
+
+    Returns:
+        bool: True, если таблице нужен бэкап
+    """
+    if state is None or state.changes_seen_at is None:
+        return True
+    return sheet.changed_at is not None and sheet.changed_at >= state.changes_seen_at
+
+
+def claim_dirty_sheets(
+    db: Session,
+    schedule_id: str,
+    sheets: List[Sheet]
+) -> Tuple[List[Sheet], Dict[str, Optional[datetime]]]:
+    """
+    Отбирает таблицы, изменившиеся после прошлого отбора этим расписанием,
+    и отмечает время отбора в состоянии таблицы в расписании.
+
+    Изменения учитываются отдельно для каждого расписания, поэтому расписания
+    с общей таблицей не забирают изменения друг у друга. Время отбора
+    отмечается до бэкапа, поэтому изменения, пришедшие во время бэкапа,
+    попадут в следующий запуск.
+
+    Args:
+        db: Сессия базы данных
+        schedule_id: ID расписания
+        sheets: Таблицы расписания
+
+    Returns:
+        Отобранные таблицы и прежнее время отбора каждой из них (для restore_dirty)
+    """
+    states = load_schedule_states(db, schedule_id, [sheet.id for sheet in sheets])
+    changed = [sheet for sheet in sheets if is_changed_for(sheet, states.get(sheet.id))]
+    if not changed:
+        return [], {}
+
+    now = datetime.utcnow()
+    previous: Dict[str, Optional[datetime]] = {}
+    for sheet in changed:
+        state = states.get(sheet.id)
+        if state is None:
+            state = ScheduleSheetState(schedule_id=schedule_id, sheet_id=sheet.id)
+            db.add(state)
+        previous[sheet.id] = state.changes_seen_at
+        state.changes_seen_at = now
+        state.updated_at = now
+
+    db.execute(
+        update(Sheet)
+        .where(Sheet.id.in_(list(previous)))
+        .values(dirty=False)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return changed, previous
+
+
+def restore_dirty(db: Session, schedule_id: str, previous: Dict[str, Optional[datetime]]) -> None:
+    """
+    Возвращает прежнее время отбора таблицам, бэкап которых по расписанию не удался,
+    чтобы их изменения попали в следующий запуск
+
+    Args:
+        db: Сессия базы данных
+        schedule_id: ID расписания
+        previous: Прежнее время отбора по ID таблиц (из claim_dirty_sheets)
+    """
+    if not previous:
+        return
+
+    try:
+        # Сессия могла остаться в ошибочной транзакции после сбоя запуска
+        db.rollback()
+        states = load_schedule_states(db, schedule_id, list(previous))
+        for sheet_id, changes_seen_at in previous.items():
+            state = states.get(sheet_id)
+            if state is not None:
+                state.changes_seen_at = changes_seen_at
+        db.execute(
+            update(Sheet)
+            .where(Sheet.id.in_(list(previous)))
+            .values(dirty=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        logger.info(f"Изменения {len(previous)} таблиц расписания {schedule_id} возвращены для следующего запуска")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при возврате изменений таблиц расписания {schedule_id}: {str(e)}")
+
+
+class DriveChangesPoller:
+    """
+    Опрос ленты изменений Google Drive (changes.list) для пометки измененных таблиц.
+
+    Для каждого сервисного аккаунта хранится токен страницы ленты; один
+    запрос за интервал опроса возвращает все файлы, измененные с прошлого
+    опроса, вместо проверки каждой таблицы отдельно. Если токена нет или
+    он устарел, все таблицы помечаются измененными и лента начинается заново.
+    """
+    def __init__(self, pool: CredentialsPool, base_url: str, scope: str, page_size: int = 1000):
+        self.pool = pool
+        self.base_url = base_url.rstrip("/")
+        self.scope = scope
+        self.page_size = page_size
+        self._lock = threading.Lock()
+
+    def _get(self, account: ServiceAccount, path: str, params: dict) -> dict:
+        """
+        GET-запрос к Drive API от имени сервисного аккаунта
+
+        Raises:
+            _InvalidPageToken: Токен страницы не принят
+            requests.RequestException: Ошибка запроса
+        """
+        account.acquire(self.scope)
+        response = requests.get(
+            f"{self.base_url}{path}",
+            params=params,
+            headers={"Authorization": f"Bearer {account.scoped_token(self.scope)}"},
+            timeout=30
+        )
+        if "pageToken" in params and response.status_code in INVALID_TOKEN_STATUS_CODES:
+            raise _InvalidPageToken(f"Код ответа ленты изменений: {response.status_code}")
+        if response.status_code != 200:
+            account.record_error(f"Код ответа ленты изменений: {response.status_code}", response.status_code, response.content)
+            response.raise_for_status()
+        return response.json()
+
+    def start_page_token(self, account: ServiceAccount) -> str:
+        """
+        Токен текущего конца ленты изменений
+
+        Args:
+            account: Сервисный аккаунт
+
+        Returns:
+            str: Токен страницы
+        """
+        data = self._get(account, "/changes/startPageToken", {"supportsAllDrives": "true"})
+        return data["startPageToken"]
+
+    def read_changes(self, account: ServiceAccount, page_token: str) -> Tuple[Set[str], str]:
+        """
+        Читает все страницы ленты изменений начиная с токена
+
+        Args:
+            account: Сервисный аккаунт
+            page_token: Сохраненный токен страницы
+
+        Returns:
+            Кортеж (ID измененных файлов, токен для следующего опроса)
+        """
+        file_ids: Set[str] = set()
+        while True:
+            data = self._get(account, "/changes", {
+                "pageToken": page_token,
+                "pageSize": self.page_size,
+                "spaces": "drive",
+                "includeItemsFromAllDrives": "true",
+                "supportsAllDrives": "true",
+                "fields": CHANGES_FIELDS
+            })
+            file_ids.update(change["fileId"] for change in data.get("changes", []) if change.get("fileId"))
+            if data.get("newStartPageToken"):
+                return file_ids, data["newStartPageToken"]
+            page_token = data["nextPageToken"]
+
+    def poll_account(self, db: Session, account: ServiceAccount) -> Optional[int]:
+        """
+        Опрашивает ленту изменений аккаунта и помечает измененные таблицы
+
+        Args:
+            db: Сессия базы данных
+            account: Сервисный аккаунт
+
+        Returns:
+            int или None: Количество помеченных таблиц или None в случае ошибки
+        """
+        key = f"{CHANGES_KEY_PREFIX}:{account.id}"
+        state = db.get(SyncState, key)
+
+        try:
+            page_token = None
+            if state and state.page_token:
+                try:
+                    file_ids, page_token = self.read_changes(account, state.page_token)
+                    marked = mark_dirty(db, file_ids)
+                except _InvalidPageToken as e:
+                    logger.warning(f"Токен ленты изменений аккаунта {account.id} устарел ({str(e)}), лента начинается заново")
+
+            if page_token is None:
+                page_token = self.start_page_token(account)
+                # Изменения до начала ленты неизвестны - бэкапим все таблицы
+                marked = mark_dirty(db)
+
+            if state is None:
+                state = SyncState(key=key)
+                db.add(state)
+            state.page_token = page_token
+            state.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка при опросе ленты изменений аккаунта {account.id}: {str(e)}")
+            return None
+
+        if marked:
+            logger.info(f"По ленте изменений аккаунта {account.id} помечено измененных таблиц: {marked}")
+        return marked
+
+    def poll(self) -> int:
+        """
+        Опрашивает ленты изменений всех сервисных аккаунтов пула
+
+        Returns:
+            int: Количество помеченных таблиц
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.info("Опрос ленты изменений уже выполняется")
+            return 0
+
+        db = SessionLocal()
+        try:
+            return sum(self.poll_account(db, account) or 0 for account in self.pool.accounts())
+        finally:
+            db.close()
+            self._lock.release()
+
+
+# Создаем глобальный экземпляр опроса ленты изменений
+drive_changes_poller = DriveChangesPoller(
+    credentials_pool,
+    base_url=settings.DRIVE_CHANGES_BASE_URL,
+    scope=settings.DRIVE_CHANGES_SCOPE,
+    page_size=settings.DRIVE_CHANGES_PAGE_SIZE
+)
@@ -0,0 +1,323 @@
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Код ответа Google API, всегда означающий исчерпание квоты
+QUOTA_STATUS_CODE = 429
+
+# Причины ошибки 403, означающие исчерпание квоты (остальные 403 - нет доступа к ресурсу);
+# сравниваются без учета регистра и подчеркиваний, как в errors[].reason и details[].reason
+QUOTA_ERROR_REASONS = ("ratelimitexceeded", "userratelimitexceeded", "quotaexceeded")
+
+
+def is_quota_error(status_code: Optional[int], body: Optional[Any] = None) -> bool:
+    """
+    Означает ли ответ Google API исчерпание квоты аккаунта
+
+    Код 403 возвращается и при исчерпании квоты, и при отсутствии доступа
+    к таблице, поэтому для него проверяется причина в JSON-теле ошибки.
+
+    Args:
+        status_code: HTTP-код ответа
+        body: Тело ответа (bytes или str)
+
+    Returns:
+        bool: True если аккаунт нужно поставить на паузу
+    """
+    if status_code == QUOTA_STATUS_CODE:
+        return True
+    if status_code != 403 or not body:
+        return False
+
+    try:
+        error = json.loads(body).get("error") or {}
+    except (ValueError, TypeError, AttributeError):
+        return False
+    if not isinstance(error, dict):
+        return False
+
+    reasons = [
+        item.get("reason")
+        for field in ("errors", "details")
+        if isinstance(error.get(field), list)
+        for item in error[field]
+        if isinstance(item, dict)
+    ]
+    return any(
+        isinstance(reason, str) and reason.replace("_", "").lower() in QUOTA_ERROR_REASONS
+        for reason in reasons
+    )
+
+
+class ServiceAccount:
+    """
+    Сервисный аккаунт Google из пула: учетные данные, токен доступа,
+    ограничитель частоты запросов и счетчики использования квоты.
+    """
+    def __init__(self, account_id: str, path: Path, rate_per_second: float, cooldown_seconds: float):
+        # Клиентские библиотеки Google загружаются при первом обращении к пулу
+        from google.oauth2 import service_account
+
+        self.id = account_id
+        self.path = path
+        self.credentials = service_account.Credentials.from_service_account_file(
+            str(path),
+            scopes=[settings.GOOGLE_API_SCOPES]
+        )
+        self.email = self.credentials.service_account_email
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.cooldown_seconds = cooldown_seconds
+        self._token_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._sheets_service = None
+        self._scoped_credentials: Dict[str, Any] = {}
+
+        self.requests = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.last_used_at = 0.0
+        self.cooldown_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def sheets_service(self):
+        """
+        Клиент Google Sheets API этого аккаунта (создается при первом обращении).
+        Описание API берется из документа, входящего в пакет клиента, без запроса к серверу.
+        """
+        with self._lock:
+            if self._sheets_service is None:
+                from googleapiclient.discovery import build
+                self._sheets_service = build(
+                    'sheets', 'v4',
+                    credentials=self.credentials,
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+            return self._sheets_service
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Аккаунт не находится в паузе после исчерпания квоты
+        """
+        return time.monotonic() >= self.cooldown_until
+
+    def token(self) -> str:
+        """
+        Действующий токен доступа. Обновление токена выполняется под
+        блокировкой аккаунта, чтобы параллельные запросы не обновляли его одновременно.
+
+        Returns:
+            str: Токен доступа
+        """
+        with self._token_lock:
+            if not self.credentials.valid:
+                from google.auth.transport.requests import Request
+                self.credentials.refresh(Request())
+            return self.credentials.token
+
+    def scoped_token(self, scope: str) -> str:
+        """
+        Действующий токен доступа с другой областью (например, для Drive API).
+        Учетные данные с этой областью создаются один раз и обновляются под той же блокировкой.
+
+        Args:
+            scope: Область доступа OAuth
+
+        Returns:
+            str: Токен доступа
+        """
+        with self._token_lock:
+            credentials = self._scoped_credentials.get(scope)
+            if credentials is None:
+                credentials = self.credentials.with_scopes([scope])
+                self._scoped_credentials[scope] = credentials
+            if not credentials.valid:
+                from google.auth.transport.requests import Request
+                credentials.refresh(Request())
+            return credentials.token
+
+    def acquire(self, scope: Optional[str] = None) -> None:
+        """
+        Резервирует один запрос к API: ожидает ограничитель частоты аккаунта
+        и обновляет токен при необходимости
+
+        Args:
+            scope: Область доступа токена (по умолчанию - область Sheets API)
+        """
+        self.rate_limiter.acquire()
+        if scope:
+            self.scoped_token(scope)
+        else:
+            self.token()
+        with self._lock:
+            self.requests += 1
+            self.last_used_at = time.monotonic()
+
+    def record_error(self, error: str, status_code: Optional[int] = None, body: Optional[Any] = None) -> None:
+        """
+        Учитывает ошибку запроса; при исчерпании квоты аккаунт ставится на паузу
+
+        Args:
+            error: Текст ошибки
+            status_code: HTTP-код ответа
+            body: Тело ответа с описанием ошибки (для определения причины кода 403)
+        """
+        with self._lock:
+            self.errors += 1
+            self.last_error = error
+            if is_quota_error(status_code, body):
+                self.quota_errors += 1
+                self.cooldown_until = time.monotonic() + self.cooldown_seconds
+                logger.warning(f"Квота сервисного аккаунта {self.id} исчерпана, пауза {self.cooldown_seconds} с")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние и счетчики аккаунта
+
+        Returns:
+            Словарь со счетчиками запросов, ошибок и паузы
+        """
+        with self._lock:
+            return {
+                "id": self.id,
+                "email": self.email,
+                "healthy": self.healthy,
+                "requests": self.requests,
+                "errors": self.errors,
+                "quota_errors": self.quota_errors,
+                "cooldown_seconds_left": max(0.0, round(self.cooldown_until - time.monotonic(), 1)),
+                "last_error": self.last_error
+            }
+
+
+class CredentialsPool:
+    """
+    Пул сервисных аккаунтов Google, загружаемых из каталога JSON-ключей.
+
+    Таблица с заданным credentials_id всегда использует свой аккаунт,
+    остальные таблицы получают исправный аккаунт, дольше всех не
+    использовавшийся, поэтому квоты расходуются равномерно.
+    Ключи загружаются при первом обращении к пулу, а не при импорте.
+    """
+    def __init__(self, credentials_dir: Path, fallback_path: Optional[Path] = None):
+        self.credentials_dir = credentials_dir
+        self.fallback_path = fallback_path
+        self._accounts: Optional[Dict[str, ServiceAccount]] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _loaded_accounts(self) -> Dict[str, ServiceAccount]:
+        """
+        Аккаунты пула (при первом вызове загружаются из каталога ключей)
+        """
+        if self._accounts is None:
+            with self._load_lock:
+                if self._accounts is None:
+                    self.reload()
+        return self._accounts
+
+    def reload(self) -> int:
+        """
+        Загружает сервисные аккаунты из каталога (ID аккаунта - имя файла без расширения)
+
+        Returns:
+            int: Количество загруженных аккаунтов
+        """
+        paths = sorted(self.credentials_dir.glob("*.json")) if self.credentials_dir.is_dir() else []
+        if not paths and self.fallback_path and self.fallback_path.exists():
+            paths = [self.fallback_path]
+
+        accounts = {}
+        for path in paths:
+            try:
+                accounts[path.stem] = ServiceAccount(
+                    path.stem,
+                    path,
+                    rate_per_second=settings.GOOGLE_ACCOUNT_RATE_PER_SECOND,
+                    cooldown_seconds=settings.GOOGLE_ACCOUNT_COOLDOWN_SECONDS
+                )
+            except Exception as e:
+                logger.error(f"Не удалось загрузить сервисный аккаунт из {path}: {str(e)}")
+
+        with self._lock:
+            self._accounts = accounts
+
+        if accounts:
+            logger.info(f"Загружено сервисных аккаунтов Google: {len(accounts)}")
+        else:
+            logger.error(f"Сервисные аккаунты Google не найдены в {self.credentials_dir}")
+        return len(accounts)
+
+    def get(self, credentials_id: Optional[str] = None) -> Optional[ServiceAccount]:
+        """
+        Аккаунт для запросов к таблице
+
+        Если закрепленного аккаунта нет в пуле (ключ удален или переименован),
+        используется наименее загруженный аккаунт пула.
+
+        Args:
+            credentials_id: ID аккаунта, закрепленного за таблицей
+
+        Returns:
+            ServiceAccount или None, если подходящего аккаунта нет
+        """
+        accounts = self._loaded_accounts()
+        with self._lock:
+            if credentials_id:
+                account = accounts.get(credentials_id)
+                if account is not None:
+                    return account
+                logger.warning(
+                    f"Сервисный аккаунт {credentials_id} не найден в пуле, используется наименее загруженный аккаунт"
+                )
+
+            if not accounts:
+                return None
+
+            # Исправные аккаунты в приоритете; среди них - дольше всех не использовавшийся
+            account = min(accounts.values(), key=lambda a: (not a.healthy, a.last_used_at))
+            # Резервируем аккаунт сразу, чтобы параллельные запросы получили разные аккаунты
+            account.last_used_at = time.monotonic()
+            return account
+
+    def has(self, credentials_id: str) -> bool:
+        """
+        Есть ли аккаунт с таким ID в пуле
+
+        Args:
+            credentials_id: ID аккаунта
+
+        Returns:
+            bool: True, если аккаунт загружен
+        """
+        accounts = self._loaded_accounts()
+        with self._lock:
+            return credentials_id in accounts
+
+    def accounts(self) -> List[ServiceAccount]:
+        """
+        Список аккаунтов пула
+        """
+        accounts = self._loaded_accounts()
+        with self._lock:
+            return list(accounts.values())
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Состояние и счетчики всех аккаунтов пула
+        """
+        return [account.stats() for account in self.accounts()]
+
+
+# Создаем глобальный экземпляр пула
+credentials_pool = CredentialsPool(settings.CREDENTIALS_DIR, settings.CREDENTIALS_PATH)
@@ -1,72 +1,277 @@
-import os
 import logging
-from typing import Dict, List, Any, Optional
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import requests
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.services.credentials_pool import CredentialsPool, ServiceAccount, credentials_pool
 
 logger = logging.getLogger(__name__)
 
+# Маски полей метаданных таблицы: только то, что нужно вызывающему коду
+SHEET_TITLE_FIELDS = "spreadsheetId,spreadsheetUrl,properties.title"
+SHEET_TABS_FIELDS = "spreadsheetId,spreadsheetUrl,properties.title,sheets.properties(sheetId,title,sheetType)"
+SHEET_GRID_FIELDS = "sheets.properties(title,sheetType,gridProperties(rowCount,columnCount))"
+
+# Кеш отображаемых метаданных таблиц (название и ссылка). Списки листов и их
+# размеры не кешируются - бэкап должен экспортировать все текущие листы и строки
+metadata_cache = TTLCache(
+    ttl_seconds=settings.SHEET_METADATA_CACHE_TTL_SECONDS,
+    max_entries=settings.SHEET_METADATA_CACHE_MAX_ENTRIES
+)
+
+
+def column_letter(index: int) -> str:
+    """
+    Буквенное обозначение столбца по его номеру (1 -> A, 27 -> AA)
+
+    Args:
+        index: Номер столбца, начиная с 1
+
+    Returns:
+        str: Обозначение столбца в нотации A1
+    """
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def sheet_ranges(grid: List[Dict[str, Any]], max_cells: int) -> List[Dict[str, Any]]:
+    """
+    Диапазоны чтения листов по их реальным размерам.
+
+    Лист больше max_cells ячеек делится на окна строк, чтобы один ответ API
+    не был слишком большим, а окна можно было читать параллельно.
+
+    Args:
+        grid: Листы таблицы с размерами (title, row_count, column_count и
+            необязательный start_row - первая читаемая строка)
+        max_cells: Максимальное число ячеек в одном диапазоне
+
+    Returns:
+        List[Dict[str, Any]]: Диапазоны (title, range, start_row, row_count, cells)
+    """
+    ranges = []
+    for sheet in grid:
+        rows, columns = sheet["row_count"], sheet["column_count"]
+        if rows <= 0 or columns <= 0:
+            continue
+
+        title = sheet["title"].replace("'", "''")
+        last_column = column_letter(columns)
+        window = max(1, max_cells // columns)
+        for start in range(sheet.get("start_row", 1), rows + 1, window):
+            end = min(rows, start + window - 1)
+            ranges.append({
+                "title": sheet["title"],
+                "range": f"'{title}'!A{start}:{last_column}{end}",
+                "start_row": start,
+                "row_count": end - start + 1,
+                "cells": (end - start + 1) * columns
+            })
+    return ranges
+
+
+def pack_ranges(ranges: List[Dict[str, Any]], max_cells: int) -> List[List[Dict[str, Any]]]:
+    """
+    Группирует диапазоны в запросы batchGet не больше max_cells ячеек
+
+    Args:
+        ranges: Диапазоны чтения
+        max_cells: Максимальное число ячеек в одном запросе
+
+    Returns:
+        List[List[Dict[str, Any]]]: Диапазоны каждого запроса
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    cells = 0
+    for value_range in ranges:
+        if not batches or cells + value_range["cells"] > max_cells:
+            batches.append([])
+            cells = 0
+        batches[-1].append(value_range)
+        cells += value_range["cells"]
+    return batches
+
 class GoogleService:
     """
-    Сервис для работы с Google API
+    Сервис для работы с Google API.
+    
+    Запросы выполняются от имени сервисных аккаунтов из пула: таблица
+    с credentials_id использует свой аккаунт, остальные - наименее
+    загруженный исправный аккаунт.
     """
-    def __init__(self):
-        self.credentials = None
-        self.sheets_service = None
-        self._init_service()
+    def __init__(self, pool: CredentialsPool):
+        self.pool = pool
+        # httplib2.Http не потокобезопасен: у каждого потока свои соединения
+        self._local = threading.local()
     
-    def _init_service(self):
+    def _account(self, credentials_id: Optional[str] = None) -> Optional[ServiceAccount]:
         """
-        Инициализация сервиса Google Sheets API
+        Сервисный аккаунт для запросов к таблице
+        
+        Args:
+            credentials_id: ID аккаунта, закрепленного за таблицей
+            
+        Returns:
+            ServiceAccount или None, если аккаунт недоступен
         """
-        try:
-            # Проверка наличия файла с учетными данными
-            if not os.path.exists(settings.CREDENTIALS_PATH):
-                logger.error(f"Файл с учетными данными не найден: {settings.CREDENTIALS_PATH}")
-                return
-            
-            # Создание учетных данных из файла сервисного аккаунта
-            self.credentials = service_account.Credentials.from_service_account_file(
-                str(settings.CREDENTIALS_PATH),
-                scopes=[settings.GOOGLE_API_SCOPES]
-            )
+        account = self.pool.get(credentials_id)
+        if account is None:
+            logger.error("Нет доступного сервисного аккаунта Google")
+        return account
+    
+    def _thread_http(self, account: ServiceAccount) -> Any:
+        """
+        Авторизованное HTTP-соединение аккаунта для текущего потока
+        
+        Returns:
+            AuthorizedHttp: Соединение для выполнения запросов API
+        """
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        http = connections.get(account.id)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = connections[account.id] = AuthorizedHttp(account.credentials, http=httplib2.Http())
+        return http
+    
+    def _execute(self, account: ServiceAccount, request: Any) -> Dict[str, Any]:
+        """
+        Выполнение запроса API от имени аккаунта с учетом его квоты
+        
+        Args:
+            account: Сервисный аккаунт
+            request: Запрос клиента Google API
             
-            # Создание сервиса для работы с Google Sheets API
-            self.sheets_service = build('sheets', 'v4', credentials=self.credentials)
-            logger.info("Сервис Google Sheets успешно инициализирован")
+        Returns:
+            Dict[str, Any]: Ответ API
+        """
+        from googleapiclient.errors import HttpError
+        
+        account.acquire()
+        try:
+            return request.execute(http=self._thread_http(account))
+        except HttpError as e:
+            account.record_error(str(e), e.resp.status, e.content)
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при инициализации Google Sheets API: {str(e)}")
+            account.record_error(str(e))
+            raise
     
-    def get_sheet_info(self, spreadsheet_id: str) -> Optional[Dict[str, Any]]:
+    def _get_metadata(
+        self,
+        spreadsheet_id: str,
+        fields: str,
+        credentials_id: Optional[str] = None,
+        cached: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
-        Получение информации о таблице Google Sheets
+        Метаданные таблицы с маской полей (spreadsheets.get)
+        
+        Без маски Google возвращает весь ресурс таблицы со свойствами листов,
+        именованными диапазонами и условным форматированием - для больших книг
+        это мегабайты JSON.
         
         Args:
             spreadsheet_id: ID таблицы Google Sheets
+            fields: Маска полей ответа
+            credentials_id: ID сервисного аккаунта таблицы
+            cached: Брать ответ из кеша на SHEET_METADATA_CACHE_TTL_SECONDS
             
         Returns:
-            Dict или None: Метаданные таблицы или None в случае ошибки
+            Dict или None: Ответ API или None в случае ошибки
         """
-        if not self.sheets_service:
-            logger.error("Сервис Google Sheets не инициализирован")
-            return None
+        def load() -> Dict[str, Any]:
+            account = self._account(credentials_id)
+            if not account:
+                raise RuntimeError("нет доступного сервисного аккаунта")
+            return self._execute(account, account.sheets_service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields=fields
+            ))
         
         try:
-            result = self.sheets_service.spreadsheets().get(
-                spreadsheetId=spreadsheet_id
-            ).execute()
-            
-            return {
-                "spreadsheet_id": result["spreadsheetId"],
-                "title": result["properties"]["title"],
-                "sheets": [sheet["properties"]["title"] for sheet in result["sheets"]],
-                "url": result["spreadsheetUrl"],
-                "owner": self._get_owner_email(spreadsheet_id)
-            }
+            if not cached:
+                return load()
+            # Ошибка пробрасывается из загрузки и не попадает в кеш: после выдачи
+            # доступа проверка должна пройти сразу
+            return metadata_cache.get_or_load((spreadsheet_id, credentials_id, fields), load)
         except Exception as e:
-            logger.error(f"Ошибка при получении информации о таблице {spreadsheet_id}: {str(e)}")
+            logger.error(f"Ошибка при получении метаданных таблицы {spreadsheet_id}: {str(e)}")
+            return None
+    
+    def get_sheet_title(self, spreadsheet_id: str, credentials_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Название и ссылка таблицы (проверка доступа без списка листов)
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            Dict или None: spreadsheet_id, title и url или None в случае ошибки
+        """
+        result = self._get_metadata(spreadsheet_id, SHEET_TITLE_FIELDS, credentials_id, cached=True)
+        if result is None:
+            return None
+        
+        return {
+            "spreadsheet_id": result["spreadsheetId"],
+            "title": result["properties"]["title"],
+            "url": result["spreadsheetUrl"]
+        }
+    
+    def get_sheet_tabs(self, spreadsheet_id: str, credentials_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Листы таблицы: название, gid и тип
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            List[Dict[str, Any]] или None: Листы (title, gid, sheet_type) или None в случае ошибки
+        """
+        info = self.get_sheet_info(spreadsheet_id, credentials_id)
+        return info["tabs"] if info else None
+    
+    def get_sheet_info(self, spreadsheet_id: str, credentials_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Получение информации о таблице Google Sheets (список листов всегда запрашивается заново)
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            Dict или None: Метаданные таблицы или None в случае ошибки
+        """
+        result = self._get_metadata(spreadsheet_id, SHEET_TABS_FIELDS, credentials_id)
+        if result is None:
             return None
+        
+        sheets = result.get("sheets", [])
+        return {
+            "spreadsheet_id": result["spreadsheetId"],
+            "title": result["properties"]["title"],
+            "sheets": [sheet["properties"]["title"] for sheet in sheets],
+            "tabs": [
+                {
+                    "title": sheet["properties"]["title"],
+                    "gid": sheet["properties"]["sheetId"],
+                    "sheet_type": sheet["properties"].get("sheetType", "GRID")
+                }
+                for sheet in sheets
+            ],
+            "url": result["spreadsheetUrl"],
+            "owner": self._get_owner_email(spreadsheet_id)
+        }
     
     def _get_owner_email(self, spreadsheet_id: str) -> Optional[str]:
         """
@@ -83,64 +288,259 @@ class GoogleService:
         # Упрощенно возвращаем None, т.к. это требует доп. разрешений
         return None
     
-    def get_sheet_data(self, spreadsheet_id: str, range_name: str = 'A1:Z1000') -> Optional[List[List[Any]]]:
+    def get_sheet_data(
+        self,
+        spreadsheet_id: str,
+        range_name: str = 'A1:Z1000',
+        credentials_id: Optional[str] = None
+    ) -> Optional[List[List[Any]]]:
         """
         Получение данных из таблицы Google Sheets
         
         Args:
             spreadsheet_id: ID таблицы Google Sheets
             range_name: Диапазон ячеек для получения данных
+            credentials_id: ID сервисного аккаунта таблицы
             
         Returns:
             List[List[Any]] или None: Данные из таблицы или None в случае ошибки
         """
-        if not self.sheets_service:
-            logger.error("Сервис Google Sheets не инициализирован")
+        account = self._account(credentials_id)
+        if not account:
             return None
         
         try:
-            result = self.sheets_service.spreadsheets().values().get(
+            result = self._execute(account, account.sheets_service.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id,
                 range=range_name
-            ).execute()
+            ))
             
             return result.get('values', [])
         except Exception as e:
             logger.error(f"Ошибка при получении данных из таблицы {spreadsheet_id}: {str(e)}")
             return None
     
-    def get_sheet_values_by_sheets(self, spreadsheet_id: str) -> Optional[Dict[str, List[List[Any]]]]:
+    def _export(self, spreadsheet_id: str, params: str, credentials_id: Optional[str] = None) -> Optional[bytes]:
         """
-        Получение данных из всех листов таблицы
+        Экспорт таблицы через docs.google.com/export
         
         Args:
             spreadsheet_id: ID таблицы Google Sheets
+            params: Параметры экспорта (например, "format=xlsx")
+            credentials_id: ID сервисного аккаунта таблицы
             
         Returns:
-            Dict[str, List[List[Any]]] или None: Данные из всех листов или None в случае ошибки
+            bytes или None: Содержимое файла или None в случае ошибки
         """
-        if not self.sheets_service:
-            logger.error("Сервис Google Sheets не инициализирован")
+        account = self._account(credentials_id)
+        if not account:
             return None
         
         try:
-            # Получаем список всех листов в таблице
-            metadata = self.get_sheet_info(spreadsheet_id)
-            if not metadata or "sheets" not in metadata:
+            account.acquire()
+            response = requests.get(
+                f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?{params}",
+                headers={"Authorization": f"Bearer {account.token()}"}
+            )
+        except Exception as e:
+            account.record_error(str(e))
+            logger.error(f"Ошибка при экспорте таблицы {spreadsheet_id} ({params}): {str(e)}")
+            return None
+        
+        if response.status_code != 200:
+            account.record_error(f"Код ответа экспорта: {response.status_code}", response.status_code, response.content)
+            logger.error(f"Не удалось экспортировать таблицу {spreadsheet_id} ({params}). Код ответа: {response.status_code}")
+            return None
+        
+        return response.content
+    
+    def export_xlsx(self, spreadsheet_id: str, credentials_id: Optional[str] = None) -> Optional[bytes]:
+        """
+        Экспорт таблицы в формате XLSX
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            bytes или None: Содержимое файла XLSX или None в случае ошибки
+        """
+        return self._export(spreadsheet_id, "format=xlsx", credentials_id)
+    
+    def export_tab_csv(self, spreadsheet_id: str, gid: int, credentials_id: Optional[str] = None) -> Optional[bytes]:
+        """
+        Экспорт одного листа таблицы в формате CSV
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            gid: ID листа (sheetId)
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            bytes или None: Содержимое CSV или None в случае ошибки
+        """
+        return self._export(spreadsheet_id, f"format=csv&gid={gid}", credentials_id)
+    
+    def iter_tab_exports(
+        self,
+        spreadsheet_id: str,
+        tabs: List[Dict[str, Any]],
+        credentials_id: Optional[str] = None
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        Параллельный CSV-экспорт листов таблицы.
+        
+        Google экспортирует книгу целиком в одном потоке, а листы по отдельности -
+        одновременно, поэтому время экспорта близко ко времени самого большого листа.
+        Результаты выдаются в порядке листов по мере готовности; после ошибки
+        оставшиеся экспорты отменяются.
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            tabs: Листы таблицы (title, gid) из get_sheet_tabs
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Yields:
+            Пары (лист, содержимое CSV или None в случае ошибки)
+        """
+        workers = max(1, min(settings.GOOGLE_EXPORT_PARALLEL_TABS, len(tabs)))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tab-export")
+        try:
+            futures = [
+                executor.submit(self.export_tab_csv, spreadsheet_id, tab["gid"], credentials_id)
+                for tab in tabs
+            ]
+            for tab, future in zip(tabs, futures):
+                content = future.result()
+                yield tab, content
+                if content is None:
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_sheet_grid(self, spreadsheet_id: str, credentials_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Получение листов таблицы с их реальными размерами
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            
+        Returns:
+            List[Dict[str, Any]] или None: Листы (title, row_count, column_count) или None в случае ошибки
+        """
+        account = self._account(credentials_id)
+        if not account:
+            return None
+        
+        try:
+            result = self._execute(account, account.sheets_service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields=SHEET_GRID_FIELDS
+            ))
+            
+            grid = []
+            for sheet in result.get("sheets", []):
+                properties = sheet["properties"]
+                # Листы-диаграммы не содержат ячеек
+                if properties.get("sheetType", "GRID") != "GRID":
+                    continue
+                grid_properties = properties.get("gridProperties", {})
+                grid.append({
+                    "title": properties["title"],
+                    "row_count": grid_properties.get("rowCount", 0),
+                    "column_count": grid_properties.get("columnCount", 0)
+                })
+            return grid
+        except Exception as e:
+            logger.error(f"Ошибка при получении размеров листов таблицы {spreadsheet_id}: {str(e)}")
+            return None
+    
+    def _batch_get(self, account: ServiceAccount, spreadsheet_id: str, batch: List[Dict[str, Any]]) -> List[List[List[Any]]]:
+        """
+        Чтение группы диапазонов одним запросом values.batchGet
+        
+        Args:
+            account: Сервисный аккаунт
+            spreadsheet_id: ID таблицы Google Sheets
+            batch: Диапазоны запроса
+            
+        Returns:
+            List[List[List[Any]]]: Значения каждого диапазона в порядке запроса
+        """
+        result = self._execute(account, account.sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[value_range["range"] for value_range in batch]
+        ))
+        
+        return [value_range.get("values", []) for value_range in result.get("valueRanges", [])]
+    
+    def get_sheet_values_by_sheets(
+        self,
+        spreadsheet_id: str,
+        credentials_id: Optional[str] = None,
+        start_rows: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, List[List[Any]]]]:
+        """
+        Получение данных из всех листов таблицы.
+        
+        Листы читаются целиком по их реальным размерам минимальным числом
+        запросов values.batchGet; большие листы делятся на окна строк,
+        которые читаются параллельно.
+        
+        Args:
+            spreadsheet_id: ID таблицы Google Sheets
+            credentials_id: ID сервисного аккаунта таблицы
+            start_rows: Читать листы начиная с этих строк {название листа: номер строки с 1};
+                листы, которых нет в словаре, читаются целиком
+            
+        Returns:
+            Dict[str, List[List[Any]]] или None: Данные из всех листов (начиная с первой читаемой строки)
+            или None в случае ошибки
+        """
+        account = self._account(credentials_id)
+        if not account:
+            return None
+        
+        try:
+            grid = self.get_sheet_grid(spreadsheet_id, account.id)
+            if grid is None:
                 logger.error(f"Не удалось получить список листов таблицы {spreadsheet_id}")
                 return None
             
-            result = {}
-            for sheet_name in metadata["sheets"]:
-                # Получаем данные для каждого листа
-                data = self.get_sheet_data(spreadsheet_id, f"'{sheet_name}'!A1:Z1000")
-                if data is not None:
-                    result[sheet_name] = data
+            if start_rows:
+                grid = [dict(sheet, start_row=start_rows.get(sheet["title"], 1)) for sheet in grid]
             
+            max_cells = settings.GOOGLE_VALUES_MAX_CELLS_PER_REQUEST
+            ranges = sheet_ranges(grid, max_cells)
+            batches = pack_ranges(ranges, max_cells)
+            
+            if len(batches) > 1:
+                workers = min(len(batches), settings.GOOGLE_VALUES_PARALLEL_REQUESTS)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets-values") as executor:
+                    batch_values = list(executor.map(lambda batch: self._batch_get(account, spreadsheet_id, batch), batches))
+            else:
+                batch_values = [self._batch_get(account, spreadsheet_id, batch) for batch in batches]
+            
+            result: Dict[str, List[List[Any]]] = {sheet["title"]: [] for sheet in grid}
+            for batch, values_list in zip(batches, batch_values):
+                for value_range, values in zip(batch, values_list):
+                    rows = result[value_range["title"]]
+                    # API не возвращает пустые строки в конце диапазона:
+                    # дополняем предыдущие окна, чтобы строки не сместились
+                    offset = value_range["start_row"] - (start_rows or {}).get(value_range["title"], 1)
+                    if values and len(rows) < offset:
+                        rows.extend([] for _ in range(offset - len(rows)))
+                    rows.extend(values)
+            
+            logger.info(
+                f"Данные таблицы {spreadsheet_id} получены: листов {len(grid)}, "
+                f"диапазонов {len(ranges)}, запросов {len(batches) + 1}"
+            )
             return result
         except Exception as e:
             logger.error(f"Ошибка при получении данных из листов таблицы {spreadsheet_id}: {str(e)}")
             return None
 
 # Создаем глобальный экземпляр сервиса
-google_service = GoogleService() 
\ No newline at end of file
+google_service = GoogleService(credentials_pool)
@@ -0,0 +1,267 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Any, BinaryIO, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.backup import Backup
+from app.models.backup_deletion import BackupDeletion
+from app.models.backup_location import BackupLocation
+from app.services.google_service import google_service
+from app.services.parquet_service import LOCATION_KIND_BACKUP
+from app.services.snapshot_service import read_snapshot, write_snapshot, is_snapshot_format
+
+logger = logging.getLogger(__name__)
+
+
+def tail_hash(rows: List[List[Any]]) -> str:
+    """
+    Хеш строк в конце листа, по которому проверяется, что лист только дополнялся
+    """
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def tab_states(values_by_sheet: Dict[str, List[List[Any]]], tail_rows: int, row_offsets: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Состояние листов для следующего инкрементального снимка
+
+    Args:
+        values_by_sheet: Строки листов, прочитанные начиная с row_offset + 1
+        tail_rows: Сколько строк в конце листа сверяется
+        row_offsets: Номер последней строки перед прочитанными {название листа: строк}
+
+    Returns:
+        Поля описаний листов манифеста: row_offset, total_rows и tail_hash
+    """
+    states = {}
+    for title, rows in values_by_sheet.items():
+        row_offset = (row_offsets or {}).get(title, 0)
+        total_rows = row_offset + len(rows)
+        states[title] = {
+            "row_offset": row_offset,
+            "total_rows": total_rows,
+            "tail_hash": tail_hash(rows[-min(tail_rows, total_rows):] if total_rows else [])
+        }
+    return states
+
+
+def find_base(db: Session, sheet_id: str, backup_format: str) -> Optional[Dict[str, Any]]:
+    """
+    Бэкап, к которому можно добавить сегмент инкрементального снимка
+
+    Основой служит последний успешный бэкап таблицы, если это снимок того же
+    формата с состоянием листов и цепочка еще не достигла INCREMENTAL_MAX_SEGMENTS.
+
+    Args:
+        db: Сессия базы данных
+        sheet_id: ID таблицы
+        backup_format: Формат снимка ("ndjson" или "csv")
+
+    Returns:
+        Словарь с backup_id и metadata основы или None (нужен полный снимок)
+    """
+    if not is_snapshot_format(backup_format):
+        return None
+
+    backup = db.execute(
+        select(Backup.id, Backup.backup_metadata)
+        .where(Backup.sheet_id == sheet_id)
+        .where(Backup.status == "completed")
+        .where(Backup.id.not_in(select(BackupDeletion.backup_id)))
+        .order_by(Backup.created_at.desc(), Backup.id.desc())
+        .limit(1)
+    ).first()
+    if not backup or not backup.backup_metadata:
+        return None
+
+    metadata = backup.backup_metadata
+    manifest = metadata.get("manifest") or {}
+    if metadata.get("format") != backup_format or not manifest.get("tabs"):
+        return None
+    if any("tail_hash" not in tab for tab in manifest["tabs"]):
+        return None
+
+    segment = (metadata.get("incremental") or {}).get("segment", 0)
+    if segment >= settings.INCREMENTAL_MAX_SEGMENTS:
+        return None
+
+    return {"backup_id": backup.id, "metadata": metadata}
+
+
+def build_segment(
+    spreadsheet_id: str,
+    base: Dict[str, Any],
+    credentials_id: Optional[str] = None
+) -> Optional[Tuple[Dict[str, List[List[Any]]], Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+    """
+    Читает только новые строки листов после основы цепочки.
+
+    Каждый лист читается с последних tail_rows строк основы: если они не
+    изменились, все строки после них - добавленные. Если строки в конце
+    изменились, листы добавлены или удалены, нужен полный снимок.
+
+    Args:
+        spreadsheet_id: ID таблицы Google Sheets
+        base: Основа из find_base
+        credentials_id: ID сервисного аккаунта таблицы
+
+    Returns:
+        Кортеж (новые строки листов, поля манифеста, поля описаний листов) или None
+    """
+    metadata = base["metadata"]
+    manifest = metadata["manifest"]
+    tail_rows = manifest.get("tail_rows", settings.INCREMENTAL_TAIL_ROWS)
+    tabs = {tab["title"]: tab for tab in manifest["tabs"]}
+
+    # Первая читаемая строка - начало сверяемых строк основы
+    checked = {title: min(tail_rows, tab["total_rows"]) for title, tab in tabs.items()}
+    start_rows = {title: tab["total_rows"] - checked[title] + 1 for title, tab in tabs.items()}
+
+    values = google_service.get_sheet_values_by_sheets(spreadsheet_id, credentials_id, start_rows=start_rows)
+    if values is None:
+        return None
+    if set(values) != set(tabs):
+        logger.info(f"Листы таблицы {spreadsheet_id} изменились, создается полный снимок")
+        return None
+
+    new_values = {}
+    for title, rows in values.items():
+        if tail_hash(rows[:checked[title]]) != tabs[title]["tail_hash"]:
+            logger.info(f"Строки в конце листа {title} таблицы {spreadsheet_id} изменились, создается полный снимок")
+            return None
+        new_values[title] = rows[checked[title]:]
+
+    # Новое состояние считается по прочитанным строкам (они включают конец листа),
+    # а строки сегмента продолжают лист после строк основы
+    tab_extra = tab_states(values, tail_rows, {title: start_rows[title] - 1 for title in values})
+    for title, state in tab_extra.items():
+        state["row_offset"] = tabs[title]["total_rows"]
+
+    parent = metadata.get("incremental") or {}
+    extra = {
+        "tail_rows": tail_rows,
+        "incremental": {
+            "parent_backup_id": base["backup_id"],
+            "base_backup_id": parent.get("base_backup_id", base["backup_id"]),
+            "segment": parent.get("segment", 0) + 1
+        }
+    }
+    return new_values, extra, tab_extra
+
+
+def backup_chain(db: Session, backup_id: str) -> List[Backup]:
+    """
+    Цепочка бэкапов от полного снимка до указанного сегмента
+
+    Args:
+        db: Сессия базы данных
+        backup_id: ID бэкапа
+
+    Returns:
+        List[Backup]: Бэкапы цепочки, начиная с полного снимка (пустой список, если звено потеряно)
+    """
+    chain = []
+    while backup_id:
+        backup = db.get(Backup, backup_id)
+        if backup is None:
+            logger.error(f"Бэкап {backup_id} цепочки инкрементальных снимков не найден")
+            return []
+        chain.append(backup)
+        backup_id = backup.parent_backup_id
+    return list(reversed(chain))
+
+
+def open_backup_file(db: Session, backup: Backup) -> Optional[BinaryIO]:
+    """
+    Открывает файл бэкапа из любого хранилища (сначала локальные копии)
+
+    Args:
+        db: Сессия базы данных
+        backup: Запись о бэкапе
+
+    Returns:
+        Файл бэкапа или None, если ни одна копия недоступна
+    """
+    from app.services.storage import resolve_storage
+
+    locations = db.execute(
+        select(BackupLocation)
+        .where(BackupLocation.backup_id == backup.id)
+        .where(BackupLocation.kind == LOCATION_KIND_BACKUP)
+        .where(BackupLocation.status == "stored")
+    ).scalars().all()
+
+    for location in sorted(locations, key=lambda location: location.storage_type != "local"):
+        if location.storage_type == "local":
+            if os.path.exists(location.file_path):
+                return open(location.file_path, "rb")
+            continue
+
+        storage = resolve_storage(location.storage_type, location.storage_params, db)
+        file_data = storage.get(location.file_path) if storage else None
+        if file_data:
+            return file_data
+    return None
+
+
+def merge_chain(db: Session, backup_id: str) -> Optional[Tuple[str, Dict[str, List[List[Any]]]]]:
+    """
+    Собирает полный снимок из цепочки сегментов
+
+    Args:
+        db: Сессия базы данных
+        backup_id: ID последнего сегмента
+
+    Returns:
+        Кортеж (формат снимка, строки листов) или None, если звено цепочки недоступно
+    """
+    chain = backup_chain(db, backup_id)
+    if not chain:
+        return None
+
+    values_by_sheet: Dict[str, List[List[Any]]] = {}
+    backup_format = None
+    for backup in chain:
+        file_data = open_backup_file(db, backup)
+        if file_data is None:
+            logger.error(f"Файл бэкапа {backup.id} цепочки инкрементальных снимков недоступен")
+            return None
+
+        with file_data:
+            segment = read_snapshot(file_data)
+        manifest = backup.backup_metadata["manifest"]
+        backup_format = manifest["format"]
+        merged = {}
+        for tab in manifest["tabs"]:
+            rows = values_by_sheet.get(tab["title"], [])
+            # Строки сегмента продолжают лист с row_offset
+            del rows[tab.get("row_offset", 0):]
+            rows.extend(segment[tab["title"]])
+            merged[tab["title"]] = rows
+        values_by_sheet = merged
+
+    return backup_format, values_by_sheet
+
+
+def write_full_snapshot(db: Session, backup_id: str, out: BinaryIO) -> bool:
+    """
+    Записывает полный снимок, собранный из цепочки сегментов, в ZIP-архив
+
+    Args:
+        db: Сессия базы данных
+        backup_id: ID последнего сегмента
+        out: Файл для записи архива
+
+    Returns:
+        bool: True если снимок собран
+    """
+    merged = merge_chain(db, backup_id)
+    if merged is None:
+        return False
+    backup_format, values_by_sheet = merged
+    write_snapshot(values_by_sheet, backup_format, out)
+    return True
@@ -4,11 +4,19 @@ from sqlalchemy.orm import Session
 import json
 import requests
 
+from app.core.cache import TTLCache
+from app.core.config import settings as app_settings
 from app.models.integration import Integration
 from app.services.storage.bitrix_disk_storage import BitrixDiskStorage
 
 logger = logging.getLogger(__name__)
 
+# Кеш настроек интеграций: хранилища бэкапов запрашивают их для каждой таблицы
+integration_cache = TTLCache(
+    ttl_seconds=app_settings.INTEGRATION_CACHE_TTL_SECONDS,
+    max_entries=app_settings.INTEGRATION_CACHE_MAX_ENTRIES
+)
+
 class IntegrationService:
     """
     Сервис для работы с интеграциями
@@ -25,12 +33,42 @@ class IntegrationService:
         Returns:
             Словарь с настройками или None, если интеграция не настроена
         """
-        integration = db.query(Integration).filter(Integration.type == "bitrix").first()
+        def load() -> Optional[Dict[str, Any]]:
+            integration = db.query(Integration).filter(Integration.type == "bitrix").first()
+            return integration.settings if integration else None
         
-        if not integration:
-            return None
+        settings = integration_cache.get_or_load("bitrix", load)
+        return dict(settings) if settings is not None else None
+    
+    @staticmethod
+    def get_integration_settings(db: Session, integration_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Получить тип и настройки интеграции по ID (с кешированием)
+        
+        Args:
+            db: Сессия базы данных
+            integration_id: ID интеграции
             
-        return integration.settings
+        Returns:
+            Словарь с ключами type и settings или None, если интеграция не найдена
+        """
+        def load() -> Optional[Dict[str, Any]]:
+            integration = IntegrationService.get_integration_by_id(db, integration_id)
+            if not integration:
+                return None
+            return {"type": integration.type, "settings": integration.settings}
+        
+        integration = integration_cache.get_or_load(("integration", str(integration_id)), load)
+        if integration is None:
+            return None
+        return {"type": integration["type"], "settings": dict(integration["settings"] or {})}
+    
+    @staticmethod
+    def invalidate_cache() -> None:
+        """
+        Сбросить кеш настроек интеграций (после их изменения)
+        """
+        integration_cache.invalidate()
     
     @staticmethod
     def get_integration_by_id(db: Session, integration_id: str) -> Optional[Integration]:
@@ -90,6 +128,9 @@ class IntegrationService:
         db.commit()
         db.refresh(integration)
         
+        # Хранилища должны сразу увидеть новые настройки
+        IntegrationService.invalidate_cache()
+        
         return integration
     
     @staticmethod
@@ -0,0 +1,274 @@
+import os
+import random
+import socket
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import update, or_, and_
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.schedule import Schedule
+
+logger = logging.getLogger(__name__)
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """
+    Фоновое продление аренды расписания, пока узел выполняет его
+    """
+    def __init__(self, lease_service: "LeaseService", schedule_id: str):
+        super().__init__(name=f"lease-{schedule_id}", daemon=True)
+        self.lease_service = lease_service
+        self.schedule_id = schedule_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = max(1, self.lease_service.ttl_seconds // 3)
+        while not self.stopped.wait(interval):
+            if not self.lease_service.renew(self.schedule_id):
+                logger.warning(f"Не удалось продлить аренду расписания {self.schedule_id}")
+
+
+class LeaseService:
+    """
+    Аренда расписаний через БД для распределенного выполнения.
+
+    Каждый узел запускает триггеры всех расписаний, но выполняет запуск только
+    узел, атомарно захвативший аренду строки Schedule. Аренда продлевается,
+    пока идет выполнение, и истекает, если узел перестал работать.
+    """
+    # Как часто загруженный узел проверяет, освободилось ли место для запуска
+    BUSY_POLL_SECONDS = 1.0
+
+    def __init__(self, node_id: Optional[str] = None, ttl_seconds: int = 120, dedup_seconds: int = 60):
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl_seconds = ttl_seconds
+        self.dedup_seconds = dedup_seconds
+        self._active_runs = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active_runs(self) -> int:
+        return self._active_runs
+
+    def try_claim(self, schedule_id: str, dedup_seconds: Optional[float] = None) -> bool:
+        """
+        Пытается захватить аренду для очередного запуска расписания
+
+        Захват не удается, если аренда принадлежит другому живому узлу или этот
+        запуск уже был захвачен (last_run_at в пределах окна дедупликации).
+        Если узел загружен (SCHEDULER_NODE_MAX_RUNS), запуск ждет свободного места,
+        пока его не захватит другой узел; после окна дедупликации ожидание
+        прекращается - запуск перекрывается следующим срабатыванием.
+
+        Args:
+            schedule_id: ID расписания
+            dedup_seconds: Окно дедупликации (по умолчанию SCHEDULER_LEASE_DEDUP_SECONDS);
+                должно быть меньше периода расписания
+
+        Returns:
+            bool: True если аренда захвачена этим узлом
+        """
+        dedup_seconds = self.dedup_seconds if dedup_seconds is None else dedup_seconds
+        fired_at = datetime.utcnow()
+
+        # Небольшая случайная задержка и проверка загрузки узла распределяют
+        # запуски между узлами, а не отдают их всегда самому быстрому
+        if settings.SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS > 0:
+            time.sleep(random.uniform(0, settings.SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS))
+
+        waiting = False
+        while not self._reserve_run():
+            if not waiting:
+                waiting = True
+                logger.info(f"Узел {self.node_id} загружен, запуск расписания {schedule_id} ждет свободного места")
+            if self._claimed_since(schedule_id, fired_at):
+                logger.info(f"Запуск расписания {schedule_id} захвачен другим узлом")
+                return False
+            if (datetime.utcnow() - fired_at).total_seconds() >= dedup_seconds:
+                logger.warning(f"Узел {self.node_id} загружен, запуск расписания {schedule_id} пропущен")
+                return False
+            time.sleep(min(self.BUSY_POLL_SECONDS, dedup_seconds))
+
+        now = datetime.utcnow()
+        statement = (
+            update(Schedule)
+            .where(Schedule.id == schedule_id)
+            .where(or_(Schedule.lease_expires_at.is_(None), Schedule.lease_expires_at < now))
+            .where(or_(
+                Schedule.last_run_at.is_(None),
+                Schedule.last_run_at < fired_at - timedelta(seconds=dedup_seconds)
+            ))
+            .values(
+                lease_owner=self.node_id,
+                lease_expires_at=now + timedelta(seconds=self.ttl_seconds),
+                last_run_at=now
+            )
+        )
+        claimed = self._execute_claim(statement, schedule_id, reserved=True)
+        if not claimed:
+            self._release_run()
+        return claimed
+
+    def _reserve_run(self) -> bool:
+        """
+        Занимает место для запуска, если узел не загружен
+        """
+        with self._lock:
+            if self._active_runs >= settings.SCHEDULER_NODE_MAX_RUNS:
+                return False
+            self._active_runs += 1
+            return True
+
+    def _release_run(self) -> None:
+        with self._lock:
+            self._active_runs = max(0, self._active_runs - 1)
+
+    def _claimed_since(self, schedule_id: str, fired_at: datetime) -> bool:
+        """
+        Проверяет, захватил ли другой узел запуск расписания после срабатывания
+        """
+        db = SessionLocal()
+        try:
+            last_run_at = db.query(Schedule.last_run_at).filter(Schedule.id == schedule_id).scalar()
+            return last_run_at is not None and last_run_at >= fired_at
+        except Exception as e:
+            logger.error(f"Ошибка при проверке аренды расписания {schedule_id}: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+    def claim_orphaned(self) -> List[str]:
+        """
+        Захватывает расписания, чей узел перестал работать во время выполнения
+        (аренда истекла, но не была освобождена)
+
+        Returns:
+            Список ID расписаний, захваченных для повторного выполнения
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            candidates = [
+                row.id for row in db.query(Schedule.id)
+                .filter(Schedule.is_active == True)
+                .filter(Schedule.lease_owner.isnot(None))
+                .filter(Schedule.lease_expires_at < now)
+                .all()
+            ]
+        finally:
+            db.close()
+
+        claimed = []
+        for schedule_id in candidates:
+            statement = (
+                update(Schedule)
+                .where(Schedule.id == schedule_id)
+                .where(and_(Schedule.lease_owner.isnot(None), Schedule.lease_expires_at < now))
+                .values(
+                    lease_owner=self.node_id,
+                    lease_expires_at=now + timedelta(seconds=self.ttl_seconds)
+                )
+            )
+            if self._execute_claim(statement, schedule_id):
+                logger.warning(f"Расписание {schedule_id} осталось без узла и захвачено узлом {self.node_id}")
+                claimed.append(schedule_id)
+
+        return claimed
+
+    def _execute_claim(self, statement, schedule_id: str, reserved: bool = False) -> bool:
+        db = SessionLocal()
+        try:
+            result = db.execute(statement)
+            db.commit()
+            claimed = result.rowcount == 1
+            if claimed:
+                if not reserved:
+                    with self._lock:
+                        self._active_runs += 1
+                logger.info(f"Узел {self.node_id} захватил аренду расписания {schedule_id}")
+            return claimed
+        except Exception as e:
+            logger.error(f"Ошибка при захвате аренды расписания {schedule_id}: {str(e)}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def renew(self, schedule_id: str) -> bool:
+        """
+        Продлевает аренду расписания, принадлежащую этому узлу
+
+        Args:
+            schedule_id: ID расписания
+
+        Returns:
+            bool: True если аренда продлена
+        """
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(Schedule)
+                .where(Schedule.id == schedule_id)
+                .where(Schedule.lease_owner == self.node_id)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds))
+            )
+            db.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"Ошибка при продлении аренды расписания {schedule_id}: {str(e)}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def release(self, schedule_id: str) -> None:
+        """
+        Освобождает аренду расписания после завершения запуска
+
+        Args:
+            schedule_id: ID расписания
+        """
+        self._release_run()
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Schedule)
+                .where(Schedule.id == schedule_id)
+                .where(Schedule.lease_owner == self.node_id)
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+            db.commit()
+            logger.info(f"Узел {self.node_id} освободил аренду расписания {schedule_id}")
+        except Exception as e:
+            logger.error(f"Ошибка при освобождении аренды расписания {schedule_id}: {str(e)}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def heartbeat(self, schedule_id: str) -> _LeaseHeartbeat:
+        """
+        Запускает фоновое продление аренды на время выполнения расписания
+
+        Args:
+            schedule_id: ID расписания
+
+        Returns:
+            Поток продления; для остановки вызовите stopped.set()
+        """
+        heartbeat = _LeaseHeartbeat(self, schedule_id)
+        heartbeat.start()
+        return heartbeat
+
+
+# Создаем глобальный экземпляр сервиса
+lease_service = LeaseService(
+    node_id=settings.SCHEDULER_NODE_ID,
+    ttl_seconds=settings.SCHEDULER_LEASE_TTL_SECONDS,
+    dedup_seconds=settings.SCHEDULER_LEASE_DEDUP_SECONDS
+)
@@ -0,0 +1,222 @@
+import io
+import os
+import logging
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
+
+from app.models.backup_location import BackupLocation
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+# Вид файла копии: основной файл бэкапа или Parquet-файл листа рядом с ним
+LOCATION_KIND_BACKUP = "backup"
+LOCATION_KIND_PARQUET = "parquet"
+
+
+def _pyarrow():
+    """
+    Модули pyarrow (необязательная зависимость, загружается при первом использовании)
+
+    Returns:
+        Кортеж (pyarrow, pyarrow.parquet) или None, если pyarrow не установлен
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        logger.warning("Пакет pyarrow не установлен, Parquet-файлы не создаются")
+        return None
+    return pyarrow, pyarrow.parquet
+
+
+def unique_columns(header: List[Any]) -> List[str]:
+    """
+    Уникальные строковые названия столбцов (пустые заменяются на column_N)
+
+    Args:
+        header: Заголовки столбцов
+
+    Returns:
+        List[str]: Названия столбцов
+    """
+    columns = []
+    seen: Dict[str, int] = {}
+    for index, name in enumerate(header, start=1):
+        name = str(name).strip() if name is not None and str(name).strip() else f"column_{index}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        seen.setdefault(name, 0)
+        columns.append(name)
+    return columns
+
+
+def values_to_frame(rows: List[List[Any]]) -> "pd.DataFrame":
+    """
+    DataFrame из значений листа (первая строка - заголовок)
+
+    Args:
+        rows: Строки листа из Sheets values API
+
+    Returns:
+        pd.DataFrame: Таблица листа
+    """
+    import pandas as pd
+
+    if not rows:
+        return pd.DataFrame()
+
+    width = max(len(row) for row in rows)
+    header = list(rows[0]) + [None] * (width - len(rows[0]))
+    data = [list(row) + [None] * (width - len(row)) for row in rows[1:]]
+    return pd.DataFrame(data, columns=unique_columns(header))
+
+
+def frame_to_table(df: "pd.DataFrame"):
+    """
+    Типизированная Arrow-таблица из DataFrame листа.
+
+    Числовые и датированные столбцы приводятся к своим типам, остальные
+    хранятся строками со словарным кодированием (повторяющиеся значения
+    листов занимают место один раз).
+
+    Args:
+        df: Таблица листа
+
+    Returns:
+        pyarrow.Table: Таблица для записи в Parquet
+    """
+    import pandas as pd
+
+    pa, _ = _pyarrow()
+
+    df = df.copy()
+    df.columns = unique_columns(list(df.columns))
+    for column in df.columns:
+        series = df[column]
+        if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            continue
+
+        non_empty = series.dropna()
+        non_empty = non_empty[non_empty.astype(str).str.strip() != ""]
+        numeric = pd.to_numeric(non_empty, errors="coerce")
+        # Значения с ведущими нулями (коды, номера) остаются строками
+        leading_zeros = non_empty.astype(str).str.match(r"^-?0\d").any()
+        if len(non_empty) and numeric.notna().all() and not leading_zeros:
+            df[column] = pd.to_numeric(series.where(series.astype(str).str.strip() != ""), errors="coerce")
+        else:
+            df[column] = series.map(lambda value: None if value is None or pd.isna(value) else str(value))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for index, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(index, field.name, table.column(index).dictionary_encode())
+    return table
+
+
+def save_parquet_tabs(
+    frames: Dict[str, "pd.DataFrame"],
+    filename: str,
+    storage_configs: List[Dict[str, Any]],
+    storage_resolver: Any
+) -> List[Dict[str, Any]]:
+    """
+    Сохраняет листы бэкапа в Parquet рядом с основным файлом в тех же хранилищах
+
+    Args:
+        frames: Таблицы листов {название листа: DataFrame}
+        filename: Имя основного файла бэкапа
+        storage_configs: Список конфигураций хранилищ
+        storage_resolver: Хранилища запуска
+
+    Returns:
+        List[Dict[str, Any]]: Результаты сохранения Parquet-файлов (kind="parquet", tab - название листа)
+    """
+    modules = _pyarrow()
+    if not modules or not frames:
+        return []
+    _, pq = modules
+
+    stem = filename.split(".", 1)[0]
+    results = []
+    for index, (title, df) in enumerate(frames.items(), start=1):
+        try:
+            buffer = io.BytesIO()
+            pq.write_table(frame_to_table(df), buffer, compression="zstd", use_dictionary=True)
+        except Exception as e:
+            logger.warning(f"Не удалось преобразовать лист {title} в Parquet: {str(e)}")
+            continue
+
+        parquet_name = f"{stem}_{index:04d}.parquet"
+        for config in storage_configs:
+            storage_type = config["storage_type"]
+            storage_params = config.get("storage_params", {})
+            storage = storage_resolver.resolve(storage_type, storage_params)
+            if not storage:
+                continue
+
+            buffer.seek(0)
+            file_path = storage.save(buffer, parquet_name, PARQUET_CONTENT_TYPE)
+            if not file_path:
+                logger.warning(f"Не удалось сохранить {parquet_name} в хранилище {storage_type}")
+                continue
+
+            results.append({
+                "storage_type": storage_type,
+                "file_path": file_path,
+                "size": buffer.getbuffer().nbytes,
+                "storage_params": storage_params,
+                "kind": LOCATION_KIND_PARQUET,
+                "tab": title
+            })
+
+    logger.info(f"Листы бэкапа {filename} сохранены в Parquet: {len(results)} файлов")
+    return results
+
+
+def load_parquet(path: str, columns: Optional[List[str]] = None) -> "pd.DataFrame":
+    """
+    Читает Parquet-файл листа через отображение файла в память
+
+    Args:
+        path: Путь к локальному Parquet-файлу
+        columns: Читать только эти столбцы
+
+    Returns:
+        pd.DataFrame: Таблица листа (строки со словарным кодированием - категориальные столбцы)
+    """
+    modules = _pyarrow()
+    if not modules:
+        raise RuntimeError("Для чтения Parquet-файлов установите пакет pyarrow")
+    _, pq = modules
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def load_backup_tabs(db: Any, backup_id: str, columns: Optional[List[str]] = None) -> Dict[str, "pd.DataFrame"]:
+    """
+    Листы бэкапа из локальных Parquet-файлов для анализа истории
+
+    Args:
+        db: Сессия базы данных
+        backup_id: ID бэкапа
+        columns: Читать только эти столбцы
+
+    Returns:
+        Dict[str, pd.DataFrame]: Таблицы листов {название листа: DataFrame}
+    """
+    locations = db.query(BackupLocation).filter(
+        BackupLocation.backup_id == backup_id,
+        BackupLocation.kind == LOCATION_KIND_PARQUET,
+        BackupLocation.storage_type == "local",
+        BackupLocation.status == "stored"
+    ).order_by(BackupLocation.file_path).all()
+
+    return {
+        location.tab: load_parquet(location.file_path, columns)
+        for location in locations
+        if os.path.exists(location.file_path)
+    }
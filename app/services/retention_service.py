@@ -0,0 +1,596 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import select, update, delete, func, case, and_, or_, true, false
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+from app.db.session import SessionLocal
+from app.models.backup import Backup
+from app.models.backup_deletion import BackupDeletion
+from app.models.backup_location import BackupLocation
+from app.models.schedule import Schedule
+from app.services.backup_stats_service import apply_backup_deletes
+from app.services.storage import StorageResolver
+
+logger = logging.getLogger(__name__)
+
+# Поля политики хранения
+POLICY_FIELDS = ("keep_last", "keep_daily", "keep_weekly", "keep_monthly", "max_total_size")
+KEEP_FIELDS = POLICY_FIELDS[:-1]
+
+# Уровни GFS: поле политики и период, из которого сохраняется последний бэкап
+RETENTION_TIERS = (("keep_daily", "day"), ("keep_weekly", "week"), ("keep_monthly", "month"))
+
+SQLITE_PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+def normalize_policy(policy: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """
+    Приводит политику хранения к словарю с положительными целыми значениями
+
+    Args:
+        policy: Политика из расписания
+
+    Returns:
+        Политика или None, если она ничего не ограничивает
+    """
+    if not policy:
+        return None
+    normalized = {field: int(policy[field]) for field in POLICY_FIELDS if policy.get(field)}
+    return normalized or None
+
+
+def merge_policies(policies: List[Dict[str, int]]) -> Dict[str, int]:
+    """
+    Объединяет политики расписаний, в которые входит таблица.
+    Бэкап удаляется, только если его не сохраняет ни одна из политик.
+
+    Args:
+        policies: Нормализованные политики
+
+    Returns:
+        Объединенная политика
+    """
+    merged: Dict[str, int] = {}
+    # Политика без уровней хранения сохраняет все бэкапы в пределах размера
+    if all(any(field in policy for field in KEEP_FIELDS) for policy in policies):
+        for field in KEEP_FIELDS:
+            value = max(policy.get(field, 0) for policy in policies)
+            if value:
+                merged[field] = value
+
+    sizes = [policy.get("max_total_size") for policy in policies]
+    if all(sizes):
+        merged["max_total_size"] = max(sizes)
+    return merged
+
+
+def backup_locations(backup: Backup) -> List[Dict[str, Any]]:
+    """
+    Места хранения файла бэкапа, из которых его еще нужно удалить
+
+    Args:
+        backup: Запись о бэкапе
+
+    Returns:
+        Список словарей с id, storage_type, file_path и storage_params
+    """
+    return [
+        {
+            "id": location.id,
+            "storage_type": location.storage_type,
+            "file_path": location.file_path,
+            "storage_params": location.storage_params
+        }
+        for location in backup.locations
+        if location.status == "stored"
+    ]
+
+
+def _period_expr(dialect_name: str, period: str):
+    """
+    Выражение периода (день, неделя, месяц) для даты создания бэкапа
+    """
+    if dialect_name == "sqlite":
+        if period == "week":
+            # Понедельник недели: как и date_trunc('week') в PostgreSQL, не делит неделю на границе года
+            return func.date(Backup.created_at, "weekday 0", "-6 days")
+        return func.strftime(SQLITE_PERIOD_FORMATS[period], Backup.created_at)
+    return func.date_trunc(period, Backup.created_at)
+
+
+def select_victims(session: Session, sheet_ids: List[str], policy: Dict[str, int]) -> List[Any]:
+    """
+    Выбирает бэкапы таблиц, не сохраняемые политикой, одним запросом с оконными функциями
+
+    Сохраняются последние keep_last бэкапов, последние успешные бэкапы
+    keep_daily дней, keep_weekly недель и keep_monthly месяцев. Если задан
+    max_total_size, из сохраняемых удаляются самые старые, пока их суммарный
+    размер не уложится в лимит (последний бэкап таблицы сохраняется всегда).
+
+    Args:
+        session: Сессия базы данных
+        sheet_ids: ID таблиц с этой политикой
+        policy: Нормализованная политика хранения
+
+    Returns:
+        Строки (id, sheet_id, size) удаляемых бэкапов
+    """
+    dialect_name = session.get_bind().dialect.name
+    order = (Backup.created_at.desc(), Backup.id.desc())
+
+    columns = [
+        Backup.id,
+        Backup.sheet_id,
+        Backup.size,
+        Backup.status,
+        Backup.created_at,
+        func.row_number().over(partition_by=Backup.sheet_id, order_by=order).label("recent_rank")
+    ]
+    for field, period in RETENTION_TIERS:
+        if not policy.get(field):
+            continue
+        bucket = _period_expr(dialect_name, period)
+        # Последний бэкап периода и номер периода от текущего
+        columns.append(func.row_number().over(
+            partition_by=(Backup.sheet_id, Backup.status, bucket), order_by=order
+        ).label(f"{period}_pick"))
+        columns.append(func.dense_rank().over(
+            partition_by=(Backup.sheet_id, Backup.status), order_by=bucket.desc()
+        ).label(f"{period}_rank"))
+
+    ranked = (
+        select(*columns)
+        .where(Backup.sheet_id.in_(sheet_ids))
+        .where(Backup.id.not_in(select(BackupDeletion.backup_id)))
+        .subquery()
+    )
+
+    keep_conditions = []
+    if policy.get("keep_last"):
+        keep_conditions.append(ranked.c.recent_rank <= policy["keep_last"])
+    for field, period in RETENTION_TIERS:
+        if policy.get(field):
+            keep_conditions.append(and_(
+                ranked.c.status == "completed",
+                ranked.c[f"{period}_pick"] == 1,
+                ranked.c[f"{period}_rank"] <= policy[field]
+            ))
+    has_tiers = any(field in policy for field in KEEP_FIELDS)
+    kept = or_(*keep_conditions) if keep_conditions else (false() if has_tiers else true())
+
+    flagged = select(
+        ranked.c.id,
+        ranked.c.sheet_id,
+        ranked.c.size,
+        ranked.c.created_at,
+        ranked.c.recent_rank,
+        case((kept, 1), else_=0).label("kept")
+    ).subquery()
+
+    victim_condition = flagged.c.kept == 0
+    if policy.get("max_total_size"):
+        kept_size = func.sum(case((flagged.c.kept == 1, flagged.c.size), else_=0)).over(
+            partition_by=flagged.c.sheet_id,
+            order_by=(flagged.c.created_at.desc(), flagged.c.id.desc())
+        ).label("kept_size")
+        sized = select(flagged, kept_size).subquery()
+        victim_condition = or_(
+            sized.c.kept == 0,
+            and_(sized.c.kept_size > policy["max_total_size"], sized.c.recent_rank > 1)
+        )
+        return session.execute(
+            select(sized.c.id, sized.c.sheet_id, sized.c.size).where(victim_condition)
+        ).all()
+
+    return session.execute(
+        select(flagged.c.id, flagged.c.sheet_id, flagged.c.size).where(victim_condition)
+    ).all()
+
+
+def protect_ancestors(session: Session, sheet_ids: List[str], victims: List[Any]) -> List[Any]:
+    """
+    Исключает из удаляемых бэкапы, от которых зависят сохраняемые сегменты
+    инкрементальных снимков (вся цепочка до полного снимка)
+
+    Args:
+        session: Сессия базы данных
+        sheet_ids: ID таблиц
+        victims: Строки удаляемых бэкапов
+
+    Returns:
+        Строки бэкапов, которые можно удалить
+    """
+    parents = dict(session.execute(
+        select(Backup.id, Backup.parent_backup_id)
+        .where(Backup.sheet_id.in_(sheet_ids))
+        .where(Backup.parent_backup_id.isnot(None))
+        .where(Backup.id.not_in(select(BackupDeletion.backup_id)))
+    ).all())
+    if not parents:
+        return victims
+
+    victim_ids = {victim.id for victim in victims}
+    protected = set()
+    for backup_id in parents:
+        if backup_id in victim_ids:
+            continue
+        parent_id = parents[backup_id]
+        while parent_id and parent_id not in protected:
+            protected.add(parent_id)
+            parent_id = parents.get(parent_id)
+
+    return [victim for victim in victims if victim.id not in protected]
+
+
+class RetentionService:
+    """
+    Удаление старых бэкапов по политикам хранения расписаний.
+
+    Бэкапы к удалению выбираются в SQL, удаление из хранилищ выполняется
+    параллельно с ограничением частоты запросов. Каждое удаление сначала
+    записывается в журнал backup_deletions, поэтому прерванный запуск
+    продолжается со следующего и не удаляет файлы повторно.
+    """
+    def __init__(
+        self,
+        workers: int = 4,
+        rate_per_second: float = 5.0,
+        max_attempts: int = 5,
+        claim_timeout_seconds: int = 3600
+    ):
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.max_attempts = max_attempts
+        self.claim_timeout = timedelta(seconds=claim_timeout_seconds)
+        self._run_lock = threading.Lock()
+
+    def sheet_policies(self, db: Session) -> Dict[str, Dict[str, int]]:
+        """
+        Политики хранения таблиц по расписаниям, в которые они входят
+
+        Args:
+            db: Сессия базы данных
+
+        Returns:
+            Словарь {ID таблицы: объединенная политика}
+        """
+        collected: Dict[str, List[Dict[str, int]]] = {}
+        for schedule in db.query(Schedule).filter(Schedule.retention_policy.isnot(None)).all():
+            policy = normalize_policy(schedule.retention_policy)
+            if not policy:
+                continue
+            for sheet_id in schedule.sheets_ids or []:
+                collected.setdefault(sheet_id, []).append(policy)
+
+        return {sheet_id: merge_policies(policies) for sheet_id, policies in collected.items()}
+
+    def plan(self, db: Session) -> List[Any]:
+        """
+        Бэкапы, подлежащие удалению по политикам хранения
+
+        Args:
+            db: Сессия базы данных
+
+        Returns:
+            Строки (id, sheet_id, size) удаляемых бэкапов
+        """
+        # Таблицы с одинаковой политикой обрабатываются одним запросом
+        groups: Dict[str, List[str]] = {}
+        for sheet_id, policy in self.sheet_policies(db).items():
+            if policy:
+                groups.setdefault(json.dumps(policy, sort_keys=True), []).append(sheet_id)
+
+        victims = []
+        for policy_key, sheet_ids in groups.items():
+            selected = select_victims(db, sheet_ids, json.loads(policy_key))
+            victims.extend(protect_ancestors(db, sheet_ids, selected))
+        return victims
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Применяет политики хранения ко всем таблицам
+
+        Args:
+            dry_run: Только посчитать бэкапы к удалению, ничего не удаляя
+
+        Returns:
+            Словарь с количеством выбранных, удаленных и неудаленных бэкапов
+        """
+        if not self._run_lock.acquire(blocking=False):
+            logger.info("Очистка бэкапов по политикам хранения уже выполняется")
+            return {"dry_run": dry_run, "victims": 0, "deleted": 0, "failed": 0, "freed_bytes": 0}
+
+        db = SessionLocal()
+        try:
+            victims = self.plan(db)
+            result = {
+                "dry_run": dry_run,
+                "victims": len(victims),
+                "deleted": 0,
+                "failed": 0,
+                "freed_bytes": sum(victim.size or 0 for victim in victims) if dry_run else 0
+            }
+            if dry_run:
+                return result
+
+            backups = (
+                db.query(Backup)
+                .options(selectinload(Backup.locations))
+                .filter(Backup.id.in_([victim.id for victim in victims]))
+                .all()
+            )
+            self.record_deletions(db, backups, reason="retention")
+            result.update(self.process_pending(db))
+            logger.info(
+                f"Очистка по политикам хранения: выбрано {result['victims']}, удалено {result['deleted']}, "
+                f"ошибок {result['failed']}, освобождено {result['freed_bytes']} байт"
+            )
+            return result
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка при очистке бэкапов по политикам хранения: {str(e)}")
+            return {"dry_run": dry_run, "victims": 0, "deleted": 0, "failed": 0, "freed_bytes": 0}
+        finally:
+            db.close()
+            self._run_lock.release()
+
+    def delete_backups(self, db: Session, backups: List[Backup], reason: str = "manual") -> Dict[str, Any]:
+        """
+        Удаляет бэкапы из всех хранилищ и из БД
+
+        Args:
+            db: Сессия базы данных
+            backups: Удаляемые бэкапы
+            reason: Причина удаления для журнала
+
+        Returns:
+            Словарь с количеством удаленных и неудаленных бэкапов и ошибками
+        """
+        self.record_deletions(db, backups, reason=reason)
+        return self.process_pending(db, backup_ids=[backup.id for backup in backups])
+
+    def record_deletions(self, db: Session, backups: List[Backup], reason: str) -> int:
+        """
+        Записывает бэкапы в журнал удаления (уже записанные пропускаются)
+
+        Args:
+            db: Сессия базы данных
+            backups: Удаляемые бэкапы
+            reason: Причина удаления
+
+        Returns:
+            int: Количество новых записей журнала
+        """
+        if not backups:
+            return 0
+
+        recorded = set(db.execute(
+            select(BackupDeletion.backup_id).where(BackupDeletion.backup_id.in_([backup.id for backup in backups]))
+        ).scalars())
+        new_deletions = [
+            BackupDeletion(
+                backup_id=backup.id,
+                sheet_id=backup.sheet_id,
+                size=backup.size,
+                locations=backup_locations(backup),
+                deleted_locations=[],
+                reason=reason,
+                status="pending",
+                created_at=datetime.utcnow()
+            )
+            for backup in backups
+            if backup.id not in recorded
+        ]
+
+        try:
+            db.add_all(new_deletions)
+            db.commit()
+        except IntegrityError:
+            # Те же бэкапы одновременно записал другой процесс
+            db.rollback()
+            logger.info("Удаление части бэкапов уже записано другим процессом")
+            return 0
+        return len(new_deletions)
+
+    def _claim(self, db: Session, backup_ids: Optional[List[str]]) -> List[BackupDeletion]:
+        """
+        Захватывает незавершенные удаления, чтобы их не обработал параллельный запуск
+        """
+        now = datetime.utcnow()
+        claimable = or_(
+            BackupDeletion.status.in_(("pending", "failed")),
+            and_(BackupDeletion.status == "running", BackupDeletion.claimed_at < now - self.claim_timeout)
+        )
+        query = select(BackupDeletion.id).where(claimable)
+        if backup_ids is not None:
+            query = query.where(BackupDeletion.backup_id.in_(backup_ids))
+        else:
+            query = query.where(BackupDeletion.attempts < self.max_attempts)
+
+        claimed_ids = []
+        for deletion_id in db.execute(query).scalars().all():
+            claimed = db.execute(
+                update(BackupDeletion)
+                .where(BackupDeletion.id == deletion_id)
+                .where(claimable)
+                .values(status="running", claimed_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                claimed_ids.append(deletion_id)
+        db.commit()
+
+        if not claimed_ids:
+            return []
+        return db.query(BackupDeletion).filter(BackupDeletion.id.in_(claimed_ids)).all()
+
+    def process_pending(self, db: Session, backup_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Удаляет файлы незавершенных удалений из хранилищ и записи о бэкапах из БД
+
+        Args:
+            db: Сессия базы данных
+            backup_ids: Обработать только удаления этих бэкапов (без ограничения числа попыток)
+
+        Returns:
+            Словарь с количеством удаленных и неудаленных бэкапов, освобожденным размером и ошибками
+        """
+        deletions = self._claim(db, backup_ids)
+        if not deletions:
+            return {"deleted": 0, "failed": 0, "freed_bytes": 0, "errors": []}
+
+        # Файлы, на которые ссылаются другие бэкапы (общий экспорт нескольких
+        # расписаний), остаются в хранилище - удаляется только запись о копии
+        shared_files = self._shared_files(db, deletions)
+
+        # Хранилища настраиваются один раз на запуск, а не для каждого файла
+        storage_resolver = StorageResolver(db)
+        outcomes: Dict[str, Tuple[set, Optional[str]]] = {}
+        jobs = []
+        for deletion in deletions:
+            deleted_locations = set(deletion.deleted_locations or [])
+            try:
+                for index, location in enumerate(deletion.locations):
+                    if (location["storage_type"], location["file_path"]) in shared_files:
+                        deleted_locations.add(index)
+                    else:
+                        storage_resolver.resolve(location["storage_type"], location.get("storage_params"))
+            except Exception as e:
+                outcomes[deletion.id] = (deleted_locations, f"ошибка настройки хранилища: {str(e)}")
+                continue
+            jobs.append((deletion.id, list(enumerate(deletion.locations)), deleted_locations))
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="retention") as executor:
+            outcomes.update(executor.map(lambda job: self._delete_files(storage_resolver, *job), jobs))
+
+        completed: List[BackupDeletion] = []
+        errors = []
+        removed_location_ids = []
+        for deletion in deletions:
+            deleted_locations, error = outcomes[deletion.id]
+            deletion.deleted_locations = sorted(deleted_locations)
+            removed_location_ids.extend(
+                location["id"] for index, location in enumerate(deletion.locations)
+                if index in deleted_locations and location.get("id")
+            )
+            deletion.attempts += 1
+            if error:
+                deletion.status = "failed"
+                deletion.error = error
+                errors.append(f"{deletion.backup_id}: {error}")
+            else:
+                # Запись журнала нужна только до удаления бэкапа: удаляется вместе с ним,
+                # чтобы проверки "бэкап не назначен к удалению" не просматривали завершенные удаления
+                db.delete(deletion)
+                completed.append(deletion)
+
+        # Копии, удаленные из хранилищ, помечаются сразу (важно, если удалены не все)
+        if removed_location_ids:
+            db.execute(
+                update(BackupLocation)
+                .where(BackupLocation.id.in_(removed_location_ids))
+                .values(status="deleted")
+                .execution_options(synchronize_session=False)
+            )
+
+        # Записи о полностью удаленных бэкапах удаляются одним запросом
+        completed_ids = [deletion.backup_id for deletion in completed]
+        if completed_ids:
+            backups = db.query(Backup).filter(Backup.id.in_(completed_ids)).all()
+            apply_backup_deletes(db, backups)
+            db.execute(
+                delete(BackupLocation)
+                .where(BackupLocation.backup_id.in_(completed_ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                delete(Backup)
+                .where(Backup.id.in_(completed_ids))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+
+        for error in errors:
+            logger.error(f"Не удалось удалить бэкап {error}")
+
+        return {
+            "deleted": len(completed),
+            "failed": len(errors),
+            "freed_bytes": sum(deletion.size or 0 for deletion in completed),
+            "errors": errors
+        }
+
+    def _shared_files(self, db: Session, deletions: List[BackupDeletion]) -> set:
+        """
+        Файлы удаляемых бэкапов, сохраненные копии которых есть у бэкапов,
+        не назначенных к удалению
+
+        Returns:
+            Множество пар (storage_type, file_path)
+        """
+        files = {
+            (location["storage_type"], location["file_path"])
+            for deletion in deletions
+            for location in deletion.locations
+        }
+        if not files:
+            return set()
+
+        rows = db.execute(
+            select(BackupLocation.storage_type, BackupLocation.file_path)
+            .where(BackupLocation.status == "stored")
+            .where(BackupLocation.file_path.in_([file_path for _, file_path in files]))
+            .where(BackupLocation.backup_id.notin_(select(BackupDeletion.backup_id)))
+        ).all()
+        shared = {(row.storage_type, row.file_path) for row in rows} & files
+        if shared:
+            logger.info(f"Файлы, используемые другими бэкапами, не удаляются из хранилищ: {len(shared)}")
+        return shared
+
+    def _delete_files(
+        self,
+        storage_resolver: StorageResolver,
+        deletion_id: str,
+        locations: List[Tuple[int, Dict[str, Any]]],
+        deleted_locations: set
+    ) -> Tuple[str, Tuple[set, Optional[str]]]:
+        """
+        Удаляет файл бэкапа из всех мест хранения (выполняется в пуле потоков)
+        """
+        errors = []
+        for index, location in locations:
+            if index in deleted_locations:
+                continue
+
+            try:
+                storage = storage_resolver.resolve(location["storage_type"], location.get("storage_params"))
+                if storage is None:
+                    errors.append(f"хранилище {location['storage_type']} не настроено")
+                    continue
+
+                self.rate_limiter.acquire()
+                # Файл мог быть удален прерванным ранее запуском
+                if storage.delete(location["file_path"]) or storage.get_file_info(location["file_path"]) is None:
+                    deleted_locations.add(index)
+                else:
+                    errors.append(f"не удалось удалить {location['file_path']} из {location['storage_type']}")
+            except Exception as e:
+                errors.append(f"{location['storage_type']}: {str(e)}")
+
+        return deletion_id, (deleted_locations, "; ".join(errors) or None)
+
+
+# Создаем глобальный экземпляр сервиса
+retention_service = RetentionService(
+    workers=settings.RETENTION_DELETE_WORKERS,
+    rate_per_second=settings.RETENTION_DELETE_RATE_PER_SECOND,
+    max_attempts=settings.RETENTION_MAX_ATTEMPTS
+)
@@ -0,0 +1,353 @@
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.writer import get_background_writer
+from app.models.schedule import Schedule
+from app.models.schedule_run import ScheduleRunRecord
+from app.models.sheet import Sheet
+from app.services.lease_service import lease_service
+from app.services.schedule_service import schedule_service
+
+logger = logging.getLogger(__name__)
+
+
+# Статусы завершенного запуска
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class ScheduleRun:
+    """
+    Фоновый запуск расписания с прогрессом по таблицам
+    """
+    def __init__(self, schedule_id: str, run_id: Optional[str] = None):
+        self.id = run_id or str(uuid.uuid4())
+        self.schedule_id = schedule_id
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.sheets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Номер версии состояния, увеличивается при каждом изменении (для потока событий)
+        self.version = 0
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @classmethod
+    def from_record(cls, record: ScheduleRunRecord) -> "ScheduleRun":
+        """
+        Запуск, восстановленный из сохраненного состояния (выполняется другим узлом или завершен)
+        """
+        run = cls(record.schedule_id, record.id)
+        run.status = record.status
+        run.created_at = record.created_at
+        run.started_at = record.started_at
+        run.finished_at = record.finished_at
+        run.error = record.error
+        run.sheets = OrderedDict((sheet["sheet_id"], sheet) for sheet in record.sheets or [])
+        run.version = record.version
+        return run
+
+    def to_dict(self) -> Dict[str, Any]:
+        sheets = list(self.sheets.values())
+        return {
+            "id": self.id,
+            "schedule_id": self.schedule_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "sheets_count": len(sheets),
+            "processed_count": sum(1 for s in sheets if s["status"] != "pending"),
+            "successful_backups": sum(1 for s in sheets if s["status"] == "completed"),
+            "sheets": sheets,
+            "version": self.version
+        }
+
+
+class RunService:
+    """
+    Сервис фонового выполнения расписаний в пуле потоков.
+
+    Состояние запусков хранится в памяти узла, выполняющего их, и сохраняется
+    в таблицу schedule_runs при каждом изменении, поэтому запуск доступен по ID
+    после перезапуска приложения и на других узлах.
+    """
+    def __init__(self, max_workers: int = 4, history_limit: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="schedule-run")
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._runs: "OrderedDict[str, ScheduleRun]" = OrderedDict()
+
+    def start_schedule_run(self, schedule_id: str) -> ScheduleRun:
+        """
+        Запускает выполнение расписания в фоне
+
+        Если расписание уже выполняется, возвращается текущий запуск.
+
+        Args:
+            schedule_id: ID расписания
+
+        Returns:
+            ScheduleRun: Объект запуска
+        """
+        with self._lock:
+            for run in self._runs.values():
+                if run.schedule_id == schedule_id and not run.is_finished:
+                    logger.info(f"Расписание {schedule_id} уже выполняется в запуске {run.id}")
+                    return run
+
+            run = ScheduleRun(schedule_id)
+            self._runs[run.id] = run
+            self._trim_history()
+
+        self._persist(run)
+        self.executor.submit(self._execute, run)
+        return run
+
+    def get_run(self, run_id: str) -> Optional[ScheduleRun]:
+        """
+        Получение запуска по ID (из памяти или из сохраненного состояния)
+
+        Args:
+            run_id: ID запуска
+
+        Returns:
+            ScheduleRun или None
+        """
+        with self._lock:
+            run = self._runs.get(run_id)
+        if run is not None:
+            return run
+
+        db = SessionLocal()
+        try:
+            record = db.get(ScheduleRunRecord, run_id)
+            return ScheduleRun.from_record(record) if record else None
+        except Exception as e:
+            logger.error(f"Ошибка при получении запуска {run_id}: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def is_local(self, run: ScheduleRun) -> bool:
+        """
+        Выполняется ли запуск этим узлом (его состояние обновляется в памяти)
+        """
+        with self._lock:
+            return self._runs.get(run.id) is run
+
+    def snapshot(self, run: ScheduleRun) -> Dict[str, Any]:
+        """
+        Согласованный снимок состояния запуска
+
+        Args:
+            run: Объект запуска
+
+        Returns:
+            Словарь с состоянием запуска и прогрессом по таблицам
+        """
+        with self._lock:
+            return run.to_dict()
+
+    def list_runs(self, schedule_id: Optional[str] = None) -> List[ScheduleRun]:
+        """
+        Получение списка последних запусков (новые первыми)
+
+        Args:
+            schedule_id: Опциональный ID расписания для фильтрации
+
+        Returns:
+            Список запусков
+        """
+        with self._lock:
+            runs = {run.id: run for run in self._runs.values()}
+
+        db = SessionLocal()
+        try:
+            query = select(ScheduleRunRecord).order_by(ScheduleRunRecord.created_at.desc()).limit(self.history_limit)
+            if schedule_id:
+                query = query.where(ScheduleRunRecord.schedule_id == schedule_id)
+            for record in db.execute(query).scalars():
+                runs.setdefault(record.id, ScheduleRun.from_record(record))
+        except Exception as e:
+            logger.error(f"Ошибка при получении сохраненных запусков: {str(e)}")
+        finally:
+            db.close()
+
+        result = sorted(runs.values(), key=lambda run: run.created_at, reverse=True)
+        if schedule_id:
+            result = [run for run in result if run.schedule_id == schedule_id]
+        return result[:self.history_limit]
+
+    def fail_interrupted_runs(self) -> int:
+        """
+        Помечает неудачными незавершенные запуски, прерванные остановкой узла.
+
+        В распределенном режиме затрагиваются только запуски этого узла
+        (ID узла должен быть постоянным - SCHEDULER_NODE_ID).
+
+        Returns:
+            int: Количество помеченных запусков
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(ScheduleRunRecord).filter(ScheduleRunRecord.status.notin_(FINISHED_STATUSES))
+            if settings.SCHEDULER_DISTRIBUTED:
+                query = query.filter(ScheduleRunRecord.node_id == lease_service.node_id)
+            count = query.update(
+                {
+                    "status": "failed",
+                    "error": "Запуск прерван остановкой приложения",
+                    "finished_at": datetime.utcnow(),
+                    "version": ScheduleRunRecord.version + 1
+                },
+                synchronize_session=False
+            )
+            db.commit()
+            if count:
+                logger.warning(f"Прерванных запусков расписаний помечено неудачными: {count}")
+            return count
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка при обработке прерванных запусков: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def _trim_history(self) -> None:
+        """
+        Удаляет самые старые завершенные запуски сверх лимита истории
+        """
+        finished = [run_id for run_id, run in self._runs.items() if run.is_finished]
+        excess = len(self._runs) - self.history_limit
+        for run_id in finished[:max(0, excess)]:
+            del self._runs[run_id]
+
+    def _update(self, run: ScheduleRun, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(run, name, value)
+            run.version += 1
+        self._persist(run)
+
+    def _persist(self, run: ScheduleRun) -> None:
+        """
+        Сохраняет текущее состояние запуска (через очередь записи, если она включена)
+        """
+        state = self.snapshot(run)
+        values = {
+            field: state[field]
+            for field in ("id", "schedule_id", "status", "created_at", "started_at", "finished_at", "error", "sheets", "version")
+        }
+        values["node_id"] = lease_service.node_id
+        history_limit = self.history_limit
+
+        def write(session: Session) -> None:
+            session.merge(ScheduleRunRecord(**values))
+            # Следующее состояние того же запуска может прийти в той же пачке записи
+            session.flush()
+            if values["status"] in FINISHED_STATUSES:
+                # Старые завершенные запуски сверх лимита истории удаляются
+                stale = (
+                    select(ScheduleRunRecord.id)
+                    .where(ScheduleRunRecord.status.in_(FINISHED_STATUSES))
+                    .order_by(ScheduleRunRecord.created_at.desc())
+                    .offset(history_limit)
+                )
+                session.execute(
+                    delete(ScheduleRunRecord)
+                    .where(ScheduleRunRecord.id.in_(stale.scalar_subquery()))
+                    .execution_options(synchronize_session=False)
+                )
+
+        writer = get_background_writer()
+        if writer is not None:
+            writer.submit(write)
+            return
+
+        db = SessionLocal()
+        try:
+            write(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка при сохранении состояния запуска {run.id}: {str(e)}")
+        finally:
+            db.close()
+
+    def _execute(self, run: ScheduleRun) -> None:
+        """
+        Выполнение запуска в потоке пула
+        """
+        db = SessionLocal()
+        try:
+            self._update(run, status="running", started_at=datetime.utcnow())
+
+            schedule = db.query(Schedule).filter(Schedule.id == run.schedule_id).first()
+            if schedule:
+                sheets = db.query(Sheet).filter(Sheet.id.in_(schedule.sheets_ids)).all()
+                with self._lock:
+                    for sheet in sheets:
+                        run.sheets[sheet.id] = {
+                            "sheet_id": sheet.id,
+                            "sheet_name": sheet.name,
+                            "status": "pending",
+                            "error": None
+                        }
+                    run.version += 1
+                self._persist(run)
+
+            def on_result(result: Dict[str, Any]) -> None:
+                with self._lock:
+                    run.sheets[result["sheet_id"]] = {
+                        "sheet_id": result["sheet_id"],
+                        "sheet_name": result.get("sheet_name"),
+                        "status": "completed" if result.get("success") else "failed",
+                        "error": result.get("error")
+                    }
+                    run.version += 1
+                self._persist(run)
+
+            result = schedule_service.execute_schedule(
+                db,
+                run.schedule_id,
+                on_result=on_result,
+                writer=get_background_writer()
+            )
+
+            if result.get("success", False):
+                self._update(run, status="completed", finished_at=datetime.utcnow())
+            else:
+                self._update(run, status="failed", error=result.get("error"), finished_at=datetime.utcnow())
+
+            logger.info(f"Запуск {run.id} расписания {run.schedule_id} завершен со статусом {run.status}")
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении запуска {run.id}: {str(e)}")
+            self._update(run, status="failed", error=str(e), finished_at=datetime.utcnow())
+        finally:
+            db.close()
+
+    def shutdown(self) -> None:
+        """Останавливает пул потоков"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Создаем глобальный экземпляр сервиса
+run_service = RunService(
+    max_workers=settings.RUN_WORKERS,
+    history_limit=settings.RUN_HISTORY_LIMIT
+)
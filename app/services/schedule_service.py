@@ -1,15 +1,32 @@
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.schedule import Schedule
 from app.models.sheet import Sheet
+from app.models.schedule_sheet_state import ScheduleSheetState
 from app.core.scheduler import scheduler_service
 from app.services.backup_service import backup_sheets
+from app.services.adaptive_service import record_schedule_backups
+from app.services.snapshot_service import DEFAULT_BACKUP_FORMAT
+from app.db.writer import DBWriter
 
 logger = logging.getLogger(__name__)
 
+
+def _policy_dict(retention_policy: Optional[Any]) -> Optional[Dict[str, Any]]:
+    """
+    Политика хранения в виде словаря без пустых полей (None, если политика пустая)
+    """
+    if retention_policy is None:
+        return None
+    policy = retention_policy if isinstance(retention_policy, dict) else retention_policy.dict(exclude_none=True)
+    policy = {field: value for field, value in policy.items() if value is not None}
+    return policy or None
+
 class ScheduleService:
     @staticmethod
     def create_schedule(
@@ -18,7 +35,9 @@ class ScheduleService:
         schedule_type: str,
         schedule_config: Dict[str, Any],
         storage_configs: List[Dict[str, Any]],
-        is_active: bool = True
+        is_active: bool = True,
+        retention_policy: Optional[Dict[str, Any]] = None,
+        backup_format: Optional[str] = None
     ) -> Optional[Schedule]:
         """
         Создает новое расписание для указанных таблиц
@@ -26,10 +45,12 @@ class ScheduleService:
         Args:
             db: Сессия базы данных
             sheets_ids: Список ID таблиц
-            schedule_type: Тип расписания ('interval' или 'cron')
+            schedule_type: Тип расписания ('interval', 'cron' или 'adaptive')
             schedule_config: Конфигурация расписания
             storage_configs: Список конфигураций хранилищ
             is_active: Активно ли расписание
+            retention_policy: Политика хранения бэкапов
+            backup_format: Формат бэкапов ("xlsx", "ndjson", "csv" или "csv_export")
             
         Returns:
             Созданное расписание или None в случае ошибки
@@ -51,6 +72,8 @@ class ScheduleService:
                 schedule_config=schedule_config,
                 storage_configs=[config if isinstance(config, dict) else config.dict() for config in storage_configs],
                 is_active=is_active,
+                retention_policy=_policy_dict(retention_policy),
+                backup_format=backup_format or DEFAULT_BACKUP_FORMAT,
                 created_at=datetime.utcnow()
             )
             
@@ -77,7 +100,9 @@ class ScheduleService:
         schedule_type: Optional[str] = None,
         schedule_config: Optional[Dict[str, Any]] = None,
         storage_configs: Optional[List[Dict[str, Any]]] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        retention_policy: Optional[Dict[str, Any]] = None,
+        backup_format: Optional[str] = None
     ) -> Optional[Schedule]:
         """
         Обновляет существующее расписание
@@ -86,10 +111,12 @@ class ScheduleService:
             db: Сессия базы данных
             schedule_id: ID расписания
             sheets_ids: Список ID таблиц
-            schedule_type: Тип расписания ('interval' или 'cron')
+            schedule_type: Тип расписания ('interval', 'cron' или 'adaptive')
             schedule_config: Конфигурация расписания
             storage_configs: Список конфигураций хранилищ
             is_active: Активно ли расписание
+            retention_policy: Политика хранения бэкапов (пустая политика отключает очистку)
+            backup_format: Формат бэкапов ("xlsx", "ndjson", "csv" или "csv_export")
             
         Returns:
             Обновленное расписание или None в случае ошибки
@@ -127,6 +154,12 @@ class ScheduleService:
             if is_active is not None:
                 schedule.is_active = is_active
             
+            if retention_policy is not None:
+                schedule.retention_policy = _policy_dict(retention_policy)
+            
+            if backup_format is not None:
+                schedule.backup_format = backup_format
+            
             schedule.updated_at = datetime.utcnow()
             
             db.commit()
@@ -164,7 +197,8 @@ class ScheduleService:
             # Удаляем из планировщика
             scheduler_service.remove_schedule(schedule_id)
             
-            # Удаляем из БД
+            # Удаляем из БД вместе с состояниями таблиц расписания
+            db.query(ScheduleSheetState).filter(ScheduleSheetState.schedule_id == schedule_id).delete(synchronize_session=False)
             db.delete(schedule)
             db.commit()
             
@@ -193,6 +227,50 @@ class ScheduleService:
             logger.error(f"Ошибка при получении расписания: {str(e)}")
             return None
     
+    @staticmethod
+    async def get_schedule_async(db: AsyncSession, schedule_id: str) -> Optional[Schedule]:
+        """
+        Получает расписание по ID через асинхронную сессию
+        
+        Args:
+            db: Асинхронная сессия базы данных
+            schedule_id: ID расписания
+            
+        Returns:
+            Объект расписания или None
+        """
+        try:
+            return await db.get(Schedule, schedule_id)
+        except Exception as e:
+            logger.error(f"Ошибка при получении расписания: {str(e)}")
+            return None
+    
+    @staticmethod
+    async def get_all_schedules_async(db: AsyncSession, sheet_id: Optional[str] = None) -> List[Schedule]:
+        """
+        Получает список всех расписаний через асинхронную сессию
+        
+        Args:
+            db: Асинхронная сессия базы данных
+            sheet_id: Опциональный ID таблицы для фильтрации
+            
+        Returns:
+            Список расписаний
+        """
+        try:
+            result = await db.execute(select(Schedule))
+            schedules = result.scalars().all()
+            
+            if sheet_id:
+                # Фильтрация расписаний, содержащих указанный ID таблицы
+                return [s for s in schedules if sheet_id in s.sheets_ids]
+            
+            return schedules
+            
+        except Exception as e:
+            logger.error(f"Ошибка при получении списка расписаний: {str(e)}")
+            return []
+    
     @staticmethod
     def get_all_schedules(db: Session, sheet_id: Optional[str] = None) -> List[Schedule]:
         """
@@ -221,13 +299,35 @@ class ScheduleService:
             return []
     
     @staticmethod
-    def execute_schedule(db: Session, schedule_id: str) -> Dict[str, Any]:
+    def get_load_plan(db: Session, hours: int = 24) -> Dict[str, Any]:
+        """
+        Получает прогноз нагрузки планировщика для активных расписаний
+        
+        Args:
+            db: Сессия базы данных
+            hours: Горизонт прогноза в часах
+            
+        Returns:
+            Прогноз количества одновременных задач по минутам
+        """
+        schedules = db.query(Schedule).filter(Schedule.is_active == True).all()
+        return scheduler_service.plan_load(schedules, hours=hours)
+    
+    @staticmethod
+    def execute_schedule(
+        db: Session,
+        schedule_id: str,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        writer: Optional[DBWriter] = None
+    ) -> Dict[str, Any]:
         """
         Выполняет расписание немедленно
         
         Args:
             db: Сессия базы данных
             schedule_id: ID расписания
+            on_result: Функция, вызываемая с результатом каждой таблицы по мере выполнения
+            writer: Очередь записи в БД для фоновых запусков
             
         Returns:
             Результат выполнения расписания
@@ -254,15 +354,21 @@ class ScheduleService:
                 sheets_data.append({
                     "id": sheet.id,
                     "name": sheet.name,
-                    "spreadsheet_id": sheet.spreadsheet_id
+                    "spreadsheet_id": sheet.spreadsheet_id,
+                    "credentials_id": sheet.credentials_id,
+                    "append_only": bool(sheet.append_only)
                 })
             
             # Создаем бэкапы для всех таблиц
             results = backup_sheets(
                 sheets=sheets_data,
                 storage_configs=schedule.storage_configs,
-                db=db
+                db=db,
+                on_result=on_result,
+                writer=writer,
+                backup_format=schedule.backup_format
             )
+            record_schedule_backups(db, schedule, results)
             
             return {
                 "success": True,
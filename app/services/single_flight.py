@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Awaitable, Callable, Optional
+
+from app.services.backup_coalescer import storage_config_key
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """
+    Выполняющийся запрос, к которому присоединяются повторные вызовы
+    """
+    def __init__(self, key: str, kind: str, description: Optional[str], task: "asyncio.Future"):
+        self.key = key
+        self.kind = kind
+        self.description = description
+        self.started_at = datetime.utcnow()
+        self.waiters = 0
+        self.task = task
+
+
+class SingleFlight:
+    """
+    Дедупликация одновременных запросов: повторный вызов с тем же ключом
+    не запускает работу заново, а дожидается результата уже выполняющегося.
+
+    Вызывается из цикла событий: ожидающие запросы не занимают потоки пула
+    блокирующих вызовов, а ждут общую задачу.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]], kind: str = "backup", description: Optional[str] = None) -> Any:
+        """
+        Выполняет функцию или присоединяется к уже выполняющемуся вызову с тем же ключом
+
+        Args:
+            key: Ключ дедупликации
+            func: Функция без аргументов, возвращающая корутину с работой
+            kind: Тип операции (для отображения состояния)
+            description: Описание операции (для отображения состояния)
+
+        Returns:
+            Результат функции (общий для всех присоединившихся вызовов)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight(key, kind, description, asyncio.ensure_future(func()))
+                self._flights[key] = flight
+                flight.task.add_done_callback(lambda task: self._finish(key, task))
+            else:
+                flight.waiters += 1
+                logger.info(f"Запрос {key} уже выполняется, ожидаем его результат")
+
+        # Отмена одного запроса (например, отключение клиента) не прерывает общую работу
+        return await asyncio.shield(flight.task)
+
+    def _finish(self, key: str, task: "asyncio.Future") -> None:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.task is task:
+                del self._flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.info(f"Запрос {key} завершился ошибкой: {task.exception()}")
+
+    def list_flights(self) -> List[Dict[str, Any]]:
+        """
+        Получение списка выполняющихся запросов
+
+        Returns:
+            Список словарей с состоянием запросов
+        """
+        with self._lock:
+            return [
+                {
+                    "key": flight.key,
+                    "kind": flight.kind,
+                    "description": flight.description,
+                    "started_at": flight.started_at,
+                    "waiters": flight.waiters
+                }
+                for flight in self._flights.values()
+            ]
+
+
+def backup_flight_key(sheet_id: str, storage_configs: List[Dict[str, Any]]) -> str:
+    """
+    Ключ дедупликации бэкапа: запись таблицы и набор хранилищ
+
+    Ключ строится по ID записи таблицы, а не по ID Google Sheets: запросы
+    для разных записей одной таблицы создают каждый свою запись о бэкапе.
+    """
+    storage_keys = sorted({storage_config_key(config) for config in storage_configs})
+    return f"backup:{sheet_id}:{'|'.join(storage_keys)}"
+
+
+def schedule_flight_key(schedule_id: str) -> str:
+    """
+    Ключ дедупликации ручного запуска расписания
+    """
+    return f"schedule:{schedule_id}"
+
+
+# Создаем глобальный экземпляр сервиса
+single_flight = SingleFlight()
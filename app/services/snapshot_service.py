@@ -0,0 +1,316 @@
+import io
+import re
+import csv
+import json
+import hashlib
+import logging
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Формат бэкапа по умолчанию - экспорт книги в XLSX
+DEFAULT_BACKUP_FORMAT = "xlsx"
+# Форматы снимков значений листов (Sheets values API)
+SNAPSHOT_FORMATS = ("ndjson", "csv")
+# Параллельный CSV-экспорт каждого листа (export?format=csv&gid=...)
+EXPORT_FORMAT = "csv_export"
+BACKUP_FORMATS = (DEFAULT_BACKUP_FORMAT,) + SNAPSHOT_FORMATS + (EXPORT_FORMAT,)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_CONTENT_TYPE = "application/zip"
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+# Числа в CSV-частях записываются в книгу числами; значения с ведущими нулями остаются текстом
+_NUMBER_PATTERN = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?$")
+
+
+def is_snapshot_format(backup_format: str) -> bool:
+    """
+    Является ли формат снимком значений листов (а не экспортом книги)
+    """
+    return backup_format in SNAPSHOT_FORMATS
+
+
+def is_bundle_format(backup_format: str) -> bool:
+    """
+    Сохраняется ли бэкап архивом листов с манифестом
+    """
+    return is_snapshot_format(backup_format) or backup_format == EXPORT_FORMAT
+
+
+def snapshot_extension(backup_format: str) -> str:
+    """
+    Расширение файла бэкапа для формата
+    """
+    if is_bundle_format(backup_format):
+        return f"{backup_format}.zip"
+    return DEFAULT_BACKUP_FORMAT
+
+
+def backup_content_type(filename: str) -> str:
+    """
+    MIME-тип файла бэкапа по его имени
+    """
+    return ZIP_CONTENT_TYPE if filename.endswith(".zip") else XLSX_CONTENT_TYPE
+
+
+def _encode_row(row: List[Any], backup_format: str, buffer: io.StringIO, writer: Any) -> bytes:
+    """
+    Строка листа в виде одной строки файла части снимка
+    """
+    if backup_format == "ndjson":
+        return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+def write_snapshot(
+    values_by_sheet: Dict[str, List[List[Any]]],
+    backup_format: str,
+    out: BinaryIO,
+    extra: Optional[Dict[str, Any]] = None,
+    tab_extra: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Записывает снимок значений листов в ZIP-архив: по файлу на лист и манифест.
+
+    Строки пишутся в архив потоково, по одной, поэтому архив можно
+    писать во временный файл, не собирая части целиком в памяти.
+
+    Args:
+        values_by_sheet: Значения листов {название листа: строки}
+        backup_format: Формат частей ("ndjson" или "csv")
+        out: Файл для записи архива
+        extra: Дополнительные поля манифеста
+        tab_extra: Дополнительные поля описаний листов {название листа: поля}
+
+    Returns:
+        Dict[str, Any]: Манифест снимка (листы, размеры и хеши частей)
+    """
+    if not is_snapshot_format(backup_format):
+        raise ValueError(f"Неизвестный формат снимка: {backup_format}")
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "format": backup_format,
+        "created_at": datetime.utcnow().isoformat(),
+        **(extra or {}),
+        "tabs": []
+    }
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, (title, rows) in enumerate(values_by_sheet.items(), start=1):
+            part_name = f"tabs/{index:04d}.{backup_format}"
+            part_hash = hashlib.sha256()
+            part_size = 0
+            columns = 0
+
+            with archive.open(part_name, "w") as part:
+                for row in rows:
+                    line = _encode_row(row, backup_format, buffer, writer)
+                    part.write(line)
+                    part_hash.update(line)
+                    part_size += len(line)
+                    columns = max(columns, len(row))
+
+            manifest["tabs"].append({
+                "title": title,
+                "file": part_name,
+                "rows": len(rows),
+                "columns": columns,
+                "size": part_size,
+                "sha256": part_hash.hexdigest(),
+                **(tab_extra or {}).get(title, {})
+            })
+
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    return manifest
+
+
+def write_export_bundle(
+    exports: Iterable[Tuple[Dict[str, Any], Optional[bytes]]],
+    out: BinaryIO
+) -> Dict[str, Any]:
+    """
+    Записывает CSV-экспорт листов в ZIP-архив в формате снимка CSV.
+
+    Экспорт каждого листа записывается как есть, без разбора, по мере
+    поступления; манифест дополнительно хранит gid листа и источник
+    "export", поэтому архив читается теми же функциями, что и снимок.
+
+    Args:
+        exports: Пары (лист {"title", "gid"}, содержимое CSV или None при ошибке экспорта)
+        out: Файл для записи архива
+
+    Returns:
+        Dict[str, Any]: Манифест архива
+
+    Raises:
+        ValueError: Если какой-либо лист не удалось экспортировать
+    """
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "format": "csv",
+        "source": "export",
+        "created_at": datetime.utcnow().isoformat(),
+        "tabs": []
+    }
+
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, (tab, content) in enumerate(exports, start=1):
+            if content is None:
+                raise ValueError(f"Не удалось экспортировать лист {tab['title']}")
+
+            part_name = f"tabs/{index:04d}.csv"
+            archive.writestr(part_name, content)
+
+            rows = 0
+            columns = 0
+            for row in csv.reader(io.StringIO(content.decode("utf-8"), newline="")):
+                rows += 1
+                columns = max(columns, len(row))
+
+            manifest["tabs"].append({
+                "title": tab["title"],
+                "gid": tab["gid"],
+                "file": part_name,
+                "rows": rows,
+                "columns": columns,
+                "size": len(content),
+                "sha256": hashlib.sha256(content).hexdigest()
+            })
+
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    return manifest
+
+
+def snapshot_content_hash(manifest: Dict[str, Any]) -> str:
+    """
+    Хеш содержимого снимка по названиям листов и хешам частей
+    """
+    content_hash = hashlib.sha256()
+    for tab in manifest["tabs"]:
+        content_hash.update(tab["title"].encode("utf-8"))
+        content_hash.update(tab["sha256"].encode("ascii"))
+    return content_hash.hexdigest()
+
+
+def read_manifest(file_data: BinaryIO) -> Dict[str, Any]:
+    """
+    Читает манифест снимка из ZIP-архива
+
+    Args:
+        file_data: Файл архива снимка
+
+    Returns:
+        Dict[str, Any]: Манифест снимка
+    """
+    with zipfile.ZipFile(file_data) as archive:
+        return json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+
+
+def iter_tab_rows(archive: zipfile.ZipFile, tab: Dict[str, Any], backup_format: str) -> Iterator[List[Any]]:
+    """
+    Потоково читает строки одного листа из архива снимка
+
+    Args:
+        archive: Открытый архив снимка
+        tab: Описание листа из манифеста
+        backup_format: Формат частей ("ndjson" или "csv")
+
+    Yields:
+        List[Any]: Строки листа
+    """
+    with archive.open(tab["file"]) as part:
+        lines = io.TextIOWrapper(part, encoding="utf-8", newline="")
+        if backup_format == "ndjson":
+            for line in lines:
+                yield json.loads(line)
+        else:
+            yield from csv.reader(lines)
+
+
+def read_snapshot(file_data: BinaryIO) -> Dict[str, List[List[Any]]]:
+    """
+    Читает значения всех листов из архива снимка
+
+    Args:
+        file_data: Файл архива снимка
+
+    Returns:
+        Dict[str, List[List[Any]]]: Значения листов {название листа: строки}
+    """
+    with zipfile.ZipFile(file_data) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+        return {
+            tab["title"]: list(iter_tab_rows(archive, tab, manifest["format"]))
+            for tab in manifest["tabs"]
+        }
+
+
+def _cell_value(value: Any) -> Any:
+    """
+    Значение ячейки книги из значения части снимка
+    """
+    if isinstance(value, str):
+        if value == "":
+            return None
+        if _NUMBER_PATTERN.match(value):
+            return float(value) if "." in value else int(value)
+    return value
+
+
+def _worksheet_title(title: str, used: set) -> str:
+    """
+    Название листа книги: Excel ограничивает его 31 символом, не допускает символы
+    []:*?/ и обратную косую черту и не различает регистр, поэтому названия,
+    совпавшие после замены символов и обрезки, нумеруются
+    """
+    base = re.sub(r"[\[\]:*?/\\]", "_", title)[:31] or "Лист"
+    candidate = base
+    number = 1
+    while candidate.lower() in used:
+        number += 1
+        suffix = f" ({number})"
+        candidate = base[:31 - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def bundle_to_workbook(file_data: BinaryIO, out: BinaryIO) -> None:
+    """
+    Собирает листы архива снимка в одну книгу XLSX.
+
+    Книга пишется в потоковом режиме openpyxl, строки листов читаются
+    из архива по одной. Форматирование и формулы не восстанавливаются.
+
+    Args:
+        file_data: Файл архива снимка
+        out: Файл для записи книги
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used_titles: set = set()
+    with zipfile.ZipFile(file_data) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME).decode("utf-8"))
+        for tab in manifest["tabs"]:
+            worksheet = workbook.create_sheet(_worksheet_title(tab["title"], used_titles))
+            for row in iter_tab_rows(archive, tab, manifest["format"]):
+                worksheet.append([_cell_value(value) for value in row])
+
+    if not manifest["tabs"]:
+        workbook.create_sheet()
+    workbook.save(out)
@@ -1,7 +1,14 @@
+import json
+import logging
+import threading
+from typing import Optional, Dict, Any
+
 from app.services.storage.base_storage import BaseStorage
 from app.services.storage.local_storage import LocalStorage
 from app.services.storage.bitrix_disk_storage import BitrixDiskStorage
 
+logger = logging.getLogger(__name__)
+
 # Фабрика для создания экземпляров хранилищ по типу
 def get_storage(storage_type: str, **kwargs) -> BaseStorage:
     """
@@ -27,4 +34,94 @@ def get_storage(storage_type: str, **kwargs) -> BaseStorage:
     # elif storage_type == "gdrive":
     #     return GDriveStorage(**kwargs)
     else:
-        raise ValueError(f"Неподдерживаемый тип хранилища: {storage_type}") 
\ No newline at end of file
+        raise ValueError(f"Неподдерживаемый тип хранилища: {storage_type}")
+
+
+def resolve_storage(
+    storage_type: str,
+    storage_params: Optional[Dict[str, Any]] = None,
+    db: Optional[Any] = None
+) -> Optional[BaseStorage]:
+    """
+    Получение экземпляра хранилища по конфигурации из расписания или записи о бэкапе
+
+    Для Битрикс24 параметры берутся из интеграции по integration_id, из самих
+    параметров (webhook_url) или из настроенной интеграции по умолчанию.
+
+    Args:
+        storage_type: Тип хранилища
+        storage_params: Параметры хранилища
+        db: Сессия базы данных (для получения настроек интеграции)
+
+    Returns:
+        BaseStorage или None, если хранилище не удалось настроить
+    """
+    from app.services.integration_service import IntegrationService
+
+    if storage_type == "local":
+        return get_storage(storage_type)
+
+    if storage_type != "bitrix":
+        return get_storage(storage_type, **(storage_params or {}))
+
+    bitrix_params = None
+    if db and storage_params and storage_params.get("integration_id") is not None:
+        integration_id = storage_params.get("integration_id")
+        integration = IntegrationService.get_integration_settings(db, integration_id)
+        if not integration:
+            logger.error(f"Не найдена интеграция Битрикс24 с ID {integration_id}")
+            return None
+        if integration["type"] != "bitrix":
+            logger.error(f"Найденная интеграция с ID {integration_id} имеет неверный тип: {integration['type']}")
+            return None
+        bitrix_params = integration["settings"]
+    elif storage_params and storage_params.get("webhook_url"):
+        bitrix_params = storage_params
+    elif db:
+        bitrix_params = IntegrationService.get_bitrix_settings(db)
+        if not bitrix_params:
+            logger.error("Не настроена интеграция с Битрикс24")
+            return None
+    else:
+        logger.error("Не указаны параметры для хранилища Битрикс24 и нет доступа к базе данных")
+        return None
+
+    if not bitrix_params or "webhook_url" not in bitrix_params:
+        logger.error("Не указаны параметры webhook_url для хранилища Битрикс24")
+        return None
+
+    return get_storage(
+        storage_type,
+        webhook_url=bitrix_params["webhook_url"],
+        folder_id=bitrix_params.get("folder_id"),
+        base_path=bitrix_params.get("base_path", "backup_google_sheets")
+    )
+
+
+class StorageResolver:
+    """
+    Хранилища одного запуска: каждая конфигурация хранилища настраивается
+    один раз (для Битрикс24 это запросы к БД и проверка соединения с API),
+    а не для каждой таблицы.
+    """
+    def __init__(self, db: Optional[Any] = None):
+        self.db = db
+        self._storages: Dict[str, Optional[BaseStorage]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, storage_type: str, storage_params: Optional[Dict[str, Any]] = None) -> Optional[BaseStorage]:
+        """
+        Экземпляр хранилища для конфигурации (None, если хранилище не удалось настроить)
+
+        Args:
+            storage_type: Тип хранилища
+            storage_params: Параметры хранилища
+
+        Returns:
+            BaseStorage или None
+        """
+        key = json.dumps([storage_type, storage_params or {}], sort_keys=True, default=str)
+        with self._lock:
+            if key not in self._storages:
+                self._storages[key] = resolve_storage(storage_type, storage_params, self.db)
+            return self._storages[key]
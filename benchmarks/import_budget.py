@@ -0,0 +1,119 @@
+"""
+Проверка бюджета времени импорта приложения.
+
+Импортирует app.main в отдельных процессах (как при холодном старте
+контейнера) и завершается с кодом 1, если медианное время импорта
+превышает бюджет или при импорте загружаются тяжелые модули, которые
+должны загружаться только при первом использовании.
+
+Запуск из корня проекта:
+    python benchmarks/import_budget.py --runs 5
+
+Бюджет по умолчанию рассчитан на машину с одним vCPU (CPython 3.12):
+медиана импорта на ней 700-1050 мс, из них около 600 мс занимает импорт
+fastapi, sqlalchemy и других зависимостей. На более быстрой машине бюджет
+стоит уменьшить через --budget-ms до своей медианы с запасом в 50%.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Модули, которые загружаются лениво и не должны попадать в импорт приложения
+LAZY_MODULES = (
+    "pandas",
+    "openpyxl",
+    "pyarrow",
+    "googleapiclient.discovery",
+    "google.oauth2.service_account",
+    "httplib2",
+)
+
+# Медиана на машине с одним vCPU (до 1050 мс) с запасом на разброс замеров
+DEFAULT_BUDGET_MS = 1500
+
+PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(env: dict) -> dict:
+    """
+    Время импорта app.main в новом процессе и загруженные тяжелые модули
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(lazy=LAZY_MODULES)],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int) -> list:
+    """
+    Самые медленные модули по данным python -X importtime (суммарное время, мс)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            timings.append((int(cumulative) / 1000, module.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени импорта app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Допустимое медианное время импорта, мс")
+    parser.add_argument("--runs", type=int, default=5, help="Количество замеров")
+    parser.add_argument("--top", type=int, default=0, help="Показать N самых медленных модулей")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "import-budget")
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    env["PYTHONPATH"] = str(PROJECT_ROOT)
+
+    samples = [measure_import(env) for _ in range(args.runs)]
+    median_ms = statistics.median(sample["seconds"] for sample in samples) * 1000
+    loaded = sorted({module for sample in samples for module in sample["loaded"]})
+
+    print(f"Импорт app.main: медиана {median_ms:.0f} мс по {args.runs} замерам (бюджет {args.budget_ms:.0f} мс)")
+    if args.top:
+        for cumulative_ms, module in slowest_imports(env, args.top):
+            print(f"  {cumulative_ms:8.1f} мс  {module}")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"Превышен бюджет времени импорта на {median_ms - args.budget_ms:.0f} мс")
+        failed = True
+    if loaded:
+        print(f"При импорте загружены модули, которые должны загружаться лениво: {', '.join(loaded)}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
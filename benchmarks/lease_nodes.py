@@ -0,0 +1,167 @@
+"""
+Проверка распределенного выполнения расписаний на нескольких локальных процессах.
+
+Запускает несколько узлов (процессов) с общей SQLite-базой. Каждый узел, как
+планировщик в распределенном режиме, на каждом срабатывании всех расписаний
+пытается захватить аренду (lease_service.try_claim) и "выполняет" запуск
+заданное время. Проверяется, что каждое срабатывание каждого расписания
+выполнено ровно одним узлом, в том числе когда узлы загружены
+(SCHEDULER_NODE_MAX_RUNS) и часть запусков ждет свободного места.
+
+Завершается с кодом 1, если какой-то запуск пропущен или выполнен дважды.
+
+Запуск из корня проекта:
+    python benchmarks/lease_nodes.py --nodes 3 --schedules 8 --max-runs 2 --fires 3
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import threading
+import subprocess
+import time
+from collections import Counter
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def node_main(args: argparse.Namespace) -> None:
+    """
+    Узел: на каждом срабатывании захватывает аренды расписаний и выполняет запуски
+    """
+    from app.services.lease_service import LeaseService
+
+    lease_service = LeaseService(node_id=args.node_id, ttl_seconds=60)
+    schedule_ids = json.loads(args.schedule_ids)
+    lock = threading.Lock()
+
+    def fire(schedule_id: str, fire_number: int) -> None:
+        if not lease_service.try_claim(schedule_id, args.period / 2):
+            return
+        try:
+            with lock:
+                print(json.dumps({"node": args.node_id, "schedule": schedule_id, "fire": fire_number}), flush=True)
+            time.sleep(args.duration)
+        finally:
+            lease_service.release(schedule_id)
+
+    threads = []
+    for fire_number in range(args.fires):
+        # Все узлы срабатывают в одни и те же моменты, как планировщики с общими триггерами
+        time.sleep(max(0.0, args.start_at + fire_number * args.period - time.time()))
+        for schedule_id in schedule_ids:
+            thread = threading.Thread(target=fire, args=(schedule_id, fire_number))
+            thread.start()
+            threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+
+def create_database(database_url: str, schedules: int) -> list:
+    """
+    Создает базу с расписаниями и возвращает их ID
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.db.base import Base
+    from app.models.schedule import Schedule
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        rows = [
+            Schedule(sheets_ids=[], schedule_type="interval", schedule_config={}, storage_configs=[])
+            for _ in range(schedules)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def run(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix="lease_nodes_")
+    env = dict(
+        os.environ,
+        SECRET_KEY=os.environ.get("SECRET_KEY", "lease-nodes"),
+        DATABASE_URL=f"sqlite:///{workdir}/app.db",
+        SCHEDULER_NODE_MAX_RUNS=str(args.max_runs),
+        SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS=str(args.spread),
+        PYTHONPATH=str(PROJECT_ROOT)
+    )
+    os.environ.update(env)
+    schedule_ids = create_database(env["DATABASE_URL"], args.schedules)
+
+    start_at = time.time() + 2.0
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable, __file__, "--node-id", f"node-{i}",
+                "--schedule-ids", json.dumps(schedule_ids),
+                "--start-at", str(start_at),
+                "--fires", str(args.fires),
+                "--period", str(args.period),
+                "--duration", str(args.duration)
+            ],
+            cwd=PROJECT_ROOT,
+            env=env,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        for i in range(args.nodes)
+    ]
+
+    runs = []
+    for process in processes:
+        stdout, _ = process.communicate()
+        if process.returncode != 0:
+            print(f"Узел завершился с кодом {process.returncode}", file=sys.stderr)
+            return 1
+        runs.extend(json.loads(line) for line in stdout.splitlines() if line.startswith("{"))
+
+    counts = Counter((run["schedule"], run["fire"]) for run in runs)
+    expected = {(schedule_id, fire) for schedule_id in schedule_ids for fire in range(args.fires)}
+    missing = expected - set(counts)
+    duplicated = [key for key, count in counts.items() if count > 1]
+    per_node = Counter(run["node"] for run in runs)
+
+    print(json.dumps({
+        "expected_runs": len(expected),
+        "runs": len(runs),
+        "missing": len(missing),
+        "duplicated": len(duplicated),
+        "runs_per_node": dict(sorted(per_node.items()))
+    }, ensure_ascii=False, indent=2))
+    return 1 if missing or duplicated else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Проверка аренды расписаний на нескольких процессах")
+    parser.add_argument("--nodes", type=int, default=3, help="Количество узлов (процессов)")
+    parser.add_argument("--schedules", type=int, default=8, help="Количество расписаний")
+    parser.add_argument("--max-runs", type=int, default=2, help="SCHEDULER_NODE_MAX_RUNS каждого узла")
+    parser.add_argument("--fires", type=int, default=3, help="Количество срабатываний каждого расписания")
+    parser.add_argument("--period", type=float, default=6.0, help="Период расписаний, с")
+    parser.add_argument("--duration", type=float, default=1.0, help="Длительность запуска, с")
+    parser.add_argument("--spread", type=float, default=0.2, help="SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS")
+    # Параметры процесса-узла
+    parser.add_argument("--node-id", help=argparse.SUPPRESS)
+    parser.add_argument("--schedule-ids", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.node_id:
+        node_main(args)
+        return
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Настройки приложения читаются при импорте app, поэтому окружение задается до него
+_workdir = tempfile.mkdtemp(prefix="backup-sheets-tests-")
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/app.db"
+os.environ["CREDENTIALS_DIR"] = os.path.join(_workdir, "credentials")
+os.environ["DB_WRITER_ENABLED"] = "false"
+
+from app.db.base import Base  # noqa: E402
+from app.db.session import engine, SessionLocal  # noqa: E402
+from app.models.sheet import Sheet  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """
+    Сессия чистой базы данных теста
+    """
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def make_sheet(db):
+    """
+    Создает таблицу в базе данных
+    """
+    def make(name: str = "Таблица", **fields) -> Sheet:
+        sheet = Sheet(name=name, spreadsheet_id=f"spreadsheet-{name}", created_at=datetime.utcnow(), **fields)
+        db.add(sheet)
+        db.commit()
+        return sheet
+    return make
+
+
+@pytest.fixture
+def make_backup(db):
+    """
+    Создает запись о бэкапе с копией в хранилище
+    """
+    from app.models.backup import Backup
+    from app.models.backup_location import BackupLocation
+    from app.services.backup_persistence import location_values
+
+    def make(sheet: Sheet, file_path: str = None, created_at: datetime = None, **fields) -> Backup:
+        created_at = created_at or datetime.utcnow()
+        backup = Backup(
+            sheet_id=sheet.id,
+            filename=os.path.basename(file_path or "backup.xlsx"),
+            file_path=file_path or f"/backups/{created_at.isoformat()}.xlsx",
+            size=fields.pop("size", 10),
+            status=fields.pop("status", "completed"),
+            storage_type=fields.pop("storage_type", "local"),
+            created_at=created_at,
+            **fields
+        )
+        backup.locations = [BackupLocation(**location_values(
+            {"storage_type": backup.storage_type, "file_path": backup.file_path, "size": backup.size},
+            created_at
+        ))]
+        db.add(backup)
+        db.commit()
+        return backup
+    return make
+
+
+@pytest.fixture
+def make_schedule(db):
+    """
+    Создает расписание для таблиц
+    """
+    from app.models.schedule import Schedule
+
+    def make(sheets, schedule_type: str = "interval", schedule_config: dict = None, **fields) -> Schedule:
+        schedule = Schedule(
+            sheets_ids=[sheet.id for sheet in sheets],
+            schedule_type=schedule_type,
+            schedule_config=schedule_config or {"interval": {"days": 1}},
+            storage_configs=[{"type": "local"}],
+            **fields
+        )
+        db.add(schedule)
+        db.commit()
+        return schedule
+    return make
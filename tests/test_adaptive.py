@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.adaptive_service import (
+    compute_change_state,
+    get_adaptive_bounds,
+    load_schedule_states,
+    next_interval,
+    record_schedule_backups,
+    select_due_sheets,
+)
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.mark.parametrize("current, changed, expected", [
+    (None, False, 10),
+    (None, True, 10),
+    (40, True, 20),
+    (40, False, 80),
+    (15, True, 10),
+    (100, False, 120),
+    (500, True, 120),
+])
+def test_next_interval_halves_doubles_and_clamps(current, changed, expected):
+    assert next_interval(current, changed, 10, 120) == expected
+
+
+def test_bounds_default_and_never_invert():
+    assert get_adaptive_bounds({}) == (settings.ADAPTIVE_MIN_INTERVAL_MINUTES, settings.ADAPTIVE_MAX_INTERVAL_MINUTES)
+    assert get_adaptive_bounds({"adaptive": {"min_minutes": 90, "max_minutes": 30}}) == (90, 90)
+    assert get_adaptive_bounds({"adaptive": {"min_minutes": 0}})[0] >= 1
+
+
+def test_change_state_without_hash_is_empty():
+    assert compute_change_state("a", 40, None, NOW) == {}
+    assert compute_change_state("a", 40, "a", NOW, 10, 120) == {"last_content_hash": "a", "change_interval_minutes": 80}
+    assert compute_change_state("a", 40, "b", NOW, 10, 120) == {
+        "last_content_hash": "b", "change_interval_minutes": 20, "last_changed_at": NOW
+    }
+
+
+def test_select_due_sheets_uses_interval_within_bounds(make_sheet):
+    config = {"adaptive": {"min_minutes": 10, "max_minutes": 120}}
+    new = make_sheet("Новая")
+    recent = make_sheet("Недавняя", last_backup=NOW - timedelta(minutes=30), change_interval_minutes=60)
+    drifted = make_sheet("Дрейф", last_backup=NOW - timedelta(minutes=59, seconds=30), change_interval_minutes=60)
+    clamped = make_sheet("Сверх границы", last_backup=NOW - timedelta(minutes=121), change_interval_minutes=1000)
+
+    due = select_due_sheets([new, recent, drifted, clamped], config, now=NOW)
+
+    # Без истории - бэкап сразу; в пределах допуска (1/10 минимума) - тоже
+    assert [sheet.name for sheet in due] == ["Новая", "Дрейф", "Сверх границы"]
+
+
+def test_schedules_sharing_a_sheet_keep_separate_intervals(db, make_sheet, make_schedule):
+    sheet = make_sheet(last_backup=NOW, change_interval_minutes=10)
+    fast = make_schedule([sheet], schedule_type="adaptive", schedule_config={"adaptive": {"min_minutes": 10, "max_minutes": 40}})
+    slow = make_schedule([sheet], schedule_type="adaptive", schedule_config={"adaptive": {"min_minutes": 60, "max_minutes": 480}})
+    unchanged = [{"sheet_id": sheet.id, "success": True, "content_hash": "same"}]
+
+    for _ in range(3):
+        record_schedule_backups(db, fast, unchanged)
+    record_schedule_backups(db, slow, unchanged)
+    record_schedule_backups(db, slow, [{"sheet_id": sheet.id, "success": False, "content_hash": "other"}])
+
+    fast_state = load_schedule_states(db, fast.id, [sheet.id])[sheet.id]
+    slow_state = load_schedule_states(db, slow.id, [sheet.id])[sheet.id]
+    assert fast_state.change_interval_minutes == 40
+    assert slow_state.change_interval_minutes == 60
+    # История самой таблицы не меняется расписаниями
+    db.refresh(sheet)
+    assert sheet.change_interval_minutes == 10
+
+    later = fast_state.last_backup + timedelta(minutes=45)
+    for schedule, expected in ((fast, [sheet.id]), (slow, [])):
+        states = load_schedule_states(db, schedule.id, [sheet.id])
+        due = select_due_sheets([sheet], schedule.schedule_config, states, now=later)
+        assert [due_sheet.id for due_sheet in due] == expected
+
+
+def test_non_adaptive_schedule_is_not_recorded(db, make_sheet, make_schedule):
+    sheet = make_sheet()
+    schedule = make_schedule([sheet])
+
+    record_schedule_backups(db, schedule, [{"sheet_id": sheet.id, "success": True, "content_hash": "a"}])
+
+    assert load_schedule_states(db, schedule.id, [sheet.id]) == {}
@@ -0,0 +1,147 @@
+import threading
+
+import pytest
+
+from app.services import backup_service
+from app.services.backup_coalescer import BackupCoalescer
+from app.services.backup_service import BackupResult
+
+LOCAL = {"storage_type": "local", "storage_params": {"path": "/backups/a"}}
+OTHER_LOCAL = {"storage_type": "local", "storage_params": {"path": "/backups/b"}}
+
+
+class FakeExport:
+    """
+    Подмена backup_sheet_by_id: записывает вызовы и сохраняет файл в каждое переданное хранилище
+    """
+    def __init__(self):
+        self.calls = []
+        # Сколько следующих вызовов завершатся ошибкой
+        self.failures = 0
+
+    def __call__(self, spreadsheet_id, sheet_name, storage_configs, **kwargs):
+        self.calls.append((spreadsheet_id, [config["storage_params"]["path"] for config in storage_configs]))
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("export failed")
+        storage_results = [
+            {
+                "storage_type": config["storage_type"],
+                "storage_params": config["storage_params"],
+                "file_path": f"{config['storage_params']['path']}/{spreadsheet_id}.xlsx",
+                "size": 10
+            }
+            for config in storage_configs
+        ]
+        first = storage_results[0]
+        return BackupResult(
+            filename=f"{spreadsheet_id}.xlsx",
+            file_path=first["file_path"],
+            size=first["size"],
+            status="completed",
+            storage_type=first["storage_type"],
+            backup_metadata={},
+            storage_params=first["storage_params"],
+            storage_results=storage_results
+        )
+
+
+@pytest.fixture
+def export(monkeypatch):
+    fake = FakeExport()
+    monkeypatch.setattr(backup_service, "backup_sheet_by_id", fake)
+    return fake
+
+
+def sheet(spreadsheet_id="spreadsheet", credentials_id=None, sheet_id=None):
+    return {"id": sheet_id or spreadsheet_id, "name": spreadsheet_id, "spreadsheet_id": spreadsheet_id, "credentials_id": credentials_id}
+
+
+def backup_in_thread(run, spreadsheet_id="spreadsheet", **kwargs):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(run.backup(spreadsheet_id, spreadsheet_id, **kwargs)))
+    thread.start()
+    return thread, results
+
+
+def test_joined_run_shares_owner_export(export):
+    coalescer = BackupCoalescer()
+    owner = coalescer.register([sheet()], [LOCAL])
+    joined = coalescer.register([sheet()], [OTHER_LOCAL])
+
+    thread, joined_results = backup_in_thread(joined)
+    owner_result = owner.backup("spreadsheet", "spreadsheet")
+    thread.join(timeout=5)
+
+    assert export.calls == [("spreadsheet", ["/backups/a", "/backups/b"])]
+    assert owner_result.file_path == "/backups/a/spreadsheet.xlsx"
+    assert [r["file_path"] for r in owner_result.storage_results] == ["/backups/a/spreadsheet.xlsx"]
+    assert joined_results[0].file_path == "/backups/b/spreadsheet.xlsx"
+    assert [r["file_path"] for r in joined_results[0].storage_results] == ["/backups/b/spreadsheet.xlsx"]
+
+
+def test_run_registered_after_export_started_exports_separately(export):
+    coalescer = BackupCoalescer()
+    owner = coalescer.register([sheet()], [LOCAL])
+    owner.backup("spreadsheet", "spreadsheet")
+
+    late = coalescer.register([sheet()], [OTHER_LOCAL])
+    late.backup("spreadsheet", "spreadsheet")
+
+    assert export.calls == [("spreadsheet", ["/backups/a"]), ("spreadsheet", ["/backups/b"])]
+
+
+def test_different_accounts_and_segment_bases_are_not_joined(export):
+    coalescer = BackupCoalescer()
+    first = coalescer.register([sheet(credentials_id="first")], [LOCAL])
+    second = coalescer.register([sheet(credentials_id="second")], [OTHER_LOCAL])
+    base = {"backup_id": "base"}
+    segment = coalescer.register([sheet(credentials_id="first")], [OTHER_LOCAL], incremental_bases={"spreadsheet": base})
+
+    assert not set(first.exports) & set(second.exports)
+    assert not set(first.exports) & set(segment.exports)
+
+    first.backup("spreadsheet", "spreadsheet", credentials_id="first")
+    second.backup("spreadsheet", "spreadsheet", credentials_id="second")
+    segment.backup("spreadsheet", "spreadsheet", credentials_id="first", incremental_base=base)
+
+    assert len(export.calls) == 3
+
+
+def test_joined_run_exports_itself_when_owner_fails(export):
+    coalescer = BackupCoalescer()
+    owner = coalescer.register([sheet()], [LOCAL])
+    joined = coalescer.register([sheet()], [OTHER_LOCAL])
+
+    export.failures = 1
+    thread, joined_results = backup_in_thread(joined)
+    owner_result = owner.backup("spreadsheet", "spreadsheet")
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert export.calls[0] == ("spreadsheet", ["/backups/a", "/backups/b"])
+    assert sorted(export.calls[1:]) == [("spreadsheet", ["/backups/a"]), ("spreadsheet", ["/backups/b"])]
+    assert owner_result.file_path == "/backups/a/spreadsheet.xlsx"
+    assert joined_results[0].file_path == "/backups/b/spreadsheet.xlsx"
+
+
+def test_closed_owner_does_not_leave_joined_run_waiting(export):
+    coalescer = BackupCoalescer()
+    owner = coalescer.register([sheet()], [LOCAL])
+    joined = coalescer.register([sheet()], [OTHER_LOCAL])
+
+    thread, joined_results = backup_in_thread(joined)
+    owner.close()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert export.calls == [("spreadsheet", ["/backups/b"])]
+    assert joined_results[0].file_path == "/backups/b/spreadsheet.xlsx"
+
+
+def test_owned_sheets_are_backed_up_first():
+    coalescer = BackupCoalescer()
+    coalescer.register([sheet("shared")], [LOCAL])
+    run = coalescer.register([sheet("shared"), sheet("own")], [OTHER_LOCAL])
+
+    assert [s["spreadsheet_id"] for s in run.ordered([sheet("shared"), sheet("own")])] == ["own", "shared"]
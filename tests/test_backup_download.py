@@ -0,0 +1,78 @@
+import io
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.api_v1.endpoints import backups
+from app.api.deps import get_db
+
+
+class RemoteStorage:
+    def __init__(self):
+        self.requested = []
+
+    def get(self, file_path):
+        self.requested.append(file_path)
+        return io.BytesIO(b"remote content")
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(backups.router, prefix="/backups")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+@pytest.fixture
+def created_temp_files(monkeypatch):
+    paths = []
+    remove_temp_files = backups.remove_temp_files
+
+    def tracking_remove(temp_paths):
+        paths.extend(temp_paths)
+        remove_temp_files(temp_paths)
+
+    monkeypatch.setattr(backups, "remove_temp_files", tracking_remove)
+    return paths
+
+
+def test_remote_download_uses_unique_temp_file_and_removes_it(client, make_sheet, make_backup, monkeypatch, created_temp_files):
+    storage = RemoteStorage()
+    monkeypatch.setattr(backups, "resolve_storage", lambda *args: storage)
+    backup = make_backup(make_sheet(), file_path="remote-id", storage_type="bitrix")
+
+    first = client.get(f"/backups/{backup.id}/download")
+    second = client.get(f"/backups/{backup.id}/download")
+
+    assert first.content == second.content == b"remote content"
+    assert len(created_temp_files) == 2
+    assert len(set(created_temp_files)) == 2
+    assert not any(os.path.exists(path) for path in created_temp_files)
+
+
+def test_failed_download_removes_temp_files(client, make_sheet, make_backup, monkeypatch, created_temp_files):
+    monkeypatch.setattr(backups, "write_full_snapshot", lambda db, backup_id, out: False)
+    sheet = make_sheet()
+    parent = make_backup(sheet, file_path="/backups/full.ndjson.zip")
+    segment = make_backup(sheet, file_path="/backups/segment_inc.ndjson.zip", parent_backup_id=parent.id)
+
+    response = client.get(f"/backups/{segment.id}/download")
+
+    assert response.status_code == 404
+    assert len(created_temp_files) == 1
+    assert not os.path.exists(created_temp_files[0])
+
+
+def test_local_copy_is_not_removed(client, make_sheet, make_backup, tmp_path, created_temp_files):
+    local_file = tmp_path / "backup.xlsx"
+    local_file.write_bytes(b"local content")
+    backup = make_backup(make_sheet(), file_path=str(local_file))
+
+    response = client.get(f"/backups/{backup.id}/download")
+
+    assert response.content == b"local content"
+    assert created_temp_files == []
+    assert local_file.exists()
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.api_v1.endpoints import backups
+from app.models.backup_location import BackupLocation
+
+CREATED_AT = datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(backups.router, prefix="/backups")
+    with TestClient(app) as client:
+        yield client
+
+
+def all_pages(client, limit, **params):
+    ids, cursors = [], []
+    cursor = None
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/backups/page", params=query)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, cursors
+        cursors.append(cursor)
+
+
+def test_pages_walk_rows_with_equal_created_at(client, make_sheet, make_backup):
+    sheet = make_sheet()
+    tied = [make_backup(sheet, created_at=CREATED_AT) for _ in range(5)]
+    newer = make_backup(sheet, created_at=CREATED_AT + timedelta(seconds=1))
+    older = make_backup(sheet, created_at=CREATED_AT - timedelta(seconds=1))
+    expected = [newer.id] + sorted((backup.id for backup in tied), reverse=True) + [older.id]
+
+    for limit in (1, 2, 3, 7):
+        ids, cursors = all_pages(client, limit)
+        assert ids == expected
+        assert len(cursors) == (len(expected) - 1) // limit
+
+
+def test_cursor_round_trip_keeps_position(client, make_sheet, make_backup):
+    sheet = make_sheet()
+    backups_by_age = [make_backup(sheet, created_at=CREATED_AT - timedelta(minutes=i)) for i in range(3)]
+
+    first = client.get("/backups/page", params={"limit": 1}).json()
+    cursor_created_at, cursor_id = backups._decode_cursor(first["next_cursor"])
+    second = client.get("/backups/page", params={"limit": 1, "cursor": first["next_cursor"]}).json()
+
+    assert (cursor_created_at, cursor_id) == (CREATED_AT, backups_by_age[0].id)
+    assert backups._decode_cursor(backups._encode_cursor(cursor_created_at, cursor_id)) == (cursor_created_at, cursor_id)
+    assert [item["id"] for item in second["items"]] == [backups_by_age[1].id]
+    assert client.get("/backups/page", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_storage_and_integration_filters(client, db, make_sheet, make_backup):
+    sheet = make_sheet()
+    local = make_backup(sheet, created_at=CREATED_AT)
+    bitrix = make_backup(sheet, created_at=CREATED_AT, storage_type="bitrix")
+    both = make_backup(sheet, created_at=CREATED_AT - timedelta(minutes=1))
+    removed = make_backup(sheet, created_at=CREATED_AT - timedelta(minutes=2), storage_type="bitrix")
+    db.add(BackupLocation(
+        backup_id=both.id, storage_type="bitrix", integration_id="7", file_path="bitrix-file",
+        status="stored", kind="backup", created_at=both.created_at
+    ))
+    bitrix.locations[0].integration_id = "7"
+    removed.locations[0].integration_id = "7"
+    removed.locations[0].status = "deleted"
+    db.commit()
+
+    def filtered(**params):
+        return all_pages(client, 1, **params)[0]
+
+    assert filtered(storage_type="local") == [local.id, both.id]
+    assert filtered(storage_type="bitrix") == [bitrix.id, both.id]
+    assert filtered(integration_id="7") == [bitrix.id, both.id]
+    assert filtered(storage_type="local", integration_id="7") == []
+    assert filtered(storage_type="bitrix", created_to=CREATED_AT.isoformat()) == [both.id]
@@ -0,0 +1,101 @@
+import time
+
+from app.models.backup import Backup
+from app.models.backup_location import BackupLocation
+from app.services import backup_persistence
+from app.services.backup_persistence import BackupPersistBuffer
+from app.services.backup_service import BackupResult
+
+
+def make_result(name: str = "backup.xlsx") -> BackupResult:
+    return BackupResult(
+        filename=name,
+        file_path=f"/backups/{name}",
+        size=10,
+        status="completed",
+        storage_type="local",
+        backup_metadata={"content_hash": name},
+        storage_results=[{"storage_type": "local", "file_path": f"/backups/{name}", "size": 10}]
+    )
+
+
+def test_flush_by_size_writes_backups_and_locations(db, make_sheet):
+    sheet = make_sheet()
+    buffer = BackupPersistBuffer(db=db, batch_size=2, flush_seconds=0)
+
+    buffer.add(sheet.id, make_result("a.xlsx"))
+    assert db.query(Backup).count() == 0
+
+    buffer.add(sheet.id, make_result("b.xlsx"))
+    assert db.query(Backup).count() == 2
+    assert db.query(BackupLocation).count() == 2
+    assert buffer.close() == set()
+
+
+def test_timer_flushes_without_new_rows(db, make_sheet):
+    sheet = make_sheet()
+    buffer = BackupPersistBuffer(db=db, batch_size=100, flush_seconds=0.05)
+    buffer.start()
+    try:
+        backup_id = buffer.add(sheet.id, make_result())
+
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and db.get(Backup, backup_id) is None:
+            db.expire_all()
+            time.sleep(0.02)
+        assert db.get(Backup, backup_id) is not None
+    finally:
+        buffer.close()
+
+
+def test_failed_batch_is_retried_one_by_one(db, make_sheet, monkeypatch):
+    sheet = make_sheet()
+    write_backup_rows = backup_persistence.write_backup_rows
+
+    def failing_write(session, rows):
+        if any(row["filename"] == "bad.xlsx" for row in rows):
+            raise RuntimeError("ошибка записи")
+        write_backup_rows(session, rows)
+
+    monkeypatch.setattr(backup_persistence, "write_backup_rows", failing_write)
+    buffer = BackupPersistBuffer(db=db, batch_size=100, flush_seconds=0)
+    good_id = buffer.add(sheet.id, make_result("good.xlsx"))
+    bad_id = buffer.add(sheet.id, make_result("bad.xlsx"))
+
+    assert buffer.close() == {bad_id}
+    assert db.get(Backup, good_id) is not None
+    assert db.get(Backup, bad_id) is None
+
+
+def test_backup_sheets_marks_unpersisted_results_failed(db, make_sheet, monkeypatch):
+    from app.services import backup_service
+
+    sheet = make_sheet()
+
+    class FakeRun:
+        def ordered(self, sheets):
+            return sheets
+
+        def backup(self, *args, **kwargs):
+            return make_result()
+
+        def close(self):
+            pass
+
+    def failing_write(session, rows):
+        raise RuntimeError("ошибка записи")
+
+    monkeypatch.setattr(backup_service.backup_coalescer, "register", lambda *args, **kwargs: FakeRun())
+    monkeypatch.setattr(backup_persistence, "write_backup_rows", failing_write)
+
+    reported = []
+    results = backup_service.backup_sheets(
+        [{"id": sheet.id, "name": sheet.name, "spreadsheet_id": sheet.spreadsheet_id}],
+        [{"type": "local"}],
+        db=db,
+        on_result=lambda result: reported.append(dict(result))
+    )
+
+    assert results[0]["success"] is False
+    assert "не сохранена" in results[0]["error"]
+    assert [result["success"] for result in reported] == [True, False]
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+from app.models.sheet_backup_stats import SheetBackupStats
+from app.services import backup_stats_service
+from app.services.backup_stats_service import apply_backup_inserts, apply_backup_deletes, rebuild_stats
+
+FIELDS = (
+    "total_backups", "successful_backups", "failed_backups", "total_size",
+    "first_backup_date", "last_backup_date", "last_content_hash"
+)
+
+
+def stats_of(db, sheet_id):
+    db.expire_all()
+    stats = db.get(SheetBackupStats, sheet_id)
+    return None if stats is None else {field: getattr(stats, field) for field in FIELDS}
+
+
+def rebuilt_stats_of(db, sheet_id):
+    """
+    Статистика, пересчитанная с нуля по таблице backups (эталон для инкрементальных обновлений)
+    """
+    rebuild_stats(db, sheet_id)
+    db.commit()
+    return stats_of(db, sheet_id)
+
+
+def make_backups(make_backup, sheet, start):
+    return [
+        make_backup(sheet, created_at=start, size=10, backup_metadata={"content_hash": "a"}),
+        make_backup(sheet, created_at=start + timedelta(hours=1), size=20, status="failed"),
+        make_backup(sheet, created_at=start + timedelta(hours=2), size=30, backup_metadata={"content_hash": "c"})
+    ]
+
+
+def test_inserts_in_several_batches_match_full_rebuild(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    first, failed, last = make_backups(make_backup, sheet, datetime(2024, 1, 1))
+
+    # Пачки приходят не по порядку: более старый бэкап не должен сдвигать последнюю дату
+    apply_backup_inserts(db, [last])
+    db.commit()
+    apply_backup_inserts(db, [
+        {"sheet_id": sheet.id, "size": first.size, "status": first.status,
+         "created_at": first.created_at, "backup_metadata": first.backup_metadata},
+        failed
+    ])
+    db.commit()
+
+    stats = stats_of(db, sheet.id)
+    assert stats["total_backups"] == 3
+    assert stats["successful_backups"] == 2
+    assert stats["failed_backups"] == 1
+    assert stats["total_size"] == 60
+    assert stats["first_backup_date"] == first.created_at
+    assert stats["last_backup_date"] == last.created_at
+    assert stats["last_content_hash"] == "c"
+    assert stats == rebuilt_stats_of(db, sheet.id)
+
+
+def test_generic_inserts_match_dialect_upsert(db, make_sheet, make_backup, monkeypatch):
+    monkeypatch.setattr(backup_stats_service, "_upsert_insert", lambda dialect_name: None)
+    sheet = make_sheet()
+    backups = make_backups(make_backup, sheet, datetime(2024, 1, 1))
+
+    apply_backup_inserts(db, backups[2:])
+    db.commit()
+    apply_backup_inserts(db, backups[:2])
+    db.commit()
+
+    assert stats_of(db, sheet.id) == rebuilt_stats_of(db, sheet.id)
+
+
+def test_deleting_boundary_backups_recomputes_period(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    first, failed, last = make_backups(make_backup, sheet, datetime(2024, 1, 1))
+    apply_backup_inserts(db, [first, failed, last])
+    db.commit()
+
+    apply_backup_deletes(db, [first, last])
+    db.delete(first)
+    db.delete(last)
+    db.commit()
+
+    stats = stats_of(db, sheet.id)
+    assert stats["total_backups"] == 1
+    assert stats["failed_backups"] == 1
+    assert stats["total_size"] == 20
+    assert stats["first_backup_date"] == stats["last_backup_date"] == failed.created_at
+    assert stats["last_content_hash"] is None
+    assert stats == rebuilt_stats_of(db, sheet.id)
+
+
+def test_deleting_inner_backup_keeps_period(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    first, failed, last = make_backups(make_backup, sheet, datetime(2024, 1, 1))
+    apply_backup_inserts(db, [first, failed, last])
+    db.commit()
+
+    apply_backup_deletes(db, [failed])
+    db.delete(failed)
+    db.commit()
+
+    stats = stats_of(db, sheet.id)
+    assert stats["total_backups"] == 2
+    assert stats["failed_backups"] == 0
+    assert stats == rebuilt_stats_of(db, sheet.id)
+
+
+def test_deleting_all_backups_removes_stats_row(db, make_sheet, make_backup):
+    sheet, other = make_sheet("Первая"), make_sheet("Вторая")
+    backups = make_backups(make_backup, sheet, datetime(2024, 1, 1))
+    other_backup = make_backup(other, created_at=datetime(2024, 1, 2))
+    apply_backup_inserts(db, backups + [other_backup])
+    db.commit()
+
+    apply_backup_deletes(db, backups)
+    for backup in backups:
+        db.delete(backup)
+    db.commit()
+
+    assert stats_of(db, sheet.id) is None
+    assert stats_of(db, other.id)["total_backups"] == 1
@@ -0,0 +1,82 @@
+import threading
+
+from app.core import cache as cache_module
+from app.core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock.monotonic)
+    cache = TTLCache(ttl_seconds=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get_or_load("key", load) == 1
+    clock.now += 59
+    assert cache.get_or_load("key", load) == 1
+    clock.now += 2
+    assert cache.get_or_load("key", load) == 2
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+
+    # Обращение к first делает вытесняемой запись second
+    assert cache.get_or_load("first", lambda: "reloaded") == 1
+    cache.set("third", 3)
+
+    assert cache.get_or_load("first", lambda: "reloaded") == 1
+    assert cache.get_or_load("second", lambda: "reloaded") == "reloaded"
+
+
+def test_none_is_cached_and_errors_are_not():
+    cache = TTLCache()
+    assert cache.get_or_load("missing", lambda: None) is None
+    assert cache.get_or_load("missing", lambda: "loaded") is None
+
+    def fail():
+        raise RuntimeError("БД недоступна")
+
+    try:
+        cache.get_or_load("broken", fail)
+    except RuntimeError:
+        pass
+    assert cache.get_or_load("broken", lambda: "loaded") == "loaded"
+
+
+def test_value_loaded_before_invalidate_is_not_cached():
+    cache = TTLCache()
+    loading = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def load_old_settings():
+        loading.set()
+        release.wait(5)
+        return "old"
+
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_load("bitrix", load_old_settings)))
+    thread.start()
+    loading.wait(5)
+    # Настройки сохранены, пока загрузка старых еще выполняется
+    cache.invalidate()
+    release.set()
+    thread.join(5)
+
+    assert results == ["old"]
+    assert cache.get_or_load("bitrix", lambda: "new") == "new"
+    assert cache.get_or_load("bitrix", lambda: "other") == "new"
@@ -0,0 +1,83 @@
+import pytest
+
+from app.core import scheduler as scheduler_module
+from app.core.scheduler import scheduler_service
+from app.models.schedule_sheet_state import ScheduleSheetState
+from app.services.changes_service import claim_dirty_sheets, mark_dirty, restore_dirty
+
+
+def claim_ids(db, schedule, sheets):
+    claimed, previous = claim_dirty_sheets(db, schedule.id, sheets)
+    return {sheet.id for sheet in claimed}, previous
+
+
+def test_schedules_sharing_a_sheet_each_get_its_changes(db, make_sheet, make_schedule):
+    sheet = make_sheet()
+    first, second = make_schedule([sheet]), make_schedule([sheet])
+
+    assert claim_ids(db, first, [sheet])[0] == {sheet.id}
+    assert claim_ids(db, second, [sheet])[0] == {sheet.id}
+    assert claim_ids(db, first, [sheet])[0] == set()
+    assert claim_ids(db, second, [sheet])[0] == set()
+
+    mark_dirty(db, [sheet.spreadsheet_id])
+    db.commit()
+    db.refresh(sheet)
+
+    assert claim_ids(db, first, [sheet])[0] == {sheet.id}
+    assert claim_ids(db, second, [sheet])[0] == {sheet.id}
+
+
+def test_restore_returns_changes_to_the_schedule_only(db, make_sheet, make_schedule):
+    sheet = make_sheet()
+    first, second = make_schedule([sheet]), make_schedule([sheet])
+    claim_ids(db, first, [sheet])
+    claim_ids(db, second, [sheet])
+
+    mark_dirty(db, [sheet.spreadsheet_id])
+    db.commit()
+    db.refresh(sheet)
+    _, previous = claim_ids(db, first, [sheet])
+    claim_ids(db, second, [sheet])
+
+    restore_dirty(db, first.id, previous)
+
+    assert claim_ids(db, first, [sheet])[0] == {sheet.id}
+    assert claim_ids(db, second, [sheet])[0] == set()
+
+
+@pytest.fixture
+def job(db, make_sheet, make_schedule, monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "DRIVE_CHANGES_ENABLED", True)
+    sheet = make_sheet()
+    schedule = make_schedule([sheet])
+    job_id = scheduler_service.add_multi_sheet_schedule(schedule, db)
+    func = scheduler_service.scheduler.get_job(job_id).func
+    yield lambda: func(schedule.id), schedule.id, sheet.id
+    scheduler_service.scheduler.remove_job(job_id)
+
+
+def test_job_restores_claimed_changes_when_backup_raises(db, job, monkeypatch):
+    run, schedule_id, sheet_id = job
+
+    def failing_backup(**kwargs):
+        raise RuntimeError("сбой экспорта")
+
+    monkeypatch.setattr(scheduler_module, "backup_sheets", failing_backup)
+    run()
+
+    state = db.get(ScheduleSheetState, (schedule_id, sheet_id))
+    assert state is not None
+    assert state.changes_seen_at is None
+
+
+def test_job_keeps_claim_after_successful_backup(db, job, monkeypatch):
+    run, schedule_id, sheet_id = job
+    monkeypatch.setattr(
+        scheduler_module, "backup_sheets",
+        lambda sheets, **kwargs: [{"sheet_id": sheet["id"], "success": True} for sheet in sheets]
+    )
+    run()
+
+    state = db.get(ScheduleSheetState, (schedule_id, sheet_id))
+    assert state.changes_seen_at is not None
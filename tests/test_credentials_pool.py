@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.api_v1.endpoints import sheets
+from app.api.deps import get_db
+from app.services import credentials_pool as pool_module
+from app.services.credentials_pool import CredentialsPool
+
+
+class FakeAccount:
+    def __init__(self, account_id, path, rate_per_second, cooldown_seconds):
+        self.id = account_id
+        self.healthy = True
+        self.last_used_at = 0.0
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool_module, "ServiceAccount", FakeAccount)
+    for account_id in ("first", "second"):
+        (tmp_path / f"{account_id}.json").write_text("{}")
+    return CredentialsPool(tmp_path)
+
+
+def test_pinned_account_is_used(pool):
+    assert pool.get("second").id == "second"
+    assert pool.get("second").id == "second"
+
+
+def test_unknown_account_falls_back_to_least_used(pool, caplog):
+    assert pool.get().id == "first"
+
+    account = pool.get("removed")
+
+    assert account.id == "second"
+    assert "removed" in caplog.text
+
+
+def test_has(pool):
+    assert pool.has("first")
+    assert not pool.has("removed")
+
+
+@pytest.fixture
+def client(db, pool, monkeypatch):
+    monkeypatch.setattr(sheets, "credentials_pool", pool)
+    app = FastAPI()
+    app.include_router(sheets.router, prefix="/sheets")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def test_create_sheet_rejects_unknown_account(client):
+    response = client.post("/sheets/", json={"name": "Отчет", "spreadsheet_id": "abc", "credentials_id": "removed"})
+
+    assert response.status_code == 400
+    assert "first, second" in response.json()["detail"]
+
+
+def test_update_sheet_rejects_unknown_account(client, make_sheet):
+    sheet = make_sheet(credentials_id="first")
+
+    rejected = client.put(f"/sheets/{sheet.id}", json={"credentials_id": "removed"})
+    accepted = client.put(f"/sheets/{sheet.id}", json={"credentials_id": "second"})
+
+    assert rejected.status_code == 400
+    assert accepted.status_code == 200
+    assert accepted.json()["credentials_id"] == "second"
+
+
+class FakeCredentials:
+    service_account_email = "backup@example.iam.gserviceaccount.com"
+
+
+@pytest.fixture
+def account(tmp_path, monkeypatch):
+    from google.oauth2 import service_account
+
+    monkeypatch.setattr(
+        service_account.Credentials,
+        "from_service_account_file",
+        classmethod(lambda cls, path, scopes: FakeCredentials())
+    )
+    return pool_module.ServiceAccount("first", tmp_path / "first.json", rate_per_second=10, cooldown_seconds=60)
+
+
+def google_error(status_code, reason, status):
+    return json.dumps({"error": {
+        "code": status_code,
+        "status": status,
+        "errors": [{"reason": reason}]
+    }}).encode()
+
+
+def test_permission_denied_does_not_pause_account(account):
+    account.record_error("Нет доступа", 403, google_error(403, "forbidden", "PERMISSION_DENIED"))
+    account.record_error("Код ответа ленты изменений: 403", 403, b"<html>Forbidden</html>")
+    account.record_error("Код ответа экспорта: 403", 403)
+
+    assert account.cooldown_until == 0.0
+    assert account.healthy
+    assert account.errors == 3
+    assert account.quota_errors == 0
+
+
+@pytest.mark.parametrize("status_code, body", [
+    (429, None),
+    (403, google_error(403, "rateLimitExceeded", "PERMISSION_DENIED")),
+    (403, google_error(403, "userRateLimitExceeded", "PERMISSION_DENIED")),
+    (403, json.dumps({"error": {"code": 403, "details": [{"reason": "QUOTA_EXCEEDED"}]}})),
+])
+def test_quota_errors_pause_account(account, status_code, body):
+    account.record_error("Квота", status_code, body)
+
+    assert account.quota_errors == 1
+    assert account.cooldown_until > 0
+    assert not account.healthy
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.db.writer import DBWriter
+from app.models.sheet import Sheet
+
+
+@pytest.fixture
+def writer(db):
+    # Интервал накопления с запасом, чтобы операции теста попали в одну пачку
+    writer = DBWriter(batch_size=3, flush_interval_ms=500)
+    yield writer
+    writer.stop()
+
+
+def add_sheet(name):
+    def operation(session):
+        sheet = Sheet(name=name, spreadsheet_id=f"spreadsheet-{name}", created_at=datetime.utcnow())
+        session.add(sheet)
+        session.flush()
+        return sheet.id
+    return operation
+
+
+def fail(session):
+    raise ValueError("сбой операции")
+
+
+def sheet_names(db):
+    db.expire_all()
+    return sorted(sheet.name for sheet in db.query(Sheet).all())
+
+
+def test_batch_is_committed_once(writer, db):
+    futures = [writer.submit(add_sheet(name)) for name in ("a", "b", "c")]
+
+    assert all(future.result(timeout=5) for future in futures)
+    assert writer.batches == 1
+    assert writer.operations == 3
+    assert sheet_names(db) == ["a", "b", "c"]
+
+
+def test_failed_operation_does_not_cancel_batch(writer, db):
+    first = writer.submit(add_sheet("a"))
+    failed = writer.submit(fail)
+    last = writer.submit(add_sheet("c"))
+
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    assert first.result(timeout=5)
+    assert last.result(timeout=5)
+    # Счетчики пачки обновляются после результатов операций
+    writer.stop()
+    assert writer.batches == 1
+    assert writer.operations == 2
+    assert sheet_names(db) == ["a", "c"]
+
+
+def test_sqlite_pragmas_are_set_on_connect():
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        # NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
@@ -0,0 +1,49 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.api_v1.endpoints import runs, schedules, sheets
+from app.api.deps import get_db
+from app.core.executor import blocking_executor
+from app.models.sheet import Sheet
+
+
+def make_client(db):
+    app = FastAPI()
+    app.include_router(sheets.router, prefix="/sheets")
+    app.include_router(schedules.router, prefix="/schedules")
+    app.include_router(runs.router, prefix="/runs")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def completed():
+    return blocking_executor.stats()["completed"]
+
+
+def test_sync_endpoints_run_in_blocking_pool(db, make_sheet):
+    client = make_client(db)
+    sheet = make_sheet()
+    sheet_id = sheet.id
+
+    calls = [
+        lambda: client.put(f"/sheets/{sheet_id}", json={"name": "Новое имя"}),
+        lambda: client.get("/schedules/planner"),
+        lambda: client.get("/runs/"),
+        lambda: client.get("/runs/missing"),
+        lambda: client.delete(f"/sheets/{sheet_id}"),
+    ]
+    statuses = []
+    for call in calls:
+        before = completed()
+        statuses.append(call().status_code)
+        assert completed() > before
+
+    assert statuses == [200, 200, 200, 404, 204]
+    db.expire_all()
+    assert db.get(Sheet, sheet_id) is None
+
+
+def test_missing_sheet_update_returns_404(db):
+    response = make_client(db).put("/sheets/missing", json={"name": "Имя"})
+
+    assert response.status_code == 404
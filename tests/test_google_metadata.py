@@ -0,0 +1,72 @@
+import pytest
+
+from app.services import google_service as google_module
+from app.services.google_service import GoogleService
+
+
+class FakeRequests:
+    def get(self, spreadsheetId, fields):
+        return {"spreadsheetId": spreadsheetId, "fields": fields}
+
+
+class FakeSheetsService:
+    def spreadsheets(self):
+        return FakeRequests()
+
+
+class FakeAccount:
+    sheets_service = FakeSheetsService()
+
+
+class FakePool:
+    def get(self, credentials_id=None):
+        return FakeAccount()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    google_module.metadata_cache.invalidate()
+    service = GoogleService(FakePool())
+    service.calls = []
+    service.fail = False
+
+    def execute(account, request):
+        service.calls.append(request["fields"])
+        if service.fail:
+            raise RuntimeError("403 нет доступа")
+        title = f"Таблица {len(service.calls)}"
+        return {
+            "spreadsheetId": request["spreadsheetId"],
+            "spreadsheetUrl": "https://docs.google.com/spreadsheets/d/abc",
+            "properties": {"title": title},
+            "sheets": [{"properties": {"title": f"Лист {len(service.calls)}", "sheetId": len(service.calls)}}]
+        }
+
+    monkeypatch.setattr(service, "_execute", execute)
+    yield service
+    google_module.metadata_cache.invalidate()
+
+
+def test_title_is_cached(service):
+    first = service.get_sheet_title("abc")
+    second = service.get_sheet_title("abc")
+
+    assert first == second
+    assert len(service.calls) == 1
+
+
+def test_tabs_are_always_requested(service):
+    first = service.get_sheet_tabs("abc")
+    second = service.get_sheet_tabs("abc")
+
+    assert first != second
+    assert len(service.calls) == 2
+
+
+def test_failures_are_not_cached(service):
+    service.fail = True
+    assert service.get_sheet_title("abc") is None
+    assert google_module.metadata_cache.stats()["entries"] == 0
+
+    service.fail = False
+    assert service.get_sheet_title("abc")["title"] == "Таблица 2"
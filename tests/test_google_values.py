@@ -0,0 +1,117 @@
+import re
+
+import pytest
+
+from app.core.config import settings
+from app.services.google_service import GoogleService, pack_ranges, sheet_ranges
+
+RANGE_PATTERN = re.compile(r"^'(?P<title>.+)'!A(?P<start>\d+):[A-Z]+(?P<end>\d+)$")
+
+
+def value_range(title, cells):
+    return {"title": title, "cells": cells}
+
+
+def test_pack_ranges_respects_cell_limit():
+    ranges = [value_range("a", 4), value_range("b", 4), value_range("c", 2), value_range("d", 9), value_range("e", 1), value_range("f", 1)]
+
+    batches = pack_ranges(ranges, max_cells=10)
+
+    assert [[item["title"] for item in batch] for batch in batches] == [["a", "b", "c"], ["d", "e"], ["f"]]
+
+
+def test_pack_ranges_keeps_oversized_range_alone():
+    batches = pack_ranges([value_range("a", 15), value_range("b", 1)], max_cells=10)
+
+    assert [[item["title"] for item in batch] for batch in batches] == [["a"], ["b"]]
+    assert pack_ranges([], max_cells=10) == []
+
+
+def test_sheet_ranges_split_rows_into_windows():
+    grid = [
+        {"title": "Лист '1'", "row_count": 7, "column_count": 2},
+        {"title": "Пустой", "row_count": 0, "column_count": 5},
+        {"title": "Журнал", "row_count": 5, "column_count": 1, "start_row": 4}
+    ]
+
+    ranges = sheet_ranges(grid, max_cells=6)
+
+    assert [item["range"] for item in ranges] == [
+        "'Лист ''1'''!A1:B3", "'Лист ''1'''!A4:B6", "'Лист ''1'''!A7:B7", "'Журнал'!A4:A5"
+    ]
+    assert [item["cells"] for item in ranges] == [6, 6, 2, 2]
+
+
+class FakeAccount:
+    id = "first"
+
+
+class FakePool:
+    def get(self, credentials_id=None):
+        return FakeAccount()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """
+    Сервис с таблицей в памяти; batchGet, как и API, не возвращает пустые строки в конце диапазона
+    """
+    service = GoogleService(FakePool())
+    service.sheets = {}
+    service.requests = []
+
+    def get_sheet_grid(spreadsheet_id, credentials_id=None):
+        return [
+            {"title": title, "row_count": len(rows), "column_count": 2}
+            for title, rows in service.sheets.items()
+        ]
+
+    def batch_get(account, spreadsheet_id, batch):
+        service.requests.append([item["range"] for item in batch])
+        values_list = []
+        for item in batch:
+            match = RANGE_PATTERN.match(item["range"])
+            rows = service.sheets[match["title"]][int(match["start"]) - 1:int(match["end"])]
+            while rows and not rows[-1]:
+                rows = rows[:-1]
+            values_list.append(rows)
+        return values_list
+
+    monkeypatch.setattr(service, "get_sheet_grid", get_sheet_grid)
+    monkeypatch.setattr(service, "_batch_get", batch_get)
+    # Окно в 2 строки по 2 столбца, по одному окну в запросе
+    monkeypatch.setattr(settings, "GOOGLE_VALUES_MAX_CELLS_PER_REQUEST", 4)
+    return service
+
+
+def test_short_windows_keep_row_positions(service):
+    service.sheets["Лист"] = [
+        ["a", 1], [],
+        [], [],
+        ["b", 2], [],
+        [], ["c"],
+        [], []
+    ]
+
+    result = service.get_sheet_values_by_sheets("abc")
+
+    assert len(service.requests) == 5
+    assert result == {"Лист": [["a", 1], [], [], [], ["b", 2], [], [], ["c"]]}
+
+
+def test_empty_sheet_and_empty_leading_windows(service):
+    service.sheets["Пустой"] = [[], [], []]
+    service.sheets["Хвост"] = [[], [], [], [], ["x"]]
+
+    result = service.get_sheet_values_by_sheets("abc")
+
+    assert result == {"Пустой": [], "Хвост": [[], [], [], [], ["x"]]}
+
+
+def test_short_windows_with_start_rows(service):
+    service.sheets["Журнал"] = [["old"], ["old"], ["new"], [], [], [], ["last"]]
+
+    result = service.get_sheet_values_by_sheets("abc", start_rows={"Журнал": 3})
+
+    assert service.requests[0] == ["'Журнал'!A3:B4"]
+    assert result == {"Журнал": [["new"], [], [], [], ["last"]]}
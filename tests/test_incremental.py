@@ -0,0 +1,121 @@
+import io
+
+import pytest
+
+from app.services import incremental_service
+from app.services.incremental_service import build_segment, find_base, merge_chain, tab_states, write_full_snapshot
+from app.services.snapshot_service import read_snapshot, write_snapshot
+
+TAIL_ROWS = 2
+
+
+class FakeSheets:
+    """
+    Листы таблицы в памяти; чтение с start_rows как у get_sheet_values_by_sheets
+    """
+    def __init__(self, values):
+        self.values = values
+        self.requests = []
+
+    def get_sheet_values_by_sheets(self, spreadsheet_id, credentials_id=None, start_rows=None):
+        self.requests.append(dict(start_rows or {}))
+        return {
+            title: [list(row) for row in rows[(start_rows or {}).get(title, 1) - 1:]]
+            for title, rows in self.values.items()
+        }
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    fake = FakeSheets({
+        "Журнал": [["дата", "сумма"], ["01.01", 1], ["02.01", 2], ["03.01", 3]],
+        "Итоги": [["всего", 6]]
+    })
+    monkeypatch.setattr(incremental_service, "google_service", fake)
+    return fake
+
+
+@pytest.fixture
+def save_snapshot(make_sheet, make_backup, tmp_path):
+    sheet = make_sheet()
+    counter = iter(range(1000))
+
+    def save(values, extra, tab_extra, parent_backup_id=None):
+        path = tmp_path / f"snapshot_{next(counter)}.ndjson.zip"
+        with open(path, "wb") as out:
+            manifest = write_snapshot(values, "ndjson", out, extra=extra, tab_extra=tab_extra)
+        metadata = {"format": "ndjson", "manifest": manifest}
+        if manifest.get("incremental"):
+            metadata["incremental"] = manifest["incremental"]
+        return make_backup(sheet, file_path=str(path), backup_metadata=metadata, parent_backup_id=parent_backup_id)
+
+    save.sheet = sheet
+    return save
+
+
+def full_snapshot(sheets, save_snapshot):
+    values = sheets.get_sheet_values_by_sheets("abc")
+    return save_snapshot(values, {"tail_rows": TAIL_ROWS}, tab_states(values, TAIL_ROWS))
+
+
+def test_segment_reads_only_appended_rows(db, sheets, save_snapshot):
+    full_snapshot(sheets, save_snapshot)
+    sheets.values["Журнал"] += [["04.01", 4], ["05.01", 5]]
+
+    base = find_base(db, save_snapshot.sheet.id, "ndjson")
+    new_values, extra, tab_extra = build_segment("abc", base, None)
+
+    # Каждый лист читается с последних TAIL_ROWS строк основы
+    assert sheets.requests[-1] == {"Журнал": 3, "Итоги": 1}
+    assert new_values == {"Журнал": [["04.01", 4], ["05.01", 5]], "Итоги": []}
+    assert extra["incremental"]["segment"] == 1
+    assert tab_extra["Журнал"]["row_offset"] == 4
+    assert tab_extra["Журнал"]["total_rows"] == 6
+
+
+def test_changed_tail_requires_full_snapshot(db, sheets, save_snapshot):
+    full_snapshot(sheets, save_snapshot)
+    sheets.values["Журнал"][-1] = ["03.01", 30]
+
+    base = find_base(db, save_snapshot.sheet.id, "ndjson")
+
+    assert build_segment("abc", base, None) is None
+
+
+def test_added_tab_requires_full_snapshot(db, sheets, save_snapshot):
+    full_snapshot(sheets, save_snapshot)
+    sheets.values["Новый"] = [["a"]]
+
+    base = find_base(db, save_snapshot.sheet.id, "ndjson")
+
+    assert build_segment("abc", base, None) is None
+
+
+def test_merge_chain_restores_full_sheet(db, sheets, save_snapshot):
+    backup = full_snapshot(sheets, save_snapshot)
+    for day in (4, 5):
+        sheets.values["Журнал"].append([f"0{day}.01", day])
+        base = find_base(db, save_snapshot.sheet.id, "ndjson")
+        backup = save_snapshot(*build_segment("abc", base, None), parent_backup_id=backup.id)
+
+    backup_format, values = merge_chain(db, backup.id)
+
+    assert backup_format == "ndjson"
+    assert values == sheets.values
+
+    out = io.BytesIO()
+    assert write_full_snapshot(db, backup.id, out)
+    out.seek(0)
+    assert read_snapshot(out) == sheets.values
+
+
+def test_merge_chain_fails_when_link_is_missing(db, sheets, save_snapshot, tmp_path):
+    full = full_snapshot(sheets, save_snapshot)
+    sheets.values["Журнал"].append(["04.01", 4])
+    base = find_base(db, save_snapshot.sheet.id, "ndjson")
+    segment = save_snapshot(*build_segment("abc", base, None), parent_backup_id=full.id)
+
+    for path in tmp_path.glob("snapshot_0*"):
+        path.unlink()
+
+    assert merge_chain(db, segment.id) is None
@@ -0,0 +1,96 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.schedule import Schedule
+from app.services.lease_service import LeaseService
+
+
+@pytest.fixture(autouse=True)
+def lease_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_LEASE_CLAIM_SPREAD_SECONDS", 0)
+    monkeypatch.setattr(settings, "SCHEDULER_NODE_MAX_RUNS", 2)
+
+
+def make_node(node_id):
+    node = LeaseService(node_id=node_id, ttl_seconds=60, dedup_seconds=30)
+    node.BUSY_POLL_SECONDS = 0.01
+    return node
+
+
+def lease_of(db, schedule_id):
+    db.expire_all()
+    return db.get(Schedule, schedule_id)
+
+
+def test_only_one_node_claims_a_run(db, make_sheet, make_schedule):
+    schedule = make_schedule([make_sheet()])
+    first, second = make_node("first"), make_node("second")
+
+    assert first.try_claim(schedule.id)
+    assert not second.try_claim(schedule.id)
+    assert lease_of(db, schedule.id).lease_owner == "first"
+    assert (first.active_runs, second.active_runs) == (1, 0)
+
+
+def test_released_run_is_not_repeated_within_dedup_window(db, make_sheet, make_schedule):
+    schedule = make_schedule([make_sheet()])
+    first, second = make_node("first"), make_node("second")
+    assert first.try_claim(schedule.id)
+
+    first.release(schedule.id)
+
+    # Опоздавший узел не повторяет уже выполненный запуск
+    assert not second.try_claim(schedule.id)
+    # Следующее срабатывание (вне окна дедупликации) захватывается
+    assert second.try_claim(schedule.id, dedup_seconds=0)
+    assert lease_of(db, schedule.id).lease_owner == "second"
+    assert first.active_runs == 0
+
+
+def test_expired_lease_is_claimed_as_orphaned(db, make_sheet, make_schedule):
+    schedule = make_schedule([make_sheet()])
+    first, second = make_node("first"), make_node("second")
+    assert first.try_claim(schedule.id)
+    lease_of(db, schedule.id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert second.claim_orphaned() == [schedule.id]
+    assert lease_of(db, schedule.id).lease_owner == "second"
+    assert second.active_runs == 1
+    # Чужую аренду продлить нельзя
+    assert not first.renew(schedule.id)
+
+
+def test_busy_node_skips_run_after_dedup_window(db, make_sheet, make_schedule, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_NODE_MAX_RUNS", 1)
+    busy, other = make_schedule([make_sheet("Первая")]), make_schedule([make_sheet("Вторая")])
+    node = make_node("first")
+    assert node.try_claim(busy.id)
+
+    assert not node.try_claim(other.id, dedup_seconds=0.05)
+    assert node.active_runs == 1
+    assert lease_of(db, other.id).lease_owner is None
+
+
+def test_busy_node_stops_waiting_when_another_node_claims(db, make_sheet, make_schedule, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_NODE_MAX_RUNS", 1)
+    busy, other = make_schedule([make_sheet("Первая")]), make_schedule([make_sheet("Вторая")])
+    node, free_node = make_node("first"), make_node("second")
+    assert node.try_claim(busy.id)
+
+    results = []
+    waiting = threading.Thread(target=lambda: results.append(node.try_claim(other.id, dedup_seconds=10)))
+    started = time.monotonic()
+    waiting.start()
+    time.sleep(0.05)
+    assert free_node.try_claim(other.id, dedup_seconds=0)
+    waiting.join(timeout=5)
+
+    assert results == [False]
+    assert time.monotonic() - started < 5
+    assert lease_of(db, other.id).lease_owner == "second"
+    assert node.active_runs == 1
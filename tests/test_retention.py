@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from app.models.backup import Backup
+from app.models.backup_deletion import BackupDeletion
+from app.services import retention_service as retention_module
+from app.services.retention_service import RetentionService, protect_ancestors, select_victims
+
+
+class FakeStorage:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, file_path):
+        self.deleted.append(file_path)
+        return True
+
+    def get_file_info(self, file_path):
+        return None
+
+
+def make_service():
+    return RetentionService(workers=2, rate_per_second=1000)
+
+
+def test_shared_file_is_kept_while_another_backup_uses_it(db, make_sheet, make_backup, monkeypatch):
+    storage = FakeStorage()
+    monkeypatch.setattr(retention_module.StorageResolver, "resolve", lambda self, *args: storage)
+    first, second = make_sheet("Первая"), make_sheet("Вторая")
+    old = make_backup(first, file_path="/backups/shared.xlsx")
+    make_backup(second, file_path="/backups/shared.xlsx")
+    old_id = old.id
+
+    result = make_service().delete_backups(db, [old])
+
+    assert result["deleted"] == 1
+    assert storage.deleted == []
+    assert db.get(Backup, old_id) is None
+
+
+def test_file_is_deleted_with_its_last_backup(db, make_sheet, make_backup, monkeypatch):
+    storage = FakeStorage()
+    monkeypatch.setattr(retention_module.StorageResolver, "resolve", lambda self, *args: storage)
+    first, second = make_sheet("Первая"), make_sheet("Вторая")
+    backups = [
+        make_backup(first, file_path="/backups/shared.xlsx"),
+        make_backup(second, file_path="/backups/shared.xlsx")
+    ]
+
+    result = make_service().delete_backups(db, backups)
+
+    assert result["deleted"] == 2
+    assert set(storage.deleted) == {"/backups/shared.xlsx"}
+    assert db.query(BackupDeletion).count() == 0
+
+
+def test_storage_setup_error_fails_only_its_deletion(db, make_sheet, make_backup, monkeypatch):
+    storage = FakeStorage()
+
+    def resolve(self, storage_type, storage_params=None):
+        if storage_type == "bitrix":
+            raise RuntimeError("интеграция недоступна")
+        return storage
+
+    monkeypatch.setattr(retention_module.StorageResolver, "resolve", resolve)
+    sheet = make_sheet()
+    broken = make_backup(sheet, file_path="bitrix-file", storage_type="bitrix")
+    local = make_backup(sheet, file_path="/backups/local.xlsx")
+
+    result = make_service().delete_backups(db, [broken, local])
+
+    assert result["deleted"] == 1
+    assert result["failed"] == 1
+    # Журнал хранит только незавершенные удаления
+    assert db.query(BackupDeletion).count() == 1
+    deletion = db.query(BackupDeletion).filter(BackupDeletion.backup_id == broken.id).one()
+    assert deletion.status == "failed"
+    assert "интеграция недоступна" in deletion.error
+    assert db.get(Backup, broken.id) is not None
+    assert storage.deleted == ["/backups/local.xlsx"]
+
+
+def test_protect_ancestors_keeps_chain_of_kept_segment(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    start = datetime(2026, 1, 1)
+    full = make_backup(sheet, created_at=start)
+    segment = make_backup(sheet, created_at=start + timedelta(hours=1), parent_backup_id=full.id)
+    kept = make_backup(sheet, created_at=start + timedelta(hours=2), parent_backup_id=segment.id)
+    unrelated = make_backup(sheet, created_at=start - timedelta(days=1))
+
+    allowed = protect_ancestors(db, [sheet.id], [full, segment, unrelated])
+
+    assert {backup.id for backup in allowed} == {unrelated.id}
+    assert kept.id not in {backup.id for backup in allowed}
+
+
+def test_protect_ancestors_allows_whole_chain_when_deleted_together(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    start = datetime(2026, 1, 1)
+    full = make_backup(sheet, created_at=start)
+    segment = make_backup(sheet, created_at=start + timedelta(hours=1), parent_backup_id=full.id)
+
+    allowed = protect_ancestors(db, [sheet.id], [full, segment])
+
+    assert {backup.id for backup in allowed} == {full.id, segment.id}
+
+
+def test_purge_migration_removes_completed_journal_rows(db):
+    from app.db.migrations import _purge_completed_deletions
+    from app.db.session import engine
+
+    for status in ("completed", "failed"):
+        db.add(BackupDeletion(backup_id=f"backup-{status}", sheet_id="sheet", locations=[], status=status))
+    db.commit()
+
+    _purge_completed_deletions(engine)
+
+    assert [deletion.backup_id for deletion in db.query(BackupDeletion)] == ["backup-failed"]
+
+
+def test_weekly_tier_keeps_week_across_year_boundary_whole(db, make_sheet, make_backup):
+    sheet = make_sheet()
+    previous_week = make_backup(sheet, created_at=datetime(2024, 12, 23, 12))
+    monday = make_backup(sheet, created_at=datetime(2024, 12, 30, 12))
+    new_year = make_backup(sheet, created_at=datetime(2025, 1, 1, 12))
+
+    victims = select_victims(db, [sheet.id], {"keep_weekly": 2})
+
+    # 30 декабря и 1 января - одна неделя (как в date_trunc('week') PostgreSQL)
+    assert [victim.id for victim in victims] == [monday.id]
+    assert {previous_week.id, new_year.id}.isdisjoint(victim.id for victim in victims)
@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.scheduler import scheduler_service
+from app.db.session import engine
+
+
+@pytest.fixture
+def synced_jobs():
+    yield
+    for job in scheduler_service.scheduler.get_jobs():
+        if job.id.startswith("backup_"):
+            scheduler_service.scheduler.remove_job(job.id)
+    scheduler_service._schedule_versions.clear()
+
+
+def test_sync_uses_own_session_per_call(db, make_sheet, make_schedule, synced_jobs):
+    schedule = make_schedule([make_sheet()])
+    job_id = f"backup_{schedule.id}"
+    checked_out = engine.pool.checkedout()
+
+    scheduler_service.sync_schedules()
+
+    assert scheduler_service.scheduler.get_job(job_id) is not None
+    # Соединение сессии синхронизации возвращено в пул
+    assert engine.pool.checkedout() <= checked_out
+
+    schedule.is_active = False
+    db.commit()
+    scheduler_service.sync_schedules()
+
+    assert scheduler_service.scheduler.get_job(job_id) is None
+    assert engine.pool.checkedout() <= checked_out
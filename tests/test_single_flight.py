@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight, backup_flight_key
+
+
+def test_concurrent_calls_join_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "backup-id"
+
+        callers = [asyncio.create_task(flights.do("key", work, description="Таблица")) for _ in range(3)]
+        await asyncio.sleep(0)
+        state = flights.list_flights()
+        release.set()
+        results = await asyncio.gather(*callers)
+        return calls, state, results, flights.list_flights()
+
+    calls, state, results, after = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert results == ["backup-id"] * 3
+    assert [(flight["key"], flight["waiters"], flight["description"]) for flight in state] == [("key", 2, "Таблица")]
+    assert after == []
+
+
+def test_error_is_shared_and_next_call_runs_again():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def failing():
+            calls.append("failing")
+            await release.wait()
+            raise RuntimeError("export failed")
+
+        async def succeeding():
+            calls.append("succeeding")
+            return "ok"
+
+        callers = [asyncio.create_task(flights.do("key", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        errors = await asyncio.gather(*callers, return_exceptions=True)
+        return calls, errors, await flights.do("key", succeeding)
+
+    calls, errors, result = asyncio.run(scenario())
+
+    assert [str(error) for error in errors] == ["export failed"] * 2
+    assert calls == ["failing", "succeeding"]
+    assert result == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        finished = []
+
+        async def work():
+            await release.wait()
+            finished.append(True)
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second, finished
+
+    first, result, finished = asyncio.run(scenario())
+
+    assert first.cancelled()
+    assert result == "done"
+    assert finished == [True]
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work(name):
+            calls.append(name)
+            await asyncio.sleep(0)
+            return name
+
+        results = await asyncio.gather(flights.do("a", lambda: work("a")), flights.do("b", lambda: work("b")))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+
+    assert sorted(calls) == ["a", "b"]
+    assert results == ["a", "b"]
+
+
+@pytest.mark.parametrize("storage_configs, other_configs, same", [
+    ([{"storage_type": "local"}, {"storage_type": "s3"}], [{"storage_type": "s3"}, {"storage_type": "local"}], True),
+    ([{"storage_type": "local"}], [{"storage_type": "local"}, {"storage_type": "s3"}], False),
+])
+def test_backup_flight_key_ignores_storage_order(storage_configs, other_configs, same):
+    assert (backup_flight_key("sheet", storage_configs) == backup_flight_key("sheet", other_configs)) is same
+    assert backup_flight_key("sheet", storage_configs) != backup_flight_key("other", storage_configs)
@@ -0,0 +1,172 @@
+import io
+
+import pytest
+from openpyxl import load_workbook
+
+from app.services import backup_service
+from app.services.backup_service import backup_sheet_by_id
+from app.services.snapshot_service import (
+    bundle_to_workbook,
+    read_manifest,
+    read_snapshot,
+    snapshot_content_hash,
+    write_export_bundle,
+    write_snapshot,
+)
+
+LONG_TITLE = "Продажи по регионам за отчетный год"
+
+
+def to_workbook(archive):
+    archive.seek(0)
+    out = io.BytesIO()
+    bundle_to_workbook(archive, out)
+    out.seek(0)
+    return load_workbook(out)
+
+
+@pytest.mark.parametrize("backup_format", ["ndjson", "csv"])
+def test_snapshot_round_trip(backup_format):
+    values = {
+        "Лист1": [["Имя", "Сумма"], ["Анна", "10"], ["Борис", "2.5", ""]],
+        "Пустой": []
+    }
+    archive = io.BytesIO()
+
+    manifest = write_snapshot(values, backup_format, archive, extra={"tail_rows": 5})
+
+    archive.seek(0)
+    assert read_manifest(archive) == manifest
+    assert manifest["tail_rows"] == 5
+    assert [(tab["title"], tab["rows"], tab["columns"]) for tab in manifest["tabs"]] == [("Лист1", 3, 3), ("Пустой", 0, 0)]
+    archive.seek(0)
+    assert read_snapshot(archive) == values
+
+    workbook = to_workbook(archive)
+    assert workbook.sheetnames == ["Лист1", "Пустой"]
+    assert list(workbook["Лист1"].values) == [("Имя", "Сумма"), ("Анна", 10), ("Борис", 2.5)]
+
+
+def test_content_hash_follows_values():
+    def content_hash(values):
+        return snapshot_content_hash(write_snapshot(values, "ndjson", io.BytesIO()))
+
+    assert content_hash({"Лист": [["a"]]}) == content_hash({"Лист": [["a"]]})
+    assert content_hash({"Лист": [["a"]]}) != content_hash({"Лист": [["b"]]})
+    assert content_hash({"Лист": [["a"]]}) != content_hash({"Другой": [["a"]]})
+
+
+def test_unknown_snapshot_format_is_rejected():
+    with pytest.raises(ValueError):
+        write_snapshot({"Лист": []}, "xml", io.BytesIO())
+
+
+def test_titles_matching_after_truncation_get_unique_sheet_names():
+    values = {
+        LONG_TITLE + " 2024": [["2024"]],
+        LONG_TITLE + " 2025": [["2025"]],
+        "Итоги [1]": [["1"]],
+        "итоги _1_": [["2"]]
+    }
+    archive = io.BytesIO()
+    write_snapshot(values, "csv", archive)
+
+    workbook = to_workbook(archive)
+
+    names = workbook.sheetnames
+    assert names == [LONG_TITLE[:31], LONG_TITLE[:27] + " (2)", "Итоги _1_", "итоги _1_ (2)"]
+    assert all(len(name) <= 31 for name in names)
+    assert [next(workbook[name].values)[0] for name in names] == [2024, 2025, 1, 2]
+
+
+def test_empty_workbook_round_trip():
+    archive = io.BytesIO()
+
+    manifest = write_snapshot({}, "csv", archive)
+
+    archive.seek(0)
+    assert manifest["tabs"] == []
+    assert read_snapshot(archive) == {}
+    workbook = to_workbook(archive)
+    assert len(workbook.sheetnames) == 1
+    assert list(workbook.active.values) == []
+
+
+def test_export_bundle_round_trip():
+    exports = [
+        ({"title": "Лист1", "gid": 0}, "Имя,Сумма\r\nАнна,10\r\n".encode("utf-8")),
+        ({"title": "Пустой", "gid": 7}, b"")
+    ]
+    archive = io.BytesIO()
+
+    manifest = write_export_bundle(exports, archive)
+
+    assert manifest["source"] == "export"
+    assert [(tab["gid"], tab["rows"], tab["columns"]) for tab in manifest["tabs"]] == [(0, 2, 2), (7, 0, 0)]
+    archive.seek(0)
+    assert read_snapshot(archive) == {"Лист1": [["Имя", "Сумма"], ["Анна", "10"]], "Пустой": []}
+    assert list(to_workbook(archive)["Лист1"].values) == [("Имя", "Сумма"), ("Анна", 10)]
+
+
+def test_export_bundle_rejects_failed_tab():
+    exports = [({"title": "Лист1", "gid": 0}, b"a\n"), ({"title": "Сломанный", "gid": 1}, None)]
+
+    with pytest.raises(ValueError, match="Сломанный"):
+        write_export_bundle(exports, io.BytesIO())
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.files = {}
+
+    def save(self, file_data, filename, content_type):
+        self.files[filename] = file_data.read()
+        return f"/memory/{filename}"
+
+    def get_file_info(self, file_path):
+        return {"size": len(self.files[file_path.rsplit("/", 1)[-1]])}
+
+
+class MemoryResolver:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def resolve(self, storage_type, storage_params=None):
+        return self.storage
+
+
+@pytest.fixture
+def export_tabs(monkeypatch):
+    contents = {0: "Имя,Сумма\nАнна,10\n".encode("utf-8"), 1: None, 2: b"x\n"}
+    tabs = [
+        {"title": "Данные", "gid": 0, "sheet_type": "GRID"},
+        {"title": "Диаграмма", "gid": 5, "sheet_type": "OBJECT"},
+        {"title": "Справочник", "gid": 2, "sheet_type": "GRID"}
+    ]
+    google = backup_service.google_service
+    monkeypatch.setattr(google, "get_sheet_tabs", lambda spreadsheet_id, credentials_id=None: tabs)
+    monkeypatch.setattr(google, "export_tab_csv", lambda spreadsheet_id, gid, credentials_id=None: contents[gid])
+    return contents
+
+
+def test_csv_export_backup_round_trip(export_tabs):
+    storage = MemoryStorage()
+
+    result = backup_sheet_by_id("spreadsheet", "Отчет", [{"storage_type": "memory"}], storage_resolver=MemoryResolver(storage), backup_format="csv_export")
+
+    assert result.filename.endswith(".zip")
+    assert result.backup_metadata["sheets"] == ["Данные", "Справочник"]
+    assert result.backup_metadata["rows_count"] == 3
+    archive = io.BytesIO(storage.files[result.filename])
+    assert read_snapshot(archive) == {"Данные": [["Имя", "Сумма"], ["Анна", "10"]], "Справочник": [["x"]]}
+    assert to_workbook(archive).sheetnames == ["Данные", "Справочник"]
+
+
+def test_csv_export_backup_fails_when_a_tab_fails(export_tabs):
+    export_tabs[2] = None
+    storage = MemoryStorage()
+
+    result = backup_sheet_by_id("spreadsheet", "Отчет", [{"storage_type": "memory"}], storage_resolver=MemoryResolver(storage), backup_format="csv_export")
+
+    assert result is None
+    assert storage.files == {}
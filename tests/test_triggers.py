@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.triggers import OffsetTrigger, schedule_jitter_offset, trigger_period_seconds
+
+NOW = datetime(2024, 1, 1, 0, 0, 30, tzinfo=timezone.utc)
+
+
+def fire_times(trigger, now, count):
+    times = []
+    fire_time = trigger.get_next_fire_time(None, now)
+    while fire_time is not None and len(times) < count:
+        times.append(fire_time)
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+    return times
+
+
+def test_offset_shifts_every_cron_fire_time():
+    cron = CronTrigger(hour=3, minute=0, timezone=timezone.utc)
+    shifted = OffsetTrigger(cron, 90)
+
+    assert fire_times(shifted, NOW, 3) == [
+        fire_time + timedelta(seconds=90) for fire_time in fire_times(cron, NOW, 3)
+    ]
+
+
+def test_offset_fire_time_inside_window_is_not_skipped():
+    # Исходное срабатывание в 03:00 уже прошло, но сдвинутое на 03:01:30 - еще нет
+    shifted = OffsetTrigger(CronTrigger(hour=3, minute=0, timezone=timezone.utc), 90)
+    now = datetime(2024, 1, 1, 3, 1, 0, tzinfo=timezone.utc)
+
+    assert shifted.get_next_fire_time(None, now) == datetime(2024, 1, 1, 3, 1, 30, tzinfo=timezone.utc)
+
+
+def test_offset_keeps_interval_period():
+    interval = IntervalTrigger(minutes=10, start_date=NOW)
+    shifted = OffsetTrigger(interval, 45)
+
+    assert trigger_period_seconds(shifted, now=NOW) == trigger_period_seconds(interval, now=NOW) == 600
+    assert fire_times(shifted, NOW, 1) == [NOW + timedelta(seconds=45)]
+
+
+def test_offset_one_shot_trigger_ends():
+    shifted = OffsetTrigger(DateTrigger(NOW + timedelta(hours=1)), 30)
+
+    first = shifted.get_next_fire_time(None, NOW)
+    assert first == NOW + timedelta(hours=1, seconds=30)
+    assert shifted.get_next_fire_time(first, first + timedelta(seconds=1)) is None
+    assert trigger_period_seconds(shifted, now=NOW) is None
+
+
+def test_jitter_offset_is_stable_and_within_window():
+    offsets = {schedule_jitter_offset(f"schedule-{i}", 300) for i in range(50)}
+
+    assert schedule_jitter_offset("schedule-1", 300) == schedule_jitter_offset("schedule-1", 300)
+    assert all(0 <= offset < 300 for offset in offsets)
+    assert len(offsets) > 1
+    assert schedule_jitter_offset("schedule-1", 0) == 0
+    assert schedule_jitter_offset("", 300) == 0